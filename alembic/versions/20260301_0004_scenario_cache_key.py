@@ -0,0 +1,32 @@
+"""add cache_key to gold_match_scenario for seeded result reuse
+
+Revision ID: 20260301_0004
+Revises: 20260212_0003
+Create Date: 2026-03-01 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260301_0004"
+down_revision = "20260212_0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("gold_match_scenario") as batch_op:
+        batch_op.add_column(sa.Column("cache_key", sa.String(64), nullable=True))
+    op.create_index(
+        "ix_gold_match_scenario_cache_key",
+        "gold_match_scenario",
+        ["cache_key"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_gold_match_scenario_cache_key", table_name="gold_match_scenario")
+    with op.batch_alter_table("gold_match_scenario") as batch_op:
+        batch_op.drop_column("cache_key")
@@ -0,0 +1,26 @@
+"""add fill_rate_se to gold_match_scenario
+
+Revision ID: 20260303_0005
+Revises: 20260301_0004
+Create Date: 2026-03-03 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260303_0005"
+down_revision = "20260301_0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("gold_match_scenario") as batch_op:
+        batch_op.add_column(sa.Column("fill_rate_se", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("gold_match_scenario") as batch_op:
+        batch_op.drop_column("fill_rate_se")
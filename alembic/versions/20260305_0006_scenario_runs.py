@@ -0,0 +1,54 @@
+"""add gold_match_scenario_run for compact scenario storage
+
+Revision ID: 20260305_0006
+Revises: 20260303_0005
+Create Date: 2026-03-05 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260305_0006"
+down_revision = "20260303_0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+    uuid_type = postgresql.UUID(as_uuid=True) if dialect == "postgresql" else sa.String(36)
+
+    op.create_table(
+        "gold_match_scenario_run",
+        sa.Column("scenario_id", uuid_type, primary_key=True),
+        sa.Column("scenario_label", sa.String(), nullable=True),
+        sa.Column("scenario_type", sa.String(), nullable=False),
+        sa.Column("iterations", sa.Integer(), nullable=False),
+        sa.Column("seed", sa.Integer(), nullable=True),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("cache_key", sa.String(64), nullable=True),
+        sa.Column("key_count", sa.Integer(), nullable=False),
+        sa.Column("stats", sa.LargeBinary(), nullable=False),
+        sa.Column("draws", sa.LargeBinary(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_gold_match_scenario_run_scenario_type",
+        "gold_match_scenario_run",
+        ["scenario_type"],
+    )
+    op.create_index(
+        "ix_gold_match_scenario_run_cache_key",
+        "gold_match_scenario_run",
+        ["cache_key"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_gold_match_scenario_run_cache_key", table_name="gold_match_scenario_run")
+    op.drop_index("ix_gold_match_scenario_run_scenario_type", table_name="gold_match_scenario_run")
+    op.drop_table("gold_match_scenario_run")
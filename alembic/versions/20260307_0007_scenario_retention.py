@@ -0,0 +1,54 @@
+"""add scenario summary aggregates and retention indexes
+
+Revision ID: 20260307_0007
+Revises: 20260305_0006
+Create Date: 2026-03-07 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260307_0007"
+down_revision = "20260305_0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("gold_match_scenario_run") as batch_op:
+        batch_op.add_column(sa.Column("overall_fill_rate", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("min_fill_rate", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("total_quota", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("total_demand", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("partition_month", sa.String(7), nullable=True))
+    op.create_index(
+        "ix_gold_match_scenario_run_created_at",
+        "gold_match_scenario_run",
+        ["created_at"],
+    )
+    op.create_index(
+        "ix_gold_match_scenario_run_partition_month",
+        "gold_match_scenario_run",
+        ["partition_month"],
+    )
+    op.create_index(
+        "ix_gold_match_scenario_created_at",
+        "gold_match_scenario",
+        ["created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_gold_match_scenario_created_at", table_name="gold_match_scenario")
+    op.drop_index(
+        "ix_gold_match_scenario_run_partition_month", table_name="gold_match_scenario_run"
+    )
+    op.drop_index("ix_gold_match_scenario_run_created_at", table_name="gold_match_scenario_run")
+    with op.batch_alter_table("gold_match_scenario_run") as batch_op:
+        batch_op.drop_column("partition_month")
+        batch_op.drop_column("total_demand")
+        batch_op.drop_column("total_quota")
+        batch_op.drop_column("min_fill_rate")
+        batch_op.drop_column("overall_fill_rate")
@@ -0,0 +1,62 @@
+"""add gold_preference_features for materialized preference scores
+
+Revision ID: 20260309_0008
+Revises: 20260307_0007
+Create Date: 2026-03-09 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260309_0008"
+down_revision = "20260307_0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gold_preference_features",
+        sa.Column("model_version", sa.String(), nullable=False),
+        sa.Column("program_stream_id", sa.Integer(), nullable=False),
+        sa.Column("program_name", sa.String(), nullable=False),
+        sa.Column("program_stream_name", sa.String(), nullable=False),
+        sa.Column("program_stream", sa.String(), nullable=False),
+        sa.Column("discipline_name", sa.String(), nullable=False),
+        sa.Column("province", sa.String(), nullable=False),
+        sa.Column("feature_values", sa.JSON(), nullable=False),
+        sa.Column("label_proxy", sa.Float(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("model_version", "program_stream_id"),
+    )
+    op.create_index(
+        "ix_gold_preference_features_discipline_name",
+        "gold_preference_features",
+        ["discipline_name"],
+    )
+    op.create_index(
+        "ix_gold_preference_features_version_score",
+        "gold_preference_features",
+        ["model_version", "score"],
+    )
+    op.create_index(
+        "ix_gold_preference_features_version_province_score",
+        "gold_preference_features",
+        ["model_version", "province", "score"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_gold_preference_features_version_province_score",
+        table_name="gold_preference_features",
+    )
+    op.drop_index(
+        "ix_gold_preference_features_version_score", table_name="gold_preference_features"
+    )
+    op.drop_index(
+        "ix_gold_preference_features_discipline_name", table_name="gold_preference_features"
+    )
+    op.drop_table("gold_preference_features")
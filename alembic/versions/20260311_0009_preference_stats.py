@@ -0,0 +1,34 @@
+"""add gold_preference_stats for incremental ridge training
+
+Revision ID: 20260311_0009
+Revises: 20260309_0008
+Create Date: 2026-03-11 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260311_0009"
+down_revision = "20260309_0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gold_preference_stats",
+        sa.Column("cycle", sa.String(), nullable=False),
+        sa.Column("discipline_name", sa.String(), nullable=False),
+        sa.Column("n", sa.Integer(), nullable=False),
+        sa.Column("feature_names", sa.JSON(), nullable=False),
+        sa.Column("xtx", sa.JSON(), nullable=False),
+        sa.Column("xty", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("cycle", "discipline_name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("gold_preference_stats")
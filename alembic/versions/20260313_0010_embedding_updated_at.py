@@ -0,0 +1,28 @@
+"""add updated_at to gold_program_embedding for API cache invalidation
+
+Revision ID: 20260313_0010
+Revises: 20260311_0009
+Create Date: 2026-03-13 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260313_0010"
+down_revision = "20260311_0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("gold_program_embedding") as batch_op:
+        batch_op.add_column(
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("gold_program_embedding") as batch_op:
+        batch_op.drop_column("updated_at")
@@ -0,0 +1,103 @@
+"""add full-text search over gold_program_embedding for hybrid retrieval
+
+Revision ID: 20260315_0011
+Revises: 20260313_0010
+Create Date: 2026-03-15 09:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260315_0011"
+down_revision = "20260313_0010"
+branch_labels = None
+depends_on = None
+
+_FTS_COLUMNS = "program_name, program_stream_name, discipline_name, description_text"
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute(
+            """
+            ALTER TABLE gold_program_embedding
+            ADD COLUMN search_tsv tsvector GENERATED ALWAYS AS (
+                to_tsvector(
+                    'english',
+                    coalesce(program_name, '') || ' ' ||
+                    coalesce(program_stream_name, '') || ' ' ||
+                    coalesce(discipline_name, '') || ' ' ||
+                    coalesce(description_text, '')
+                )
+            ) STORED
+            """
+        )
+        op.create_index(
+            "ix_gold_program_embedding_search_tsv",
+            "gold_program_embedding",
+            ["search_tsv"],
+            postgresql_using="gin",
+        )
+    elif dialect == "sqlite":
+        # External-content FTS5 index kept in sync by triggers; rowid is program_stream_id.
+        # Later SQLite migrations must not batch-alter gold_program_embedding, since
+        # the table copy would drop these triggers.
+        op.execute(
+            f"""
+            CREATE VIRTUAL TABLE gold_program_embedding_fts USING fts5(
+                {_FTS_COLUMNS},
+                content='gold_program_embedding',
+                content_rowid='program_stream_id'
+            )
+            """
+        )
+        new_values = ", ".join(f"new.{c.strip()}" for c in _FTS_COLUMNS.split(","))
+        old_values = ", ".join(f"old.{c.strip()}" for c in _FTS_COLUMNS.split(","))
+        op.execute(
+            f"""
+            CREATE TRIGGER gold_program_embedding_fts_ai AFTER INSERT ON gold_program_embedding
+            BEGIN
+                INSERT INTO gold_program_embedding_fts(rowid, {_FTS_COLUMNS})
+                VALUES (new.program_stream_id, {new_values});
+            END
+            """
+        )
+        op.execute(
+            f"""
+            CREATE TRIGGER gold_program_embedding_fts_ad AFTER DELETE ON gold_program_embedding
+            BEGIN
+                INSERT INTO gold_program_embedding_fts(
+                    gold_program_embedding_fts, rowid, {_FTS_COLUMNS}
+                )
+                VALUES ('delete', old.program_stream_id, {old_values});
+            END
+            """
+        )
+        op.execute(
+            f"""
+            CREATE TRIGGER gold_program_embedding_fts_au AFTER UPDATE ON gold_program_embedding
+            BEGIN
+                INSERT INTO gold_program_embedding_fts(
+                    gold_program_embedding_fts, rowid, {_FTS_COLUMNS}
+                )
+                VALUES ('delete', old.program_stream_id, {old_values});
+                INSERT INTO gold_program_embedding_fts(rowid, {_FTS_COLUMNS})
+                VALUES (new.program_stream_id, {new_values});
+            END
+            """
+        )
+        op.execute(
+            "INSERT INTO gold_program_embedding_fts(gold_program_embedding_fts) VALUES ('rebuild')"
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.drop_index("ix_gold_program_embedding_search_tsv", table_name="gold_program_embedding")
+        op.execute("ALTER TABLE gold_program_embedding DROP COLUMN search_tsv")
+    elif dialect == "sqlite":
+        for suffix in ("au", "ad", "ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS gold_program_embedding_fts_{suffix}")
+        op.execute("DROP TABLE IF EXISTS gold_program_embedding_fts")
@@ -0,0 +1,29 @@
+"""add (province, discipline_name) index for filtered semantic search
+
+Revision ID: 20260317_0012
+Revises: 20260315_0011
+Create Date: 2026-03-17 09:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260317_0012"
+down_revision = "20260315_0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serves the exact-scan strategy for selective filters (carms/semantic/filtering.py).
+    op.create_index(
+        "ix_gold_program_embedding_province_discipline",
+        "gold_program_embedding",
+        ["province", "discipline_name"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_gold_program_embedding_province_discipline", table_name="gold_program_embedding"
+    )
@@ -0,0 +1,39 @@
+"""add pg_trgm GIN indexes for fuzzy program search
+
+Revision ID: 20260319_0013
+Revises: 20260317_0012
+Create Date: 2026-03-19 09:00:00.000000
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260319_0013"
+down_revision = "20260317_0012"
+branch_labels = None
+depends_on = None
+
+TRIGRAM_COLUMNS = ("program_name", "discipline_name", "school_name")
+
+
+def upgrade() -> None:
+    # Postgres only: serves `q` (word similarity) and the ILIKE '%x%' filters on /programs.
+    # SQLite has no trigram operators; the API ranks in Python there.
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in TRIGRAM_COLUMNS:
+        op.create_index(
+            f"ix_gold_program_profile_{column}_trgm",
+            "gold_program_profile",
+            [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for column in TRIGRAM_COLUMNS:
+        op.drop_index(f"ix_gold_program_profile_{column}_trgm", table_name="gold_program_profile")
@@ -0,0 +1,31 @@
+"""add updated_at to gold_program_profile for cached /programs totals
+
+Revision ID: 20260321_0014
+Revises: 20260319_0013
+Create Date: 2026-03-21 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260321_0014"
+down_revision = "20260319_0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("gold_program_profile") as batch_op:
+        batch_op.add_column(
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+    # max(updated_at) is the cache stamp; the index keeps it an index-only lookup.
+    op.create_index("ix_gold_program_profile_updated_at", "gold_program_profile", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_gold_program_profile_updated_at", table_name="gold_program_profile")
+    with op.batch_alter_table("gold_program_profile") as batch_op:
+        batch_op.drop_column("updated_at")
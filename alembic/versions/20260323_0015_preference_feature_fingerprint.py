@@ -0,0 +1,28 @@
+"""add artifact_fingerprint to gold_preference_features
+
+Revision ID: 20260323_0015
+Revises: 20260321_0014
+Create Date: 2026-03-23 09:00:00.000000
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20260323_0015"
+down_revision = "20260321_0014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows get NULL, which never matches a fingerprint: they are scored live
+    # until the next materialization.
+    with op.batch_alter_table("gold_preference_features") as batch_op:
+        batch_op.add_column(sa.Column("artifact_fingerprint", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("gold_preference_features") as batch_op:
+        batch_op.drop_column("artifact_fingerprint")
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Any
+from uuid import UUID, uuid4
+
+from carms.analytics.simulation import ProgressCallback
+from carms.core.config import Settings
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class SimulationJob:
+    job_id: UUID
+    kind: str
+    status: str = JOB_QUEUED
+    progress: float = 0.0
+    result: Any = None
+    error: str | None = None
+    created_at: datetime = field(default_factory=_now)
+    finished_at: datetime | None = None
+
+
+class SimulationJobQueue:
+    """
+    In-process worker pool for long simulations.
+    - Jobs live in memory, so polling must hit the API process that accepted them.
+    - Only the newest `retention` finished jobs are kept.
+    """
+
+    def __init__(self, max_workers: int = 2, retention: int = 200) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="carms-sim"
+        )
+        self._retention = max(1, retention)
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[UUID, SimulationJob] = OrderedDict()
+
+    def submit(self, kind: str, work: Callable[[ProgressCallback], Any]) -> SimulationJob:
+        job = SimulationJob(job_id=uuid4(), kind=kind)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict()
+            snapshot = replace(job)
+        self._executor.submit(self._run, job.job_id, work)
+        return snapshot
+
+    def get(self, job_id: UUID) -> SimulationJob | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return replace(job) if job else None
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, job_id: UUID, **changes: Any) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, value in changes.items():
+                setattr(job, name, value)
+
+    def _run(self, job_id: UUID, work: Callable[[ProgressCallback], Any]) -> None:
+        self._update(job_id, status=JOB_RUNNING)
+
+        def report(frac: float) -> None:
+            self._update(job_id, progress=round(min(max(frac, 0.0), 1.0), 4))
+
+        try:
+            result = work(report)
+        except Exception as exc:  # surface any failure to the poller
+            self._update(job_id, status=JOB_FAILED, error=str(exc), finished_at=_now())
+            return
+        self._update(job_id, status=JOB_SUCCEEDED, progress=1.0, result=result, finished_at=_now())
+
+    def _evict(self) -> None:
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in (JOB_SUCCEEDED, JOB_FAILED)
+        ]
+        for job_id in finished[: max(0, len(finished) - self._retention)]:
+            del self._jobs[job_id]
+
+
+_queue: SimulationJobQueue | None = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> SimulationJobQueue:
+    """Process-wide queue, created lazily from Settings."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            settings = Settings()
+            _queue = SimulationJobQueue(
+                max_workers=settings.simulation_job_workers,
+                retention=settings.simulation_job_retention,
+            )
+        return _queue
+
+
+def shutdown_job_queue() -> None:
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.shutdown()
+            _queue = None
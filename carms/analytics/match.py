@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+
+import numpy as np
+from sqlmodel import Session, select
+
+from carms.analytics import preferences
+from carms.models.silver import SilverProgram
+
+RANK_LIST_LENGTH = 10
+# Spread of program-specific opinions around an applicant's common merit.
+PROGRAM_NOISE = 0.5
+# Candidate draws per rank slot; duplicates are dropped, so lists can come up short.
+CANDIDATE_FACTOR = 2
+
+
+@dataclass
+class ProgramSupply:
+    program_ids: np.ndarray  # (P,) program_stream_id
+    keys: list[tuple[str, str]]  # (province, discipline) per program
+    capacity: np.ndarray  # (P,) int quota
+    attractiveness: np.ndarray  # (P,) preference-model score in (0, 1)
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.program_ids.astype(np.int64).tobytes())
+        digest.update(self.capacity.astype(np.int64).tobytes())
+        digest.update(np.round(self.attractiveness, 6).tobytes())
+        return digest.hexdigest()
+
+
+def load_program_supply(session: Session) -> ProgramSupply:
+    """Valid programs with quotas and preference-model attractiveness."""
+    programs = session.exec(select(SilverProgram).where(SilverProgram.is_valid == True)).all()  # noqa: E712
+    if not programs:
+        raise ValueError("No programs available for match simulation.")
+
+    artifact = preferences.ensure_artifact(session)
+    scores = {s.program_stream_id: s.score for s in preferences.score_slice(session, artifact)}
+
+    return ProgramSupply(
+        program_ids=np.array([p.program_stream_id for p in programs], dtype=np.int64),
+        keys=[((p.province or "UNKNOWN"), p.discipline_name) for p in programs],
+        capacity=np.array(
+            [p.quota if p.quota is not None else 1 for p in programs], dtype=np.int64
+        ),
+        attractiveness=np.array(
+            [scores.get(p.program_stream_id, 0.5) for p in programs], dtype=float
+        ),
+    )
+
+
+def generate_rank_lists(
+    weights: np.ndarray,
+    n_applicants: int,
+    rank_length: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    Synthetic rank lists, shape (n_applicants, rank_length), padded with -1.
+    Draws with replacement proportional to weights and keeps first occurrences,
+    which is successive sampling without replacement.
+    """
+    n_programs = weights.size
+    rank_length = min(rank_length, n_programs)
+    if n_applicants <= 0 or rank_length <= 0 or weights.sum() <= 0:
+        return np.full((max(n_applicants, 0), max(rank_length, 0)), -1, dtype=np.int64)
+
+    probs = weights / weights.sum()
+    candidates = rng.choice(
+        n_programs, size=(n_applicants, rank_length * CANDIDATE_FACTOR), p=probs
+    )
+
+    # Mark the first occurrence of each program within a row.
+    order = np.argsort(candidates, axis=1, kind="stable")
+    ordered = np.take_along_axis(candidates, order, axis=1)
+    first_sorted = np.ones_like(ordered, dtype=bool)
+    first_sorted[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    keep = np.empty_like(first_sorted)
+    np.put_along_axis(keep, order, first_sorted, axis=1)
+
+    # Stable-partition kept entries to the front, preserving draw order.
+    compact = np.argsort(~keep, axis=1, kind="stable")[:, :rank_length]
+    ranks = np.take_along_axis(candidates, compact, axis=1)
+    ranks[~np.take_along_axis(keep, compact, axis=1)] = -1
+    return ranks.astype(np.int64)
+
+
+def deferred_acceptance(
+    rank_lists: np.ndarray, program_scores: np.ndarray, capacity: np.ndarray
+) -> np.ndarray:
+    """
+    Applicant-proposing deferred acceptance over array-backed rank lists.
+    program_scores[a, r] is how program rank_lists[a, r] rates applicant a.
+    All free applicants propose in the same round; each program keeps its best
+    `capacity` proposals. Returns the matched program index per applicant (-1 if unmatched).
+    """
+    n_applicants = rank_lists.shape[0]
+    # Padding only trails real entries, so the list length is the count of valid slots.
+    lengths = (rank_lists >= 0).sum(axis=1)
+    assigned = np.full(n_applicants, -1, dtype=np.int64)
+    pointer = np.zeros(n_applicants, dtype=np.int64)
+    held_app = np.empty(0, dtype=np.int64)
+    held_prog = np.empty(0, dtype=np.int64)
+    held_score = np.empty(0, dtype=float)
+    free = np.arange(n_applicants, dtype=np.int64)
+
+    while True:
+        free = free[pointer[free] < lengths[free]]
+        if not free.size:
+            break
+        slot = pointer[free]
+        progs = rank_lists[free, slot]
+        pointer[free] += 1
+
+        apps = np.concatenate([held_app, free])
+        prog = np.concatenate([held_prog, progs])
+        score = np.concatenate([held_score, program_scores[free, slot]])
+
+        order = np.lexsort((-score, prog))
+        prog_sorted = prog[order]
+        starts = np.ones(order.size, dtype=bool)
+        starts[1:] = prog_sorted[1:] != prog_sorted[:-1]
+        idx = np.arange(order.size)
+        rank_in_prog = idx - np.maximum.accumulate(np.where(starts, idx, 0))
+        accepted = rank_in_prog < capacity[prog_sorted]
+
+        keep = order[accepted]
+        held_app, held_prog, held_score = apps[keep], prog[keep], score[keep]
+        rejected = apps[order[~accepted]]
+        assigned[rejected] = -1
+        assigned[held_app] = held_prog
+        free = rejected
+
+    return assigned
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
+import hashlib
 import json
-import math
 import os
-from collections import Counter, defaultdict
-from collections.abc import Iterable, Sequence
+import threading
+import time
+from collections.abc import Sequence
 from dataclasses import asdict, dataclass
+from functools import reduce
+from operator import add
 from pathlib import Path
 
 import numpy as np
-from sqlmodel import Session, select
+from scipy.special import expit
+from sqlmodel import Session, delete, select
 
-from carms.models.gold import GoldProgramEmbedding
+from carms.core.config import Settings
+from carms.core.utils import contains_pattern
+from carms.models.gold import GoldPreferenceFeature, GoldPreferenceStats, GoldProgramEmbedding
 from carms.models.silver import SilverProgram
 
 FEATURE_NAMES = [
@@ -23,6 +29,8 @@ FEATURE_NAMES = [
 ]
 MODEL_VERSION = "v1"
 REG_L2 = 0.1
+# How long the registry trusts a cached artifact before re-checking the file's mtime.
+REGISTRY_CHECK_INTERVAL_SEC = 1.0
 
 
 def get_artifact_path() -> Path:
@@ -33,6 +41,12 @@ def get_artifact_path() -> Path:
     return Path(__file__).resolve().parents[2] / "data" / "preferences_model.json"
 
 
+def versioned_artifact_path(version: str) -> Path:
+    """Side-by-side copy per version, e.g. preferences_model.v1.json."""
+    base = get_artifact_path()
+    return base.with_name(f"{base.stem}.{version}{base.suffix}")
+
+
 @dataclass
 class PreferenceFeatureRow:
     program_stream_id: int
@@ -54,6 +68,14 @@ class PreferenceModelArtifact:
     feature_importances: dict[str, float]
 
 
+def artifact_fingerprint(artifact: PreferenceModelArtifact) -> str:
+    """Hash of what scoring depends on; versions are reused across retrains, this is not."""
+    payload = json.dumps(
+        [artifact.feature_names, artifact.weights, artifact.intercept], separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
 @dataclass
 class PreferenceScore:
     program_stream_id: int
@@ -67,115 +89,242 @@ class PreferenceScore:
     label_proxy: float
 
 
-def _cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b, strict=False))
-    norm_a = math.sqrt(sum(x * x for x in a))
-    norm_b = math.sqrt(sum(y * y for y in b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot / (norm_a * norm_b)
-
+@dataclass
+class FeatureMatrix:
+    """Column-aligned program metadata plus a contiguous (programs, features) matrix."""
+
+    program_stream_ids: np.ndarray
+    program_names: list[str]
+    program_stream_names: list[str]
+    program_streams: list[str]
+    disciplines: np.ndarray  # str
+    provinces: np.ndarray  # str, upper-cased
+    X: np.ndarray  # columns follow FEATURE_NAMES
+    y: np.ndarray  # proxy target: normalized quota
+
+    def __len__(self) -> int:
+        return int(self.X.shape[0])
+
+    def features(self, idx: int) -> dict[str, float]:
+        return {name: float(v) for name, v in zip(FEATURE_NAMES, self.X[idx], strict=True)}
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _embedding_similarity(
+    session: Session, program_ids: np.ndarray, disciplines: np.ndarray
+) -> np.ndarray:
+    """
+    Cosine between each program's embedding and its discipline centroid.
+    Centroids are group means over stored embeddings; programs without one score 0.
+    """
+    rows = [r for r in session.exec(select(GoldProgramEmbedding)).all() if r.embedding is not None]
+    similarity = np.zeros(program_ids.size, dtype=float)
+    if not rows:
+        return similarity
+
+    vectors = np.asarray([np.asarray(r.embedding, dtype=float) for r in rows])
+    emb_disc, emb_group = np.unique([r.discipline_name for r in rows], return_inverse=True)
+    sums = np.zeros((emb_disc.size, vectors.shape[1]), dtype=float)
+    np.add.at(sums, emb_group, vectors)
+    centroids = _unit_rows(sums / np.bincount(emb_group)[:, None])
+
+    # Align programs to their embedding row and discipline centroid.
+    emb_pos = {r.program_stream_id: i for i, r in enumerate(rows)}
+    row_idx = np.array([emb_pos.get(int(pid), -1) for pid in program_ids], dtype=np.int64)
+    disc_idx = np.searchsorted(emb_disc, disciplines)
+    disc_idx = np.minimum(disc_idx, emb_disc.size - 1)
+    has = (row_idx >= 0) & (emb_disc[disc_idx] == disciplines)
+    if has.any():
+        unit = _unit_rows(vectors[row_idx[has]])
+        similarity[has] = np.einsum("ij,ij->i", unit, centroids[disc_idx[has]])
+    return similarity
+
+
+def build_feature_matrix(session: Session) -> FeatureMatrix | None:
+    programs = session.exec(select(SilverProgram).where(SilverProgram.is_valid == True)).all()  # noqa: E712
+    if not programs:
+        return None
 
-def _load_embeddings(session: Session) -> tuple[dict[int, list[float]], dict[str, list[float]]]:
-    """Return program embeddings and per-discipline centroids when available."""
-    rows = session.exec(select(GoldProgramEmbedding)).all()
-    by_program: dict[int, list[float]] = {}
-    by_discipline: dict[str, list[list[float]]] = defaultdict(list)
+    ids = np.array([p.program_stream_id for p in programs], dtype=np.int64)
+    disciplines = np.array([p.discipline_name for p in programs], dtype=str)
+    provinces = np.array([(p.province or "UNKNOWN").upper() for p in programs], dtype=str)
+    streams = np.array([(p.program_stream or "").upper() for p in programs], dtype=str)
+
+    _, disc_group, disc_counts = np.unique(disciplines, return_inverse=True, return_counts=True)
+    pairs = np.char.add(np.char.add(provinces, "\x1f"), disciplines)
+    _, pair_group, pair_counts = np.unique(pairs, return_inverse=True, return_counts=True)
+
+    X = np.empty((len(programs), len(FEATURE_NAMES)), dtype=float)
+    X[:, 0] = disc_counts[disc_group] / float(len(programs))
+    X[:, 1] = pair_counts[pair_group] / disc_counts[disc_group]
+    X[:, 2] = streams == "CMG"
+    X[:, 3] = streams == "IMG"
+    X[:, 4] = _embedding_similarity(session, ids, disciplines)
+
+    quotas = np.array([p.quota if p.quota is not None else np.nan for p in programs], dtype=float)
+    max_quota = float(np.nanmax(quotas)) if not np.isnan(quotas).all() else 1.0
+    y = np.nan_to_num(quotas, nan=1.0) / max_quota if max_quota else np.zeros(len(programs))
+
+    return FeatureMatrix(
+        program_stream_ids=ids,
+        program_names=[p.program_name for p in programs],
+        program_stream_names=[p.program_stream_name for p in programs],
+        program_streams=[p.program_stream for p in programs],
+        disciplines=disciplines,
+        provinces=provinces,
+        X=np.ascontiguousarray(X),
+        y=y,
+    )
 
-    for row in rows:
-        if row.embedding is None:
-            continue
-        emb = list(row.embedding)
-        by_program[row.program_stream_id] = emb
-        by_discipline[row.discipline_name].append(emb)
 
-    centroids: dict[str, list[float]] = {}
-    for disc, vectors in by_discipline.items():
-        if not vectors:
-            continue
-        arr = np.array(vectors, dtype=float)
-        centroid = arr.mean(axis=0).tolist()
-        centroids[disc] = [float(v) for v in centroid]
+def build_feature_rows(session: Session) -> list[PreferenceFeatureRow]:
+    matrix = build_feature_matrix(session)
+    if matrix is None:
+        return []
+    return [
+        PreferenceFeatureRow(
+            program_stream_id=int(matrix.program_stream_ids[i]),
+            program_name=matrix.program_names[i],
+            program_stream_name=matrix.program_stream_names[i],
+            program_stream=matrix.program_streams[i],
+            discipline_name=str(matrix.disciplines[i]),
+            province=str(matrix.provinces[i]),
+            features=matrix.features(i),
+            label=float(matrix.y[i]),
+        )
+        for i in range(len(matrix))
+    ]
 
-    return by_program, centroids
 
+@dataclass
+class RidgeStatistics:
+    """Sufficient statistics over the design [1, X]; partitions merge by addition."""
+
+    n: int
+    xtx: np.ndarray  # (F + 1, F + 1)
+    xty: np.ndarray  # (F + 1,)
+
+    def __add__(self, other: RidgeStatistics) -> RidgeStatistics:
+        return RidgeStatistics(self.n + other.n, self.xtx + other.xtx, self.xty + other.xty)
+
+
+def sufficient_statistics(matrix: FeatureMatrix) -> dict[str, RidgeStatistics]:
+    """Per-discipline XᵀX, Xᵀy and n for one cycle's feature matrix."""
+    design = np.hstack([np.ones((len(matrix), 1)), matrix.X])
+    names, group = np.unique(matrix.disciplines, return_inverse=True)
+    dims = design.shape[1]
+    xtx = np.zeros((names.size, dims, dims), dtype=float)
+    np.add.at(xtx, group, design[:, :, None] * design[:, None, :])
+    xty = np.zeros((names.size, dims), dtype=float)
+    np.add.at(xty, group, design * matrix.y[:, None])
+    counts = np.bincount(group, minlength=names.size)
+    return {
+        str(name): RidgeStatistics(int(counts[i]), xtx[i], xty[i]) for i, name in enumerate(names)
+    }
 
-def build_feature_rows(session: Session) -> list[PreferenceFeatureRow]:
-    programs = session.exec(select(SilverProgram).where(SilverProgram.is_valid == True)).all()  # noqa: E712
-    if not programs:
-        return []
 
-    total_programs = len(programs)
-    discipline_counts = Counter(p.discipline_name for p in programs)
-    province_disc_counts = Counter(
-        ((p.province or "UNKNOWN").upper(), p.discipline_name) for p in programs
-    )
-    max_quota = max((p.quota for p in programs if p.quota is not None), default=None)
-    max_quota = float(max_quota) if max_quota is not None else 1.0
-
-    program_embeddings, discipline_centroids = _load_embeddings(session)
-
-    rows: list[PreferenceFeatureRow] = []
-    for program in programs:
-        province = (program.province or "UNKNOWN").upper()
-        discipline = program.discipline_name
-        stream = (program.program_stream or "").upper()
-
-        features = {
-            "discipline_freq": discipline_counts[discipline] / float(total_programs),
-            "province_mix": province_disc_counts[(province, discipline)]
-            / float(discipline_counts[discipline]),
-            "stream_is_cmg": 1.0 if stream == "CMG" else 0.0,
-            "stream_is_img": 1.0 if stream == "IMG" else 0.0,
-            "embedding_similarity": 0.0,
-        }
-
-        program_emb = program_embeddings.get(program.program_stream_id)
-        centroid = discipline_centroids.get(discipline)
-        if program_emb and centroid:
-            features["embedding_similarity"] = _cosine_similarity(program_emb, centroid)
-
-        quota_val = float(program.quota) if program.quota is not None else 1.0
-        label = quota_val / max_quota if max_quota else 0.0
-
-        rows.append(
-            PreferenceFeatureRow(
-                program_stream_id=program.program_stream_id,
-                program_name=program.program_name,
-                program_stream_name=program.program_stream_name,
-                program_stream=program.program_stream,
-                discipline_name=discipline,
-                province=province,
-                features=features,
-                label=label,
-            )
+def store_statistics(session: Session, cycle: str, partitions: dict[str, RidgeStatistics]) -> int:
+    """Replace one cycle's partitions; other cycles are left untouched."""
+    session.exec(delete(GoldPreferenceStats).where(GoldPreferenceStats.cycle == cycle))
+    session.add_all(
+        GoldPreferenceStats(
+            cycle=cycle,
+            discipline_name=discipline,
+            n=stats.n,
+            feature_names=list(FEATURE_NAMES),
+            xtx=stats.xtx.tolist(),
+            xty=stats.xty.tolist(),
         )
+        for discipline, stats in partitions.items()
+    )
+    session.commit()
+    return len(partitions)
 
-    return rows
+
+def load_statistics(
+    session: Session,
+    cycles: Sequence[str] | None = None,
+    exclude_cycle: str | None = None,
+) -> RidgeStatistics | None:
+    """Merge stored partitions (rows built with a different feature set are skipped)."""
+    statement = select(GoldPreferenceStats)
+    if cycles is not None:
+        statement = statement.where(GoldPreferenceStats.cycle.in_(list(cycles)))
+    if exclude_cycle is not None:
+        statement = statement.where(GoldPreferenceStats.cycle != exclude_cycle)
+
+    merged: RidgeStatistics | None = None
+    for row in session.exec(statement).all():
+        if row.feature_names != FEATURE_NAMES:
+            continue
+        stats = RidgeStatistics(row.n, np.asarray(row.xtx), np.asarray(row.xty))
+        merged = stats if merged is None else merged + stats
+    return merged
 
 
-def _ridge_regression(X: np.ndarray, y: np.ndarray, reg_lambda: float) -> tuple[float, list[float]]:
-    """Closed-form ridge regression to keep the model simple and interpretable."""
-    X_design = np.hstack([np.ones((X.shape[0], 1)), X])
-    eye = np.eye(X_design.shape[1])
-    xtx = X_design.T @ X_design + reg_lambda * eye
+def solve_ridge(stats: RidgeStatistics, reg_lambda: float) -> tuple[float, list[float]]:
+    """Closed-form ridge on the (F + 1)-sized normal equations."""
+    xtx = stats.xtx + reg_lambda * np.eye(stats.xtx.shape[0])
     try:
-        beta = np.linalg.solve(xtx, X_design.T @ y)
+        beta = np.linalg.solve(xtx, stats.xty)
     except np.linalg.LinAlgError:
-        beta = np.linalg.pinv(xtx) @ X_design.T @ y
-    intercept = float(beta[0])
-    weights = [float(w) for w in beta[1:]]
-    return intercept, weights
-
-
-def train_preference_model(session: Session, persist: bool = True) -> PreferenceModelArtifact:
-    rows = build_feature_rows(session)
-    if not rows:
+        beta = np.linalg.pinv(xtx) @ stats.xty
+    return float(beta[0]), [float(w) for w in beta[1:]]
+
+
+def ridge_path(
+    stats: RidgeStatistics, lambdas: Sequence[float]
+) -> dict[float, tuple[float, list[float]]]:
+    """
+    Solutions for many regularization strengths from one eigendecomposition:
+    beta(l) = Q diag(1 / (eig + l)) Qᵀ Xᵀy.
+    """
+    eig, Q = np.linalg.eigh(stats.xtx)
+    projected = Q.T @ stats.xty
+    path: dict[float, tuple[float, list[float]]] = {}
+    for reg_lambda in lambdas:
+        beta = Q @ (projected / (eig + reg_lambda))
+        path[float(reg_lambda)] = (float(beta[0]), [float(w) for w in beta[1:]])
+    return path
+
+
+def _write_artifact(path: Path, artifact: PreferenceModelArtifact) -> None:
+    # Write-then-rename so a hot-reloading reader never sees a partial file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(asdict(artifact)))
+    os.replace(tmp, path)
+
+
+def train_preference_model(
+    session: Session,
+    persist: bool = True,
+    version: str = MODEL_VERSION,
+    cycle: str | None = None,
+    reg_lambda: float = REG_L2,
+) -> PreferenceModelArtifact:
+    """
+    Refresh the sufficient statistics for `cycle` from silver data, merge them
+    with every other stored cycle, and solve the small normal equations.
+    Earlier cycles are never re-read from source. `cycle` defaults to PREFERENCE_CYCLE.
+    """
+    cycle = cycle or Settings().preference_cycle
+    matrix = build_feature_matrix(session)
+    if matrix is None:
         raise ValueError("No programs available to train preference model.")
 
-    X = np.array([[r.features[name] for name in FEATURE_NAMES] for r in rows], dtype=float)
-    y = np.array([r.label for r in rows], dtype=float)
-    intercept, weights = _ridge_regression(X, y, reg_lambda=REG_L2)
+    partitions = sufficient_statistics(matrix)
+    if persist:
+        store_statistics(session, cycle, partitions)
+    stats = reduce(add, partitions.values())
+    history = load_statistics(session, exclude_cycle=cycle)
+    if history is not None:
+        stats = stats + history
+    intercept, weights = solve_ridge(stats, reg_lambda)
 
     abs_weights = [abs(w) for w in weights]
     total = sum(abs_weights) or 1.0
@@ -184,7 +333,7 @@ def train_preference_model(session: Session, persist: bool = True) -> Preference
     }
 
     artifact = PreferenceModelArtifact(
-        version=MODEL_VERSION,
+        version=version,
         feature_names=list(FEATURE_NAMES),
         weights=weights,
         intercept=intercept,
@@ -192,9 +341,10 @@ def train_preference_model(session: Session, persist: bool = True) -> Preference
     )
 
     if persist:
-        path = get_artifact_path()
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(asdict(artifact)))
+        # The unversioned file is the current model; the versioned copy stays pinnable.
+        _write_artifact(versioned_artifact_path(version), artifact)
+        _write_artifact(get_artifact_path(), artifact)
+        get_registry().invalidate()
 
     return artifact
 
@@ -216,18 +366,106 @@ def load_artifact(path: Path | None = None) -> PreferenceModelArtifact | None:
         return None
 
 
-def ensure_artifact(session: Session) -> PreferenceModelArtifact:
-    artifact = load_artifact()
+@dataclass
+class _RegistryEntry:
+    artifact: PreferenceModelArtifact | None
+    stamp: tuple[int, int] | None  # (mtime_ns, size); None when the file is missing
+    checked_at: float
+
+
+class ArtifactRegistry:
+    """
+    In-process cache of parsed artifacts keyed by file path.
+    Entries are re-validated against the file's mtime/size at most once per
+    check interval, so a retrained or replaced file is picked up without a restart.
+    """
+
+    def __init__(self, check_interval: float = REGISTRY_CHECK_INTERVAL_SEC) -> None:
+        self._check_interval = check_interval
+        self._entries: dict[Path, _RegistryEntry] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple[int, int] | None:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, path: Path) -> PreferenceModelArtifact | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and now - entry.checked_at < self._check_interval:
+                return entry.artifact
+            stamp = self._stamp(path)
+            if entry is not None and entry.stamp == stamp:
+                entry.checked_at = now
+                return entry.artifact
+            artifact = load_artifact(path) if stamp is not None else None
+            self._entries[path] = _RegistryEntry(artifact, stamp, now)
+            return artifact
+
+    def get(self, version: str | None = None) -> PreferenceModelArtifact | None:
+        """Current artifact, or the one pinned by `version` (None when unavailable)."""
+        current = self._load(get_artifact_path())
+        if version is None or (current is not None and current.version == version):
+            return current
+        pinned = self._load(versioned_artifact_path(version))
+        if pinned is None or pinned.version != version:
+            return None
+        return pinned
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_registry: ArtifactRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ArtifactRegistry:
+    """Process-wide artifact registry, created lazily."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ArtifactRegistry()
+        return _registry
+
+
+def ensure_artifact(session: Session, version: str | None = None) -> PreferenceModelArtifact:
+    """
+    Registry-cached artifact. Without a pinned version, a missing model is trained;
+    an unknown pinned version raises LookupError.
+    """
+    artifact = get_registry().get(version)
     if artifact:
         return artifact
+    if version is not None:
+        raise LookupError(f"Unknown preference model version: {version}")
     return train_preference_model(session, persist=True)
 
 
-def _predict_score(features: dict[str, float], artifact: PreferenceModelArtifact) -> float:
-    raw = artifact.intercept
-    for name, weight in zip(artifact.feature_names, artifact.weights, strict=False):
-        raw += weight * features.get(name, 0.0)
-    return 1.0 / (1.0 + math.exp(-raw))
+def predict_scores(X: np.ndarray, artifact: PreferenceModelArtifact) -> np.ndarray:
+    """sigmoid(X @ w + b) for a FEATURE_NAMES-ordered matrix."""
+    by_name = dict(zip(artifact.feature_names, artifact.weights, strict=False))
+    w = np.array([by_name.get(name, 0.0) for name in FEATURE_NAMES], dtype=float)
+    return expit(X @ w + artifact.intercept)
+
+
+def _top_k(scores: np.ndarray, k: int | None) -> np.ndarray:
+    """Indices of the k highest scores, best first; ties keep input order."""
+    if k is not None and k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k is not None and k < scores.size:
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        # Keep every score tied with the k-th so the cut matches a stable full sort.
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.lexsort((candidates, -scores[candidates]))][:k]
 
 
 def score_slice(
@@ -237,32 +475,108 @@ def score_slice(
     discipline: str | None = None,
     limit: int | None = None,
 ) -> list[PreferenceScore]:
-    rows = build_feature_rows(session)
-    filtered: Iterable[PreferenceFeatureRow] = rows
+    matrix = build_feature_matrix(session)
+    if matrix is None:
+        return []
+
+    mask = np.ones(len(matrix), dtype=bool)
     if province:
-        province_upper = province.upper()
-        filtered = (r for r in filtered if r.province == province_upper)
+        mask &= matrix.provinces == province.upper()
     if discipline:
-        filtered = (r for r in filtered if discipline.lower() in r.discipline_name.lower())
-
-    scored: list[PreferenceScore] = []
-    for row in filtered:
-        score = _predict_score(row.features, artifact)
-        scored.append(
-            PreferenceScore(
-                program_stream_id=row.program_stream_id,
-                program_name=row.program_name,
-                program_stream_name=row.program_stream_name,
-                program_stream=row.program_stream,
-                discipline_name=row.discipline_name,
-                province=row.province,
-                score=score,
-                feature_values=row.features,
-                label_proxy=row.label,
-            )
+        needle = discipline.lower()
+        names = np.unique(matrix.disciplines)
+        mask &= np.isin(matrix.disciplines, [n for n in names if needle in n.lower()])
+
+    selected = np.flatnonzero(mask)
+    scores = predict_scores(matrix.X[selected], artifact)
+    return [
+        PreferenceScore(
+            program_stream_id=int(matrix.program_stream_ids[i]),
+            program_name=matrix.program_names[i],
+            program_stream_name=matrix.program_stream_names[i],
+            program_stream=matrix.program_streams[i],
+            discipline_name=str(matrix.disciplines[i]),
+            province=str(matrix.provinces[i]),
+            score=float(scores[j]),
+            feature_values=matrix.features(i),
+            label_proxy=float(matrix.y[i]),
+        )
+        for j, i in ((j, selected[j]) for j in _top_k(scores, limit))
+    ]
+
+
+def materialize_features(session: Session, artifact: PreferenceModelArtifact) -> int:
+    """Replace the stored feature rows and scores for artifact.version; returns rows written."""
+    scores = score_slice(session, artifact)
+    fingerprint = artifact_fingerprint(artifact)
+    session.exec(
+        delete(GoldPreferenceFeature).where(GoldPreferenceFeature.model_version == artifact.version)
+    )
+    session.add_all(
+        GoldPreferenceFeature(
+            model_version=artifact.version,
+            artifact_fingerprint=fingerprint,
+            program_stream_id=s.program_stream_id,
+            program_name=s.program_name,
+            program_stream_name=s.program_stream_name,
+            program_stream=s.program_stream,
+            discipline_name=s.discipline_name,
+            province=s.province,
+            feature_values=s.feature_values,
+            label_proxy=s.label_proxy,
+            score=s.score,
         )
+        for s in scores
+    )
+    session.commit()
+    return len(scores)
+
+
+def query_features(
+    session: Session,
+    artifact: PreferenceModelArtifact,
+    province: str | None = None,
+    discipline: str | None = None,
+    limit: int | None = None,
+) -> list[PreferenceScore] | None:
+    """
+    Top scores from gold_preference_features for the artifact's version. Returns None
+    when that version has not been materialized, or was materialized from different
+    weights (a retrain that reused the version string), so callers score live instead.
+    """
+    version = artifact.version
+    materialized = session.exec(
+        select(GoldPreferenceFeature.artifact_fingerprint)
+        .where(GoldPreferenceFeature.model_version == version)
+        .limit(1)
+    ).first()
+    if materialized is None or materialized != artifact_fingerprint(artifact):
+        return None
 
-    scored.sort(key=lambda x: x.score, reverse=True)
+    statement = select(GoldPreferenceFeature).where(GoldPreferenceFeature.model_version == version)
+    if province:
+        statement = statement.where(GoldPreferenceFeature.province == province.upper())
+    if discipline:
+        statement = statement.where(
+            GoldPreferenceFeature.discipline_name.ilike(contains_pattern(discipline), escape="\\")
+        )
+    statement = statement.order_by(
+        GoldPreferenceFeature.score.desc(), GoldPreferenceFeature.program_stream_id
+    )
     if limit is not None:
-        scored = scored[:limit]
-    return scored
+        statement = statement.limit(limit)
+
+    return [
+        PreferenceScore(
+            program_stream_id=row.program_stream_id,
+            program_name=row.program_name,
+            program_stream_name=row.program_stream_name,
+            program_stream=row.program_stream,
+            discipline_name=row.discipline_name,
+            province=row.province,
+            score=row.score,
+            feature_values=row.feature_values,
+            label_proxy=row.label_proxy,
+        )
+        for row in session.exec(statement).all()
+    ]
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+from scipy.special import gammaincinv
+from scipy.stats import binom
+
+# "mc" keeps numpy's Dirichlet-multinomial draws. The others feed a uniform matrix
+# through exact inverse CDFs (gamma, then conditional binomials), so the demand
+# model is unchanged but draws stay aligned across scenarios that share a seed:
+# - crn: plain uniforms (common random numbers)
+# - antithetic: U and 1 - U pairs
+# - qmc: randomized Halton replicates
+SAMPLERS = ("mc", "crn", "antithetic", "qmc")
+QMC_REPLICATES = 8
+_EPS = 1e-12
+
+
+def _first_primes(count: int) -> list[int]:
+    primes: list[int] = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+def halton(n_points: int, dims: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Randomized Halton points, shape (n_points, dims).
+    Each base gets random digit permutations (breaks the correlation of high bases)
+    and the truncated tail is filled with a uniform, so every point is exactly U(0, 1).
+    """
+    points = np.empty((n_points, dims), dtype=float)
+    indices = np.arange(1, n_points + 1)
+    for d, base in enumerate(_first_primes(dims)):
+        digits = max(1, math.ceil(math.log(n_points + 1, base)))
+        value = np.zeros(n_points, dtype=float)
+        frac = 1.0 / base
+        i = indices.copy()
+        for _ in range(digits):
+            perm = rng.permutation(base)
+            value += frac * perm[i % base]
+            i //= base
+            frac /= base
+        points[:, d] = value + frac * rng.random(n_points)
+    return points
+
+
+def qmc_blocks(iterations: int) -> list[int]:
+    """Replicate sizes for randomized QMC; each replicate gets its own random shift."""
+    replicates = min(QMC_REPLICATES, iterations)
+    return [len(b) for b in np.array_split(np.arange(iterations), replicates)]
+
+
+def uniforms(sampler: str, iterations: int, dims: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Uniform matrix (iterations, dims) driving the inverse-CDF samplers.
+    It depends only on (seed, iterations, dims), so scenarios that share a seed
+    and key set consume identical numbers.
+    """
+    if sampler == "crn":
+        u = rng.random((iterations, dims))
+    elif sampler == "antithetic":
+        # Interleaved (U, 1 - U) rows so pairs survive block-wise concatenation.
+        half = (iterations + 1) // 2
+        base = rng.random((half, dims))
+        u = np.empty((2 * half, dims), dtype=float)
+        u[0::2] = base
+        u[1::2] = 1.0 - base
+        u = u[:iterations]
+    elif sampler == "qmc":
+        u = np.vstack([halton(n, dims, rng) for n in qmc_blocks(iterations)])
+    else:
+        raise ValueError(f"Unknown sampler: {sampler}")
+    return np.clip(u, _EPS, 1.0 - _EPS)
+
+
+def inverse_cdf_demand(
+    alpha: np.ndarray, total_applicants: int | np.ndarray, u: np.ndarray
+) -> np.ndarray:
+    """
+    Dirichlet-multinomial demand from uniforms; u has 2 * keys columns.
+    alpha is (keys,) or one row per iteration, (iterations, keys); total_applicants is a
+    scalar or (iterations,), so rows from different scenarios can share one pass.
+    - Dirichlet via normalized Gamma(alpha) inverse CDFs on the first half.
+    - Multinomial via conditional Binomial inverse CDFs on the second half.
+    """
+    iterations = u.shape[0]
+    keys = alpha.shape[-1]
+    alpha = np.broadcast_to(np.asarray(alpha, dtype=float), (iterations, keys))
+    remaining_n = np.broadcast_to(np.asarray(total_applicants, dtype=np.int64), (iterations,))
+    remaining_n = remaining_n.copy()
+    demand = np.zeros((iterations, keys), dtype=np.int64)
+    if keys == 0 or not np.any(remaining_n > 0):
+        return demand
+
+    positive = alpha > 0
+    gammas = np.zeros((iterations, keys), dtype=float)
+    gammas[positive] = gammaincinv(alpha[positive], u[:, :keys][positive])
+    totals = gammas.sum(axis=1, keepdims=True)
+    fallback = alpha / alpha.sum(axis=1, keepdims=True)
+    probs = np.where(totals > 0, gammas / np.where(totals > 0, totals, 1.0), fallback)
+
+    remaining_p = np.ones(iterations, dtype=float)
+    for k in range(keys - 1):
+        cond_p = np.clip(probs[:, k] / np.maximum(remaining_p, _EPS), 0.0, 1.0)
+        draw = binom.ppf(u[:, keys + k], remaining_n, cond_p)
+        demand[:, k] = np.clip(draw, 0, remaining_n).astype(np.int64)
+        remaining_n -= demand[:, k]
+        remaining_p -= probs[:, k]
+    demand[:, keys - 1] = remaining_n
+    return demand
+
+
+def fill_rate_se(
+    fill_rates: np.ndarray, sampler: str, replicate_sizes: list[int] | None = None
+) -> np.ndarray:
+    """
+    Per-key standard error of the fill-rate mean under the sampler's design.
+    replicate_sizes describes QMC replicate boundaries when draws were made in blocks.
+    """
+    n = fill_rates.shape[0]
+    if sampler == "antithetic":
+        pairs = n // 2
+        if pairs >= 2:
+            groups = (fill_rates[0 : 2 * pairs : 2] + fill_rates[1 : 2 * pairs : 2]) / 2.0
+            return groups.std(axis=0, ddof=1) / math.sqrt(pairs)
+    elif sampler == "qmc":
+        sizes = replicate_sizes or qmc_blocks(n)
+        if len(sizes) >= 2:
+            bounds = np.cumsum([0] + sizes)
+            means = np.vstack(
+                [fill_rates[a:b].mean(axis=0) for a, b in zip(bounds[:-1], bounds[1:], strict=True)]
+            )
+            return means.std(axis=0, ddof=1) / math.sqrt(len(sizes))
+    if n < 2:
+        return np.zeros(fill_rates.shape[1], dtype=float)
+    return fill_rates.std(axis=0, ddof=1) / math.sqrt(n)
@@ -1,15 +1,46 @@
 from __future__ import annotations
 
-from dataclasses import asdict, dataclass
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from itertools import product
 from uuid import UUID, uuid4
 
 import numpy as np
+from sqlalchemy import delete
+from sqlalchemy.orm import defer
 from sqlmodel import Session, select
 
-from carms.models.gold import GoldMatchScenario
+from carms.analytics.match import (
+    PROGRAM_NOISE,
+    RANK_LIST_LENGTH,
+    ProgramSupply,
+    deferred_acceptance,
+    generate_rank_lists,
+    load_program_supply,
+)
+from carms.analytics.sampling import fill_rate_se, inverse_cdf_demand, qmc_blocks, uniforms
+from carms.analytics.storage import decode_draws, decode_stats, encode_draws, encode_stats
+from carms.core.config import Settings
+from carms.models.gold import GoldMatchScenario, GoldMatchScenarioRun
 from carms.models.silver import SilverProgram
 
 DIRICHLET_CONC = 50.0
+PROGRESS_STEPS = 20
+CONVERGENCE_BLOCK = 50
+CI_Z = 1.96  # two-sided 95% normal interval
+# Upper bound on iterations x points x keys drawn per vectorized sweep chunk.
+SWEEP_BATCH_CELLS = 2_000_000
+
+ENGINES = ("aggregate", "match")
+# Receives completed fraction in [0, 1]; used by the async job queue.
+ProgressCallback = Callable[[float], None]
 
 
 @dataclass
@@ -24,6 +55,16 @@ class SimulationParams:
     iterations: int = 300
     seed: int | None = None
     persist: bool = True
+    workers: int = 1  # <= 0 uses every available core
+    use_cache: bool = True
+    sampler: str = "mc"  # see carms.analytics.sampling.SAMPLERS
+    # Target 95% CI half-width on every key's fill rate; `iterations` becomes the cap.
+    tolerance: float | None = None
+    # "aggregate" draws province x discipline demand; "match" runs applicant-level DA.
+    engine: str = "aggregate"
+    rank_length: int = RANK_LIST_LENGTH
+    # Store compressed per-iteration draws so new statistics can be computed later.
+    keep_draws: bool = False
 
 
 def _load_supply(session: Session) -> dict[tuple[str, str], int]:
@@ -37,6 +78,17 @@ def _load_supply(session: Session) -> dict[tuple[str, str], int]:
     return supply
 
 
+def _is_target(
+    key: tuple[str, str],
+    target_provinces: list[str] | None,
+    target_disciplines: list[str] | None,
+) -> bool:
+    province, discipline = key
+    match_province = not target_provinces or province in target_provinces
+    match_discipline = not target_disciplines or discipline in target_disciplines
+    return match_province and match_discipline
+
+
 def _apply_quota_shock(
     supply: dict[tuple[str, str], int],
     multiplier: float,
@@ -45,10 +97,7 @@ def _apply_quota_shock(
 ) -> dict[tuple[str, str], int]:
     shocked: dict[tuple[str, str], int] = {}
     for key, value in supply.items():
-        province, discipline = key
-        match_province = not target_provinces or province in target_provinces
-        match_discipline = not target_disciplines or discipline in target_disciplines
-        if match_province and match_discipline:
+        if _is_target(key, target_provinces, target_disciplines):
             shocked[key] = int(round(value * multiplier))
         else:
             shocked[key] = value
@@ -63,10 +112,7 @@ def _apply_preference_shift(
 ) -> dict[tuple[str, str], float]:
     shifted = {}
     for key, value in weights.items():
-        province, discipline = key
-        match_province = not target_provinces or province in target_provinces
-        match_discipline = not target_disciplines or discipline in target_disciplines
-        if match_province and match_discipline:
+        if _is_target(key, target_provinces, target_disciplines):
             shifted[key] = max(0.0, value * (1.0 + shift_pct))
         else:
             shifted[key] = value
@@ -77,44 +123,232 @@ def _apply_preference_shift(
     return {k: v / total for k, v in shifted.items()}
 
 
-def _dirichlet_weights(
-    base_weights: dict[tuple[str, str], float], rng: np.random.Generator
-) -> dict[tuple[str, str], float]:
-    keys = list(base_weights.keys())
-    base = np.array([base_weights[k] for k in keys], dtype=float)
-    alpha = base / base.sum() * DIRICHLET_CONC
-    draw = rng.dirichlet(alpha)
-    return {k: float(v) for k, v in zip(keys, draw, strict=False)}
+def _simulate_block(
+    alpha: np.ndarray,
+    quotas: np.ndarray,
+    total_applicants: int,
+    iterations: int,
+    rng: np.random.Generator,
+    progress: ProgressCallback | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Draw ``iterations`` demand vectors; returns (demand, fill_rate) shaped (iterations, keys)."""
+    demand = np.empty((iterations, alpha.size), dtype=np.int64)
+    report_every = max(1, iterations // PROGRESS_STEPS)
+    for i in range(iterations):
+        probs = rng.dirichlet(alpha)
+        demand[i] = rng.multinomial(total_applicants, probs)
+        if progress is not None and (i + 1) % report_every == 0:
+            progress((i + 1) / iterations)
+    fill_rates = np.minimum(demand, quotas) / quotas.astype(float)
+    return demand, fill_rates
+
+
+def _simulate_block_worker(
+    alpha: np.ndarray,
+    quotas: np.ndarray,
+    total_applicants: int,
+    iterations: int,
+    seed_seq: np.random.SeedSequence,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Top-level so it can be pickled into a process pool.
+    rng = np.random.default_rng(seed_seq)
+    return _simulate_block(alpha, quotas, total_applicants, iterations, rng)
+
+
+def _resolve_workers(workers: int, iterations: int) -> int:
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, iterations))
+
+
+def _draw_workers(params: SimulationParams) -> int:
+    """Workers the draws actually split across; only fixed-size mc aggregate runs use the pool."""
+    if params.engine != "aggregate" or params.sampler != "mc" or params.tolerance is not None:
+        return 1
+    return _resolve_workers(params.workers, params.iterations)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    # Never fork: callers run in FastAPI's threadpool and the job queue's threads, and a
+    # forked child inherits their locks and the open DB engine mid-use.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_simulation_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide pool, created lazily and regrown when a run needs more workers."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)  # queued blocks still finish
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_simulation_pool() -> None:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+            _pool_workers = 0
+
+
+def _simulate_parallel(
+    alpha: np.ndarray,
+    quotas: np.ndarray,
+    total_applicants: int,
+    iterations: int,
+    seed: int | None,
+    workers: int,
+    progress: ProgressCallback | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Split iterations across the shared process pool.
+    Each block draws from its own child of SeedSequence(seed), so results are
+    reproducible for a given (seed, workers) pair whatever the pool size.
+    """
+    children = np.random.SeedSequence(seed).spawn(workers)
+    chunks = [len(c) for c in np.array_split(np.arange(iterations), workers)]
+    pool = get_simulation_pool(workers)
+    futures = [
+        pool.submit(_simulate_block_worker, alpha, quotas, total_applicants, n, child)
+        for n, child in zip(chunks, children, strict=True)
+    ]
+    if progress is not None:
+        sizes = dict(zip(futures, chunks, strict=True))
+        done = 0
+        for future in as_completed(futures):
+            done += sizes[future]
+            progress(done / iterations)
+    # Collect in submission order so the merge does not depend on scheduling.
+    blocks = [f.result() for f in futures]
+
+    demand = np.concatenate([b[0] for b in blocks], axis=0)
+    fill_rates = np.concatenate([b[1] for b in blocks], axis=0)
+    return demand, fill_rates
+
+
+def _simulate_inverse_cdf(
+    alpha: np.ndarray,
+    quotas: np.ndarray,
+    total_applicants: int,
+    iterations: int,
+    sampler: str,
+    rng: np.random.Generator,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Variance-reduced draws; one vectorized pass, so no process pool is needed."""
+    u = uniforms(sampler, iterations, 2 * alpha.size, rng)
+    demand = inverse_cdf_demand(alpha, total_applicants, u)
+    fill_rates = np.minimum(demand, quotas) / quotas.astype(float)
+    return demand, fill_rates
+
+
+def _simulate_until_converged(
+    alpha: np.ndarray,
+    quotas: np.ndarray,
+    total_applicants: int,
+    params: SimulationParams,
+    progress: ProgressCallback | None = None,
+) -> tuple[np.ndarray, np.ndarray, list[int] | None]:
+    """
+    Draw CONVERGENCE_BLOCK iterations at a time until every key's fill-rate CI
+    half-width is within params.tolerance or params.iterations is reached.
+    Blocks come from one seeded stream. For mc, crn and antithetic (even block size)
+    the stream is consumed in the same order as a single pass, so a run that stops
+    early matches the leading draws of the same run without a tolerance. qmc draws a
+    freshly shifted Halton replicate per block and does not.
+    """
+    rng = np.random.default_rng(params.seed)
+    cap = params.iterations
+    tolerance = params.tolerance or 0.0
+    demand_parts: list[np.ndarray] = []
+    fill_parts: list[np.ndarray] = []
+    replicate_sizes: list[int] = []
+    done = 0
+    while done < cap:
+        n = min(CONVERGENCE_BLOCK, cap - done)
+        if params.sampler == "mc":
+            demand, fill_rates = _simulate_block(alpha, quotas, total_applicants, n, rng)
+        else:
+            demand, fill_rates = _simulate_inverse_cdf(
+                alpha, quotas, total_applicants, n, params.sampler, rng
+            )
+            replicate_sizes.extend(qmc_blocks(n))
+        demand_parts.append(demand)
+        fill_parts.append(fill_rates)
+        done += n
+        if progress is not None:
+            progress(done / cap)
+
+        if done < 2 * CONVERGENCE_BLOCK:
+            continue  # need a couple of blocks before the SE estimate is trustworthy
+        se = fill_rate_se(np.concatenate(fill_parts), params.sampler, replicate_sizes or None)
+        if float(np.max(CI_Z * se, initial=0.0)) <= tolerance:
+            break
+
+    return (
+        np.concatenate(demand_parts),
+        np.concatenate(fill_parts),
+        replicate_sizes or None,
+    )
 
 
 def _aggregate_results(
-    runs: list[dict[tuple[str, str], tuple[int, float]]],
+    keys: list[tuple[str, str]],
+    demand: np.ndarray,
+    fill_rates: np.ndarray,
+    sampler: str = "mc",
+    replicate_sizes: list[int] | None = None,
 ) -> dict[tuple[str, str], dict[str, float]]:
-    buckets: dict[tuple[str, str], list[float]] = {}
-    demand_totals: dict[tuple[str, str], list[int]] = {}
-    for run in runs:
-        for key, (demand, fill_rate) in run.items():
-            buckets.setdefault(key, []).append(fill_rate)
-            demand_totals.setdefault(key, []).append(demand)
+    fill_mean = fill_rates.mean(axis=0)
+    fill_se = fill_rate_se(fill_rates, sampler, replicate_sizes)
+    fill_p05 = np.percentile(fill_rates, 5, axis=0)
+    fill_p95 = np.percentile(fill_rates, 95, axis=0)
+    demand_mean = demand.mean(axis=0)
 
     summary: dict[tuple[str, str], dict[str, float]] = {}
-    for key, values in buckets.items():
-        frates = np.array(values, dtype=float)
-        demands = np.array(demand_totals[key], dtype=float)
+    for idx, key in enumerate(keys):
         summary[key] = {
-            "fill_rate_mean": float(frates.mean()),
-            "fill_rate_p05": float(np.percentile(frates, 5)),
-            "fill_rate_p95": float(np.percentile(frates, 95)),
-            "demand_mean": float(demands.mean()),
+            "fill_rate_mean": float(fill_mean[idx]),
+            "fill_rate_p05": float(fill_p05[idx]),
+            "fill_rate_p95": float(fill_p95[idx]),
+            "fill_rate_se": float(fill_se[idx]),
+            "demand_mean": float(demand_mean[idx]),
         }
     return summary
 
 
-def run_simulation(
-    session: Session, params: SimulationParams
-) -> tuple[UUID, list[GoldMatchScenario]]:
-    rng = np.random.default_rng(params.seed)
-    base_supply = _load_supply(session)
+@dataclass
+class _ScenarioSummary:
+    keys: list[tuple[str, str]]
+    supply_vec: dict[tuple[str, str], int]
+    summary: dict[tuple[str, str], dict[str, float]]
+    iterations: int  # draws actually used; below params.iterations when converged early
+    demand: np.ndarray  # (iterations, keys) raw draws
+    fill_rates: np.ndarray
+
+
+@dataclass
+class _SupplyInputs:
+    keys: list[tuple[str, str]]
+    supply_vec: dict[tuple[str, str], int]
+    alpha: np.ndarray  # Dirichlet concentration per key
+    quotas: np.ndarray
+    total_applicants: int
+
+
+def _supply_inputs(
+    base_supply: dict[tuple[str, str], int], params: SimulationParams
+) -> _SupplyInputs:
+    """Apply the scenario's shocks to a supply snapshot and derive the demand model inputs."""
     supply = base_supply
 
     weights: dict[tuple[str, str], float] = {k: float(v) for k, v in base_supply.items()}
@@ -131,49 +365,494 @@ def run_simulation(
     keys = list(supply.keys())
     supply_vec = {k: max(1, v) for k, v in supply.items()}
 
-    runs: list[dict[tuple[str, str], tuple[int, float]]] = []
-    for _ in range(params.iterations):
-        draw_weights = _dirichlet_weights(weights, rng)
-        probs = np.array([draw_weights[k] for k in keys])
-        demand_draw = rng.multinomial(total_applicants, probs)
+    base = np.array([weights[k] for k in keys], dtype=float)
+    return _SupplyInputs(
+        keys=keys,
+        supply_vec=supply_vec,
+        alpha=base / base.sum() * DIRICHLET_CONC,
+        quotas=np.array([supply_vec[k] for k in keys], dtype=np.int64),
+        total_applicants=total_applicants,
+    )
 
-        run_result: dict[tuple[str, str], tuple[int, float]] = {}
-        for key, demand in zip(keys, demand_draw, strict=False):
-            quota = supply_vec[key]
-            fill_rate = min(demand, quota) / float(quota) if quota > 0 else 0.0
-            run_result[key] = (int(demand), float(fill_rate))
-        runs.append(run_result)
 
-    summary = _aggregate_results(runs)
-    scenario_id = uuid4()
-    outputs: list[GoldMatchScenario] = []
-    for key, stats in summary.items():
-        province, discipline = key
-        outputs.append(
-            GoldMatchScenario(
-                scenario_id=scenario_id,
-                scenario_label=params.scenario_label,
-                scenario_type=params.scenario_type,
-                province=province,
-                discipline_name=discipline,
-                supply_quota=supply_vec[key],
-                demand_mean=stats["demand_mean"],
-                fill_rate_mean=stats["fill_rate_mean"],
-                fill_rate_p05=stats["fill_rate_p05"],
-                fill_rate_p95=stats["fill_rate_p95"],
-                iterations=params.iterations,
-                seed=params.seed,
-                params=asdict(params),
+def _simulate_supply(
+    base_supply: dict[tuple[str, str], int],
+    params: SimulationParams,
+    progress: ProgressCallback | None = None,
+) -> _ScenarioSummary:
+    """Run one scenario against an already-loaded supply snapshot."""
+    inputs = _supply_inputs(base_supply, params)
+    keys, supply_vec = inputs.keys, inputs.supply_vec
+    alpha, quotas, total_applicants = inputs.alpha, inputs.quotas, inputs.total_applicants
+
+    workers = _draw_workers(params)
+    replicate_sizes: list[int] | None = None
+    if params.tolerance is not None:
+        demand, fill_rates, replicate_sizes = _simulate_until_converged(
+            alpha, quotas, total_applicants, params, progress
+        )
+    elif params.sampler != "mc":
+        rng = np.random.default_rng(params.seed)
+        demand, fill_rates = _simulate_inverse_cdf(
+            alpha, quotas, total_applicants, params.iterations, params.sampler, rng
+        )
+        if progress is not None:
+            progress(1.0)
+    elif workers > 1:
+        demand, fill_rates = _simulate_parallel(
+            alpha, quotas, total_applicants, params.iterations, params.seed, workers, progress
+        )
+    else:
+        rng = np.random.default_rng(params.seed)
+        demand, fill_rates = _simulate_block(
+            alpha, quotas, total_applicants, params.iterations, rng, progress
+        )
+
+    return _ScenarioSummary(
+        keys=keys,
+        supply_vec=supply_vec,
+        summary=_aggregate_results(keys, demand, fill_rates, params.sampler, replicate_sizes),
+        iterations=int(demand.shape[0]),
+        demand=demand,
+        fill_rates=fill_rates,
+    )
+
+
+def _sweep_supply(
+    base_supply: dict[tuple[str, str], int],
+    points: list[SimulationParams],
+    progress: ProgressCallback | None = None,
+) -> list[_ScenarioSummary]:
+    """
+    All sweep points in one vectorized pass over a (points, keys) parameter matrix.
+    Inverse-CDF samplers push one shared uniform matrix through every point, so each
+    point equals its single run with the same seed. mc draws Gamma and multinomial
+    variates for a chunk of points per call: reproducible for a given (seed, grid),
+    but not equal to single runs.
+    """
+    inputs = [_supply_inputs(base_supply, p) for p in points]
+    keys = inputs[0].keys
+    sampler, iterations = points[0].sampler, points[0].iterations
+    n_points, n_keys = len(points), len(keys)
+    alpha = np.stack([i.alpha for i in inputs])
+    quotas = np.stack([i.quotas for i in inputs])
+    totals = np.array([i.total_applicants for i in inputs], dtype=np.int64)
+
+    rng = np.random.default_rng(points[0].seed)
+    u = None if sampler == "mc" else uniforms(sampler, iterations, 2 * n_keys, rng)
+    chunk = max(1, SWEEP_BATCH_CELLS // max(1, iterations * n_keys))
+    demand = np.empty((n_points, iterations, n_keys), dtype=np.int64)
+    for start in range(0, n_points, chunk):
+        stop = min(start + chunk, n_points)
+        if u is None:
+            a = alpha[start:stop]
+            gammas = rng.standard_gamma(a, size=(iterations, *a.shape))
+            sums = gammas.sum(axis=2, keepdims=True)
+            fallback = a / a.sum(axis=1, keepdims=True)
+            probs = np.where(sums > 0, gammas / np.where(sums > 0, sums, 1.0), fallback)
+            demand[start:stop] = rng.multinomial(totals[start:stop], probs).transpose(1, 0, 2)
+        else:
+            rows = inverse_cdf_demand(
+                np.repeat(alpha[start:stop], iterations, axis=0),
+                np.repeat(totals[start:stop], iterations),
+                np.tile(u, (stop - start, 1)),
             )
+            demand[start:stop] = rows.reshape(stop - start, iterations, n_keys)
+        if progress is not None:
+            progress(stop / n_points)
+    fill_rates = np.minimum(demand, quotas[:, None, :]) / quotas[:, None, :].astype(float)
+
+    return [
+        _ScenarioSummary(
+            keys=keys,
+            supply_vec=inputs[p].supply_vec,
+            summary=_aggregate_results(keys, demand[p], fill_rates[p], sampler),
+            iterations=iterations,
+            demand=demand[p],
+            fill_rates=fill_rates[p],
         )
+        for p in range(n_points)
+    ]
 
-    if params.persist:
-        dialect = session.get_bind().dialect.name
-        if dialect == "sqlite":
-            session.bulk_save_objects(outputs)
-            session.commit()
+
+def _simulate_match(
+    programs: ProgramSupply,
+    params: SimulationParams,
+    progress: ProgressCallback | None = None,
+) -> _ScenarioSummary:
+    """
+    Applicant-level scenario: synthetic rank lists drawn in proportion to
+    seats x preference-model score, cleared by deferred acceptance each iteration.
+    demand is first-choice applicants per key; fill rate is matched / quota.
+    """
+    targeted = np.array(
+        [_is_target(k, params.target_provinces, params.target_disciplines) for k in programs.keys]
+    )
+    capacity = programs.capacity.copy()
+    weights = programs.attractiveness * np.maximum(programs.capacity, 1)
+    if params.scenario_type == "quota_shock":
+        capacity[targeted] = np.rint(capacity[targeted] * params.quota_multiplier)
+    if params.scenario_type == "preference_shift":
+        weights[targeted] *= max(0.0, 1.0 + params.shift_pct)
+
+    keys = list(dict.fromkeys(programs.keys))
+    positions = {k: i for i, k in enumerate(keys)}
+    key_index = np.array([positions[k] for k in programs.keys], dtype=np.int64)
+    key_capacity = np.bincount(key_index, weights=capacity, minlength=len(keys))
+    supply_vec = {k: max(1, int(key_capacity[i])) for i, k in enumerate(keys)}
+    quotas = np.array([supply_vec[k] for k in keys], dtype=float)
+    n_applicants = int(round(capacity.sum() * params.demand_multiplier))
+
+    rng = np.random.default_rng(params.seed)
+    demand = np.zeros((params.iterations, len(keys)), dtype=np.int64)
+    matched = np.zeros((params.iterations, len(keys)), dtype=np.int64)
+    for i in range(params.iterations):
+        ranks = generate_rank_lists(weights, n_applicants, params.rank_length, rng)
+        merit = rng.standard_normal(n_applicants)[:, None] + PROGRAM_NOISE * rng.standard_normal(
+            ranks.shape
+        )
+        assigned = deferred_acceptance(ranks, merit, capacity)
+
+        first = ranks[:, 0] if ranks.shape[1] else np.empty(0, dtype=np.int64)
+        demand[i] = np.bincount(key_index[first[first >= 0]], minlength=len(keys))
+        matched[i] = np.bincount(key_index[assigned[assigned >= 0]], minlength=len(keys))
+        if progress is not None:
+            progress((i + 1) / params.iterations)
+
+    fill_rates = matched / quotas
+    return _ScenarioSummary(
+        keys=keys,
+        supply_vec=supply_vec,
+        summary=_aggregate_results(keys, demand, fill_rates),
+        iterations=params.iterations,
+        demand=demand,
+        fill_rates=fill_rates,
+    )
+
+
+_Snapshot = dict[tuple[str, str], int] | ProgramSupply
+
+
+def _load_snapshot(session: Session, params: SimulationParams) -> _Snapshot:
+    if params.engine == "match":
+        return load_program_supply(session)
+    return _load_supply(session)
+
+
+def _simulate_snapshot(
+    snapshot: _Snapshot,
+    params: SimulationParams,
+    progress: ProgressCallback | None = None,
+) -> _ScenarioSummary:
+    if isinstance(snapshot, ProgramSupply):
+        return _simulate_match(snapshot, params, progress)
+    return _simulate_supply(snapshot, params, progress)
+
+
+def _snapshot_fingerprint(snapshot: _Snapshot) -> str:
+    if isinstance(snapshot, ProgramSupply):
+        return snapshot.fingerprint()
+    return supply_fingerprint(snapshot)
+
+
+# Fields that never change the simulated numbers.
+_CACHE_EXCLUDED_FIELDS = {"scenario_label", "persist", "use_cache", "workers"}
+
+
+def supply_fingerprint(supply: dict[tuple[str, str], int]) -> str:
+    payload = json.dumps(sorted([p, d, q] for (p, d), q in supply.items()))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def simulation_cache_key(params: SimulationParams, fingerprint: str) -> str | None:
+    """
+    Canonical hash of params + supply snapshot fingerprint; None for unseeded runs.
+    The resolved worker count is included only when it changes the draw streams.
+    """
+    if params.seed is None:
+        return None
+    canonical = {k: v for k, v in asdict(params).items() if k not in _CACHE_EXCLUDED_FIELDS}
+    workers = _draw_workers(params)
+    if workers > 1:
+        canonical["workers"] = workers
+    canonical["supply"] = fingerprint
+    payload = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def scenario_rows(run: GoldMatchScenarioRun) -> list[GoldMatchScenario]:
+    """Expand a compact scenario record into per-key rows (not attached to a session)."""
+    return [
+        GoldMatchScenario(
+            scenario_id=run.scenario_id,
+            scenario_label=run.scenario_label,
+            scenario_type=run.scenario_type,
+            iterations=run.iterations,
+            seed=run.seed,
+            params=run.params,
+            cache_key=run.cache_key,
+            created_at=run.created_at,
+            **record,
+        )
+        for record in decode_stats(run.stats)
+    ]
+
+
+def load_scenario(session: Session, scenario_id: UUID) -> list[GoldMatchScenario]:
+    """Per-key rows for a scenario; falls back to legacy gold_match_scenario rows."""
+    run = session.exec(
+        select(GoldMatchScenarioRun)
+        .options(defer(GoldMatchScenarioRun.draws))
+        .where(GoldMatchScenarioRun.scenario_id == scenario_id)
+    ).first()
+    if run is not None:
+        return scenario_rows(run)
+    return list(
+        session.exec(
+            select(GoldMatchScenario).where(GoldMatchScenario.scenario_id == scenario_id)
+        ).all()
+    )
+
+
+def _load_cached(session: Session, cache_key: str) -> list[GoldMatchScenario]:
+    run = session.exec(
+        select(GoldMatchScenarioRun)
+        .options(defer(GoldMatchScenarioRun.draws))
+        .where(GoldMatchScenarioRun.cache_key == cache_key)
+        .limit(1)
+    ).first()
+    if run is not None:
+        return scenario_rows(run)
+    first = session.exec(
+        select(GoldMatchScenario).where(GoldMatchScenario.cache_key == cache_key).limit(1)
+    ).first()
+    if first is None:
+        return []
+    return load_scenario(session, first.scenario_id)
+
+
+def _to_run(
+    scenario_id: UUID,
+    params: SimulationParams,
+    result: _ScenarioSummary,
+    cache_key: str | None = None,
+) -> GoldMatchScenarioRun:
+    quotas = np.array([result.supply_vec[k] for k in result.keys], dtype=float)
+    fill = np.array([result.summary[k]["fill_rate_mean"] for k in result.keys], dtype=float)
+    demand = sum(result.summary[k]["demand_mean"] for k in result.keys)
+    created_at = datetime.now(timezone.utc)
+    return GoldMatchScenarioRun(
+        scenario_id=scenario_id,
+        scenario_label=params.scenario_label,
+        scenario_type=params.scenario_type,
+        iterations=result.iterations,
+        seed=params.seed,
+        params=asdict(params),
+        cache_key=cache_key,
+        key_count=len(result.keys),
+        stats=encode_stats(result.keys, result.supply_vec, result.summary),
+        draws=encode_draws(result.demand, result.fill_rates) if params.keep_draws else None,
+        overall_fill_rate=float((fill * quotas).sum() / quotas.sum()) if quotas.size else 0.0,
+        min_fill_rate=float(fill.min()) if fill.size else 0.0,
+        total_quota=int(quotas.sum()),
+        total_demand=float(demand),
+        created_at=created_at,
+        partition_month=created_at.strftime("%Y-%m"),
+    )
+
+
+def _persist_runs(session: Session, runs: list[GoldMatchScenarioRun]) -> None:
+    session.add_all(runs)
+    if Settings().simulation_key_rows:
+        rows = [row for run in runs for row in scenario_rows(run)]
+        if session.get_bind().dialect.name == "sqlite":
+            session.bulk_save_objects(rows)
         else:
-            session.add_all(outputs)
-            session.commit()
+            session.add_all(rows)
+    session.commit()
+
+
+def prune_scenarios(session: Session, older_than: datetime) -> int:
+    """Delete scenarios created before `older_than`; returns the number of scenarios removed."""
+    # Set-based deletes; loaded objects are not synchronized (naive vs aware on SQLite).
+    removed = session.exec(
+        delete(GoldMatchScenarioRun)
+        .where(GoldMatchScenarioRun.created_at < older_than)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.exec(
+        delete(GoldMatchScenario)
+        .where(GoldMatchScenario.created_at < older_than)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return removed
+
+
+def run_simulation(
+    session: Session,
+    params: SimulationParams,
+    progress: ProgressCallback | None = None,
+) -> tuple[UUID, list[GoldMatchScenario]]:
+    snapshot = _load_snapshot(session, params)
+    cache_key = simulation_cache_key(params, _snapshot_fingerprint(snapshot))
+    if cache_key and params.use_cache:
+        cached = _load_cached(session, cache_key)
+        if cached:
+            return cached[0].scenario_id, cached
+
+    result = _simulate_snapshot(snapshot, params, progress)
+
+    scenario_id = uuid4()
+    run = _to_run(scenario_id, params, result, cache_key)
+    outputs = scenario_rows(run)
+    if params.persist:
+        _persist_runs(session, [run])
 
     return scenario_id, outputs
+
+
+SWEEP_FIELDS = {"demand_multiplier", "quota_multiplier", "shift_pct"}
+
+
+@dataclass
+class SweepPoint:
+    overrides: dict[str, float]
+    scenario_id: UUID | None
+    overall_fill_rate: float  # quota-weighted across all keys
+    fill_rate_mean: list[float]  # aligned with SweepResult.keys
+    demand_mean: list[float]
+
+
+@dataclass
+class SweepResult:
+    sweep_id: UUID
+    keys: list[tuple[str, str]]
+    points: list[SweepPoint]
+
+
+def build_grid(axes: dict[str, Sequence[float]]) -> list[dict[str, float]]:
+    """Cartesian product of sweep axes, e.g. {"quota_multiplier": [0.8, 1.0]}."""
+    unknown = set(axes) - SWEEP_FIELDS
+    if unknown:
+        raise ValueError(f"Unsupported sweep fields: {sorted(unknown)}")
+    names = sorted(axes)
+    return [
+        dict(zip(names, values, strict=True))
+        for values in product(*(list(axes[name]) for name in names))
+    ]
+
+
+def run_sweep(
+    session: Session,
+    base: SimulationParams,
+    grid: list[dict[str, float]],
+    progress: ProgressCallback | None = None,
+) -> SweepResult:
+    """
+    Simulate every grid point against one supply snapshot.
+    Aggregate-engine sweeps with a fixed iteration count draw all points in one
+    vectorized pass (see _sweep_supply); tolerance runs and the match engine go point
+    by point, sharing the process pool. Points share the base seed so neighbouring
+    points differ by parameters, not noise. When base.persist is set, each point is
+    stored as its own scenario tagged with sweep_id.
+    """
+    for overrides in grid:
+        unknown = set(overrides) - SWEEP_FIELDS
+        if unknown:
+            raise ValueError(f"Unsupported sweep fields: {sorted(unknown)}")
+    sweep_id = uuid4()
+    snapshot = _load_snapshot(session, base)
+    fingerprint = _snapshot_fingerprint(snapshot)
+    point_params = [replace(base, **overrides) for overrides in grid]
+
+    batched = not isinstance(snapshot, ProgramSupply) and base.tolerance is None
+    if batched:
+        results = _sweep_supply(snapshot, point_params, progress)
+    else:
+        results = []
+        for idx, params in enumerate(point_params):
+            point_progress = None
+            if progress is not None:
+
+                def point_progress(frac: float, idx: int = idx) -> None:
+                    progress((idx + frac) / len(grid))
+
+            results.append(_simulate_snapshot(snapshot, params, point_progress))
+
+    points: list[SweepPoint] = []
+    keys: list[tuple[str, str]] = results[0].keys if results else []
+    pending: list[GoldMatchScenarioRun] = []
+    for overrides, params, result in zip(grid, point_params, results, strict=True):
+        quotas = np.array([result.supply_vec[k] for k in keys], dtype=float)
+        fill = np.array([result.summary[k]["fill_rate_mean"] for k in keys], dtype=float)
+        demand = [result.summary[k]["demand_mean"] for k in keys]
+        overall = float((fill * quotas).sum() / quotas.sum()) if quotas.size else 0.0
+
+        scenario_id: UUID | None = None
+        if base.persist:
+            scenario_id = uuid4()
+            # Batched mc draws depend on the whole grid, so they must not answer single runs.
+            cache_key = None
+            if not (batched and base.sampler == "mc"):
+                cache_key = simulation_cache_key(params, fingerprint)
+            run = _to_run(scenario_id, params, result, cache_key)
+            run.params = {**(run.params or {}), "sweep_id": str(sweep_id)}
+            pending.append(run)
+
+        points.append(
+            SweepPoint(
+                overrides=dict(overrides),
+                scenario_id=scenario_id,
+                overall_fill_rate=overall,
+                fill_rate_mean=[float(v) for v in fill],
+                demand_mean=demand,
+            )
+        )
+
+    if pending:
+        _persist_runs(session, pending)
+
+    return SweepResult(sweep_id=sweep_id, keys=keys, points=points)
+
+
+@dataclass
+class ScenarioQuantiles:
+    scenario_id: UUID
+    quantiles: list[float]
+    keys: list[tuple[str, str]]
+    fill_rate: np.ndarray  # (keys, quantiles)
+    demand: np.ndarray
+
+
+def reaggregate(
+    session: Session, scenario_id: UUID, quantiles: Sequence[float]
+) -> ScenarioQuantiles | None:
+    """
+    New per-key quantiles from a scenario's stored draws, without re-simulating.
+    Returns None for unknown scenarios; raises ValueError when draws were not kept,
+    which includes every legacy gold_match_scenario row.
+    """
+    run = session.get(GoldMatchScenarioRun, scenario_id)
+    if run is None:
+        legacy = session.exec(
+            select(GoldMatchScenario.scenario_id)
+            .where(GoldMatchScenario.scenario_id == scenario_id)
+            .limit(1)
+        ).first()
+        if legacy is None:
+            return None
+        raise ValueError("Scenario predates stored draws; re-run with keep_draws=true.")
+    if run.draws is None:
+        raise ValueError("Scenario was stored without raw draws; re-run with keep_draws=true.")
+
+    demand, fill_rates = decode_draws(run.draws)
+    records = decode_stats(run.stats)
+    q = np.asarray(quantiles, dtype=float)
+    return ScenarioQuantiles(
+        scenario_id=scenario_id,
+        quantiles=[float(v) for v in q],
+        keys=[(r["province"], r["discipline_name"]) for r in records],
+        fill_rate=np.quantile(fill_rates.astype(float), q, axis=0).T,
+        demand=np.quantile(demand.astype(float), q, axis=0).T,
+    )
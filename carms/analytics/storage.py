@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import io
+
+import numpy as np
+
+# Per-key statistics stored column-wise in one npz blob per scenario.
+STAT_COLUMNS = (
+    "supply_quota",
+    "demand_mean",
+    "fill_rate_mean",
+    "fill_rate_p05",
+    "fill_rate_p95",
+    "fill_rate_se",
+)
+
+
+def _dump(compress: bool, **arrays: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    (np.savez_compressed if compress else np.savez)(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _load(blob: bytes) -> dict[str, np.ndarray]:
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def encode_stats(
+    keys: list[tuple[str, str]],
+    supply_vec: dict[tuple[str, str], int],
+    summary: dict[tuple[str, str], dict[str, float]],
+) -> bytes:
+    columns: dict[str, np.ndarray] = {
+        "province": np.array([k[0] for k in keys], dtype=str),
+        "discipline_name": np.array([k[1] for k in keys], dtype=str),
+        "supply_quota": np.array([supply_vec[k] for k in keys], dtype=np.int64),
+    }
+    for name in STAT_COLUMNS[1:]:
+        columns[name] = np.array([summary[k][name] for k in keys], dtype=float)
+    return _dump(True, **columns)
+
+
+def decode_stats(blob: bytes) -> list[dict]:
+    """Per-key stat dicts in stored key order."""
+    columns = _load(blob)
+    records = []
+    for i, (province, discipline) in enumerate(
+        zip(columns["province"], columns["discipline_name"], strict=True)
+    ):
+        record: dict = {"province": str(province), "discipline_name": str(discipline)}
+        record["supply_quota"] = int(columns["supply_quota"][i])
+        for name in STAT_COLUMNS[1:]:
+            value = float(columns[name][i])
+            record[name] = None if name == "fill_rate_se" and np.isnan(value) else value
+        records.append(record)
+    return records
+
+
+def encode_draws(demand: np.ndarray, fill_rates: np.ndarray) -> bytes:
+    """
+    Raw per-iteration draws, shape (iterations, keys), compressed.
+    Demand fits int32 and fill rates keep float32 precision, which halves the
+    payload before compression.
+    """
+    return _dump(
+        True,
+        demand=demand.astype(np.int32),
+        fill_rates=fill_rates.astype(np.float32),
+    )
+
+
+def decode_draws(blob: bytes) -> tuple[np.ndarray, np.ndarray]:
+    data = _load(blob)
+    return data["demand"], data["fill_rates"]
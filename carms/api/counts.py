@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from carms.models.gold import GoldProgramProfile
+from carms.semantic.cache import LRUCache
+
+COUNT_CHECK_INTERVAL_SEC = 5.0
+ESTIMATE_MIN_ROWS = 10000
+
+
+def profile_table_stamp(session: Session) -> str:
+    """Change marker for gold_program_profile: every rebuild writes a new updated_at."""
+    return str(session.exec(select(func.max(GoldProgramProfile.updated_at))).one())
+
+
+def planner_row_estimate(session: Session, statement) -> int | None:
+    """Planner row estimate for `statement` via EXPLAIN; None off Postgres."""
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+    compiled = statement.compile(dialect=bind.dialect)
+    row = (
+        session.connection()
+        .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+        .scalar_one()
+    )
+    plan = json.loads(row) if isinstance(row, str) else row
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class ProgramCountCache:
+    """
+    Totals for /programs keyed by filter signature. Exact counts are cached until the
+    profile table stamp changes (re-read at most once per `check_interval` seconds).
+    Filters the planner expects to match at least `estimate_min` rows are answered with
+    the estimate instead, because an exact count there is a near-full scan.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        check_interval: float = COUNT_CHECK_INTERVAL_SEC,
+        estimate_min: int = ESTIMATE_MIN_ROWS,
+    ) -> None:
+        self.totals = LRUCache(maxsize)
+        self.estimate_min = estimate_min
+        self._check_interval = check_interval
+        self._stamp: str | None = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def sync(self, session: Session) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self._check_interval:
+                return
+            stamp = profile_table_stamp(session)
+            self._checked_at = now
+            if stamp != self._stamp:
+                self.totals.clear()
+                self._stamp = stamp
+
+    def invalidate(self) -> None:
+        """Drop cached totals and force a stamp check on the next request."""
+        with self._lock:
+            self.totals.clear()
+            self._checked_at = float("-inf")
+
+    def total(self, session: Session, statement, signature: str) -> tuple[int, bool]:
+        """(total, is_approximate) for the rows matched by `statement`."""
+        self.sync(session)
+        cached = self.totals.get(signature)
+        if cached is not None:
+            return cached, False
+        estimate = planner_row_estimate(session, statement)
+        if estimate is not None and estimate >= self.estimate_min:
+            return estimate, True
+        total = session.exec(select(func.count()).select_from(statement.subquery())).one()
+        self.totals.put(signature, total)
+        return total, False
@@ -11,11 +11,18 @@ from carms.api.routes import analytics, disciplines, geomap, pipeline, programs,
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """FastAPI lifespan to initialize resources on startup."""
+    from carms.analytics.jobs import shutdown_job_queue
+    from carms.analytics.preferences import get_registry
+    from carms.analytics.simulation import shutdown_simulation_pool
+    from carms.api.routes.semantic import close_embedding_batcher
     from carms.core.database import init_db
 
     init_db()
+    get_registry().get()  # warm the artifact cache off the request path
     yield
-    # no shutdown actions required
+    shutdown_job_queue()
+    shutdown_simulation_pool()
+    await close_embedding_batcher()
 
 
 def create_app() -> FastAPI:
@@ -2,30 +2,78 @@ from typing import Annotated
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
 from sqlmodel import Session, select
 
 from carms.analytics import preferences
-from carms.analytics.simulation import SimulationParams, run_simulation
+from carms.analytics.jobs import SimulationJob, get_job_queue
+from carms.analytics.sampling import SAMPLERS
+from carms.analytics.simulation import (
+    CI_Z,
+    ENGINES,
+    SWEEP_FIELDS,
+    ProgressCallback,
+    SimulationParams,
+    SweepResult,
+    build_grid,
+    load_scenario,
+    reaggregate,
+    run_simulation,
+    run_sweep,
+)
 from carms.api.routes.programs import PROVINCE_PATTERN
 from carms.api.schemas import (
     PreferenceResponse,
     PreferenceScore,
+    ScenarioHeader,
+    ScenarioListResponse,
+    ScenarioQuantileResponse,
+    ScenarioQuantileResult,
+    SimulationJobResponse,
     SimulationRequest,
     SimulationResponse,
     SimulationResult,
+    SimulationSweepKey,
+    SimulationSweepPoint,
+    SimulationSweepRequest,
+    SimulationSweepResponse,
 )
+from carms.core import database
 from carms.core.database import get_session
-from carms.models.gold import GoldMatchScenario
+from carms.models.gold import GoldMatchScenario, GoldMatchScenarioRun
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 ALLOWED_TYPES = {"baseline", "quota_shock", "preference_shift"}
+MAX_WORKERS = 64
+MAX_SWEEP_POINTS = 200
+# Each match iteration runs a full applicant-level clearing, so the cap is lower.
+MAX_MATCH_ITERATIONS = 500
+MAX_RANK_LENGTH = 50
+MAX_QUANTILES = 20
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
 
 
 def _validate(payload: SimulationRequest) -> None:
     if payload.scenario_type not in ALLOWED_TYPES:
         raise HTTPException(status_code=422, detail="Invalid scenario_type")
-    if payload.iterations < 50 or payload.iterations > 2000:
+    if payload.engine not in ENGINES:
+        raise HTTPException(status_code=422, detail=f"engine must be one of {list(ENGINES)}")
+    if payload.engine == "match":
+        if payload.iterations < 1 or payload.iterations > MAX_MATCH_ITERATIONS:
+            raise HTTPException(
+                status_code=422,
+                detail=f"iterations must be between 1 and {MAX_MATCH_ITERATIONS} for engine=match",
+            )
+        if payload.rank_length < 1 or payload.rank_length > MAX_RANK_LENGTH:
+            raise HTTPException(
+                status_code=422, detail=f"rank_length must be between 1 and {MAX_RANK_LENGTH}"
+            )
+        if payload.sampler != "mc" or payload.tolerance is not None:
+            raise HTTPException(
+                status_code=422, detail="engine=match supports sampler=mc without tolerance"
+            )
+    elif payload.iterations < 50 or payload.iterations > 2000:
         raise HTTPException(status_code=422, detail="iterations must be between 50 and 2000")
     if payload.quota_multiplier < 0:
         raise HTTPException(status_code=422, detail="quota_multiplier must be non-negative")
@@ -33,12 +81,24 @@ def _validate(payload: SimulationRequest) -> None:
         raise HTTPException(status_code=422, detail="demand_multiplier must be non-negative")
     if payload.scenario_type == "preference_shift" and not (-0.9 <= payload.shift_pct <= 0.9):
         raise HTTPException(status_code=422, detail="shift_pct must be between -0.9 and 0.9")
+    if payload.sampler not in SAMPLERS:
+        raise HTTPException(status_code=422, detail=f"sampler must be one of {list(SAMPLERS)}")
+    if payload.tolerance is not None and not (0 < payload.tolerance <= 0.5):
+        raise HTTPException(status_code=422, detail="tolerance must be in (0, 0.5]")
+    if payload.workers < 0 or payload.workers > MAX_WORKERS:
+        raise HTTPException(status_code=422, detail=f"workers must be between 0 and {MAX_WORKERS}")
 
 
 def _rows_to_response(rows: list[GoldMatchScenario]) -> SimulationResponse:
     if not rows:
         raise HTTPException(status_code=404, detail="Scenario not found")
     first = rows[0]
+    half_widths = [CI_Z * row.fill_rate_se for row in rows if row.fill_rate_se is not None]
+    max_half_width = max(half_widths) if half_widths else None
+    tolerance = (first.params or {}).get("tolerance")
+    converged = None
+    if tolerance is not None and max_half_width is not None:
+        converged = max_half_width <= tolerance
     results = [
         SimulationResult(
             province=row.province,
@@ -48,6 +108,7 @@ def _rows_to_response(rows: list[GoldMatchScenario]) -> SimulationResponse:
             fill_rate_mean=row.fill_rate_mean,
             fill_rate_p05=row.fill_rate_p05,
             fill_rate_p95=row.fill_rate_p95,
+            fill_rate_se=row.fill_rate_se,
         )
         for row in rows
     ]
@@ -60,16 +121,13 @@ def _rows_to_response(rows: list[GoldMatchScenario]) -> SimulationResponse:
         params=first.params,
         results=results,
         created_at=str(first.created_at) if first.created_at else None,
+        max_ci_half_width=max_half_width,
+        converged=converged,
     )
 
 
-@router.post("/simulate", response_model=SimulationResponse)
-def simulate(
-    payload: SimulationRequest,
-    session: Annotated[Session, Depends(get_session)],
-) -> SimulationResponse:
-    _validate(payload)
-    params = SimulationParams(
+def _to_params(payload: SimulationRequest) -> SimulationParams:
+    return SimulationParams(
         scenario_type=payload.scenario_type,
         scenario_label=payload.scenario_label,
         demand_multiplier=payload.demand_multiplier,
@@ -80,20 +138,222 @@ def simulate(
         iterations=payload.iterations,
         seed=payload.seed,
         persist=payload.persist,
+        workers=payload.workers,
+        use_cache=payload.use_cache,
+        sampler=payload.sampler,
+        tolerance=payload.tolerance,
+        engine=payload.engine,
+        rank_length=payload.rank_length,
+        keep_draws=payload.keep_draws,
     )
-    _, rows = run_simulation(session, params)
+
+
+@router.post("/simulate", response_model=SimulationResponse)
+def simulate(
+    payload: SimulationRequest,
+    session: Annotated[Session, Depends(get_session)],
+) -> SimulationResponse:
+    _validate(payload)
+    try:
+        _, rows = run_simulation(session, _to_params(payload))
+    except ValueError as exc:  # no programs for the match engine
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
     return _rows_to_response(rows)
 
 
+def _validate_sweep(payload: SimulationSweepRequest) -> list[dict[str, float]]:
+    _validate(payload.base)
+    unknown = set(payload.grid) - SWEEP_FIELDS
+    if not payload.grid or unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"grid must map {sorted(SWEEP_FIELDS)} to lists of values",
+        )
+    grid = build_grid(payload.grid)
+    if not grid or len(grid) > MAX_SWEEP_POINTS:
+        raise HTTPException(
+            status_code=422, detail=f"grid must expand to 1..{MAX_SWEEP_POINTS} points"
+        )
+    for point in grid:
+        # Re-run scalar validation on every expanded point.
+        _validate(payload.base.model_copy(update=point))
+    return grid
+
+
+def _sweep_to_response(result: SweepResult, scenario_type: str) -> SimulationSweepResponse:
+    return SimulationSweepResponse(
+        sweep_id=result.sweep_id,
+        scenario_type=scenario_type,
+        keys=[SimulationSweepKey(province=p, discipline_name=d) for p, d in result.keys],
+        points=[
+            SimulationSweepPoint(
+                overrides=point.overrides,
+                scenario_id=point.scenario_id,
+                overall_fill_rate=point.overall_fill_rate,
+                fill_rate_mean=point.fill_rate_mean,
+                demand_mean=point.demand_mean,
+            )
+            for point in result.points
+        ],
+    )
+
+
+@router.post("/simulate/sweep", response_model=SimulationSweepResponse)
+def simulate_sweep(
+    payload: SimulationSweepRequest,
+    session: Annotated[Session, Depends(get_session)],
+) -> SimulationSweepResponse:
+    grid = _validate_sweep(payload)
+    try:
+        result = run_sweep(session, _to_params(payload.base), grid)
+    except ValueError as exc:  # no programs for the match engine
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return _sweep_to_response(result, payload.base.scenario_type)
+
+
+def _job_to_response(job: SimulationJob) -> SimulationJobResponse:
+    return SimulationJobResponse(
+        job_id=job.job_id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        error=job.error,
+        result=job.result,
+        created_at=job.created_at.isoformat(),
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
+    )
+
+
+@router.post("/simulate/jobs", response_model=SimulationJobResponse, status_code=202)
+def submit_simulation_job(payload: SimulationRequest) -> SimulationJobResponse:
+    _validate(payload)
+    params = _to_params(payload)
+
+    def work(progress: ProgressCallback) -> SimulationResponse:
+        # Jobs outlive the request, so they open their own session.
+        with Session(database.engine) as session:
+            _, rows = run_simulation(session, params, progress)
+            return _rows_to_response(rows)
+
+    return _job_to_response(get_job_queue().submit("simulate", work))
+
+
+@router.post("/simulate/sweep/jobs", response_model=SimulationJobResponse, status_code=202)
+def submit_sweep_job(payload: SimulationSweepRequest) -> SimulationJobResponse:
+    grid = _validate_sweep(payload)
+    params = _to_params(payload.base)
+
+    def work(progress: ProgressCallback) -> SimulationSweepResponse:
+        with Session(database.engine) as session:
+            result = run_sweep(session, params, grid, progress)
+            return _sweep_to_response(result, params.scenario_type)
+
+    return _job_to_response(get_job_queue().submit("sweep", work))
+
+
+@router.get("/simulate/jobs/{job_id}", response_model=SimulationJobResponse)
+def get_simulation_job(job_id: UUID) -> SimulationJobResponse:
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_to_response(job)
+
+
 @router.get("/simulate/{scenario_id}", response_model=SimulationResponse)
 def get_simulation(
     scenario_id: UUID,
     session: Annotated[Session, Depends(get_session)],
 ) -> SimulationResponse:
-    rows = session.exec(
-        select(GoldMatchScenario).where(GoldMatchScenario.scenario_id == scenario_id)
-    ).all()
-    return _rows_to_response(rows)
+    return _rows_to_response(load_scenario(session, scenario_id))
+
+
+@router.get("/simulate/{scenario_id}/quantiles", response_model=ScenarioQuantileResponse)
+def get_simulation_quantiles(
+    scenario_id: UUID,
+    session: Annotated[Session, Depends(get_session)],
+    q: Annotated[
+        list[float] | None,
+        Query(description="Quantiles in [0, 1] computed from the stored draws"),
+    ] = None,
+) -> ScenarioQuantileResponse:
+    q = q or list(DEFAULT_QUANTILES)
+    if len(q) > MAX_QUANTILES or any(not 0.0 <= v <= 1.0 for v in q):
+        raise HTTPException(
+            status_code=422, detail=f"q must hold 1..{MAX_QUANTILES} values in [0, 1]"
+        )
+    try:
+        result = reaggregate(session, scenario_id, q)
+    except ValueError as exc:  # stored without draws
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if result is None:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+
+    return ScenarioQuantileResponse(
+        scenario_id=result.scenario_id,
+        quantiles=result.quantiles,
+        results=[
+            ScenarioQuantileResult(
+                province=province,
+                discipline_name=discipline,
+                fill_rate=[float(v) for v in result.fill_rate[i]],
+                demand=[float(v) for v in result.demand[i]],
+            )
+            for i, (province, discipline) in enumerate(result.keys)
+        ],
+    )
+
+
+# Header columns only; the stats/draws blobs stay on disk for listings.
+_HEADER_COLUMNS = (
+    GoldMatchScenarioRun.scenario_id,
+    GoldMatchScenarioRun.scenario_label,
+    GoldMatchScenarioRun.scenario_type,
+    GoldMatchScenarioRun.iterations,
+    GoldMatchScenarioRun.seed,
+    GoldMatchScenarioRun.key_count,
+    GoldMatchScenarioRun.overall_fill_rate,
+    GoldMatchScenarioRun.min_fill_rate,
+    GoldMatchScenarioRun.total_quota,
+    GoldMatchScenarioRun.total_demand,
+    GoldMatchScenarioRun.draws.is_not(None).label("has_draws"),
+    GoldMatchScenarioRun.created_at,
+)
+
+
+@router.get("/scenarios", response_model=ScenarioListResponse)
+def list_scenarios(
+    session: Annotated[Session, Depends(get_session)],
+    scenario_type: str | None = Query(default=None, description="Filter by scenario_type"),
+    month: str | None = Query(
+        default=None,
+        pattern=r"^\d{4}-\d{2}$",
+        description="Filter by creation month partition (YYYY-MM)",
+    ),
+    limit: int = Query(default=50, ge=1, le=200, description="Maximum number of rows to return"),
+    offset: int = Query(default=0, ge=0, description="Row offset for pagination"),
+    include_total: bool = Query(default=False, description="Include full filtered row count"),
+) -> ScenarioListResponse:
+    statement = select(*_HEADER_COLUMNS)
+    if scenario_type:
+        statement = statement.where(GoldMatchScenarioRun.scenario_type == scenario_type)
+    if month:
+        statement = statement.where(GoldMatchScenarioRun.partition_month == month)
+
+    total: int | None = None
+    if include_total:
+        total = session.exec(select(func.count()).select_from(statement.subquery())).one()
+
+    statement = statement.order_by(
+        GoldMatchScenarioRun.created_at.desc(), GoldMatchScenarioRun.scenario_id
+    )
+    rows = session.exec(statement.offset(offset).limit(limit)).all()
+    items = [
+        ScenarioHeader(
+            **{**row._asdict(), "created_at": str(row.created_at) if row.created_at else None}
+        )
+        for row in rows
+    ]
+    return ScenarioListResponse(items=items, limit=limit, offset=offset, total=total)
 
 
 @router.get("/preferences", response_model=PreferenceResponse)
@@ -110,15 +370,24 @@ def preference_scores(
         description="Discipline substring filter (min length 2)",
     ),
     limit: int = Query(default=50, ge=1, le=200, description="Max number of rows"),
+    model_version: str | None = Query(
+        default=None,
+        pattern=r"^[A-Za-z0-9_.-]+$",
+        description="Pin a stored model version (defaults to the current model)",
+    ),
 ) -> PreferenceResponse:
     try:
-        artifact = preferences.ensure_artifact(session)
-    except ValueError as exc:  # no programs to train
+        artifact = preferences.ensure_artifact(session, version=model_version)
+    except (ValueError, LookupError) as exc:  # no programs to train / unknown version
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
-    scores = preferences.score_slice(
+    scores = preferences.query_features(
         session, artifact, province=province, discipline=discipline, limit=limit
     )
+    if scores is None:  # feature store missing or stale for this artifact
+        scores = preferences.score_slice(
+            session, artifact, province=province, discipline=discipline, limit=limit
+        )
     if not scores:
         raise HTTPException(status_code=404, detail="No programs found for slice")
 
@@ -1,17 +1,42 @@
+import base64
+import binascii
+import hashlib
+import json
+import re
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from sqlalchemy import func, literal, or_
 from sqlmodel import Session, select
 
+from carms.api.counts import ProgramCountCache
 from carms.api.schemas import ProgramDetail, ProgramListItem, ProgramListResponse
+from carms.core.config import Settings
 from carms.core.database import get_session
+from carms.core.utils import contains_pattern
 from carms.models.gold import GoldProgramProfile
 
 router = APIRouter(prefix="/programs", tags=["programs"])
+settings = Settings()
 
 PROVINCE_PATTERN = "^(AB|BC|MB|NB|NL|NS|NT|NU|ON|PE|QC|SK|YT|UNKNOWN)$"
 
+# Columns covered by `q` and by the pg_trgm GIN indexes from migration 20260319_0013.
+SEARCH_COLUMNS = (
+    GoldProgramProfile.program_name,
+    GoldProgramProfile.discipline_name,
+    GoldProgramProfile.school_name,
+)
+# Fallback (non-Postgres) cut-off, matching pg_trgm's default similarity_threshold.
+FUZZY_MIN_SIMILARITY = 0.3
+_WORD_RE = re.compile(r"[^\W_]+")
+
+_counts = ProgramCountCache(
+    maxsize=settings.programs_count_cache_size,
+    check_interval=settings.programs_count_check_sec,
+    estimate_min=settings.programs_count_estimate_min,
+)
+
 
 def make_preview(text: str | None, preview_chars: int) -> str | None:
     if not text or preview_chars <= 0:
@@ -21,6 +46,104 @@ def make_preview(text: str | None, preview_chars: int) -> str | None:
     return text[:preview_chars].rstrip() + "..."
 
 
+def _trigrams(text: str) -> set[str]:
+    """pg_trgm-style trigrams: each lowercased word padded as "  word "."""
+    grams: set[str] = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    left, right = _trigrams(a), _trigrams(b)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def fuzzy_rank(query: str, values: list[str]) -> float:
+    """
+    Python stand-in for the Postgres ranking: 1.0 for a substring hit, else the best
+    trigram similarity against each value and each of its words (like word_similarity).
+    """
+    needle = query.lower()
+    best = 0.0
+    for value in values:
+        if needle in value.lower():
+            return 1.0
+        candidates = [value, *_WORD_RE.findall(value)]
+        best = max(best, *(trigram_similarity(query, c) for c in candidates))
+    return best
+
+
+def filter_signature(**filters: str | None) -> str:
+    """Stable hash of the active filters; binds cursors to the query that issued them."""
+    payload = json.dumps({k: v for k, v in sorted(filters.items()) if v is not None})
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def encode_cursor(after_id: int, signature: str) -> str:
+    raw = json.dumps({"after": after_id, "sig": signature}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, signature: str) -> int:
+    """Keyset position from a cursor; 422 when it is malformed or from other filters."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        after_id = int(data["after"])
+        issued_for = data["sig"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from exc
+    if issued_for != signature:
+        raise HTTPException(status_code=422, detail="Cursor does not match the current filters")
+    return after_id
+
+
+def search_clause(q: str):
+    """Postgres `q` predicate; `:q <% col` (word similarity) and ILIKE use the trigram indexes."""
+    return or_(
+        *(literal(q).op("<%")(column) for column in SEARCH_COLUMNS),
+        *(column.ilike(contains_pattern(q), escape="\\") for column in SEARCH_COLUMNS),
+    )
+
+
+def search_rank(q: str):
+    return func.greatest(*(func.word_similarity(q, column) for column in SEARCH_COLUMNS))
+
+
+def _search_page(
+    session: Session, statement, q: str, limit: int, offset: int
+) -> tuple[list[GoldProgramProfile], dict[int, float], int | None]:
+    """
+    One page of `q` matches ranked by similarity, with scores. The match count is
+    returned when ranking ran in Python and counted every match anyway, else None.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        statement = statement.where(search_clause(q))
+        rank = search_rank(q)
+        page = (
+            statement.add_columns(rank.label("match_score"))
+            .order_by(rank.desc(), GoldProgramProfile.program_stream_id)
+            .offset(offset)
+            .limit(limit)
+        )
+        results = session.exec(page).all()
+        return [r for r, _ in results], {r.program_stream_id: float(v) for r, v in results}, None
+
+    # No trigram operators here: rank the filtered rows in Python (dev/test databases).
+    ranked = []
+    for row in session.exec(statement).all():
+        score = fuzzy_rank(q, [row.program_name, row.discipline_name, row.school_name])
+        if score >= FUZZY_MIN_SIMILARITY:
+            ranked.append((score, row))
+    ranked.sort(key=lambda item: (-item[0], item[1].program_stream_id))
+    page_rows = ranked[offset : offset + limit]
+    return [r for _, r in page_rows], {r.program_stream_id: s for s, r in page_rows}, len(ranked)
+
+
 # ---------- Routes ----------
 
 
@@ -36,9 +159,21 @@ def list_programs(
         pattern=PROVINCE_PATTERN,
     ),
     school: str | None = Query(default=None, description="Filter by school name (substring match)"),
+    q: str | None = Query(
+        default=None,
+        min_length=2,
+        max_length=200,
+        description="Typo-tolerant search over program, discipline and school names, best first",
+    ),
     limit: int = Query(default=100, ge=1, le=500, description="Maximum number of rows to return"),
     offset: int = Query(default=0, ge=0, description="Row offset for pagination"),
-    include_total: bool = Query(default=False, description="Include full filtered row count"),
+    cursor: str | None = Query(
+        default=None, description="Opaque next_cursor from the previous page (keyset pagination)"
+    ),
+    include_total: bool = Query(
+        default=False,
+        description="Include the filtered row count (cached; planner estimate for broad filters)",
+    ),
     preview_chars: int = Query(
         default=900, ge=0, le=5000, description="Max characters for description_preview"
     ),
@@ -53,11 +188,39 @@ def list_programs(
         statement = statement.where(GoldProgramProfile.school_name.ilike(f"%{school}%"))
 
     total: int | None = None
-    if include_total:
-        count_statement = select(func.count()).select_from(statement.subquery())
-        total = session.exec(count_statement).one()
+    approximate: bool | None = None
+    next_cursor = None
+    scores: dict[int, float] = {}
+    signature = filter_signature(discipline=discipline, province=province, school=school, q=q)
+    if q:
+        if cursor is not None:
+            raise HTTPException(status_code=422, detail="cursor is not supported with q")
+        rows, scores, matched = _search_page(session, statement, q, limit, offset)
+        if include_total and matched is not None:
+            total, approximate = matched, False
+        elif include_total:
+            total, approximate = _counts.total(
+                session, statement.where(search_clause(q)), signature
+            )
+    else:
+        if include_total:
+            total, approximate = _counts.total(session, statement, signature)
 
-    rows = session.exec(statement.offset(offset).limit(limit)).all()
+        # Keyset on the primary key: every page is an index range scan, so deep pages cost
+        # the same as the first and a crawl never skips or repeats rows.
+        page = statement.order_by(GoldProgramProfile.program_stream_id)
+        if cursor is not None:
+            if offset:
+                raise HTTPException(status_code=422, detail="Use either cursor or offset, not both")
+            page = page.where(
+                GoldProgramProfile.program_stream_id > decode_cursor(cursor, signature)
+            )
+        else:
+            page = page.offset(offset)
+        rows = session.exec(page.limit(limit + 1)).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].program_stream_id, signature)
 
     items: list[ProgramListItem] = [
         ProgramListItem(
@@ -72,11 +235,19 @@ def list_programs(
             province=r.province,
             program_site=r.program_site,
             description_preview=make_preview(r.description_text, preview_chars),
+            match_score=scores.get(r.program_stream_id),
         )
         for r in rows
     ]
 
-    return ProgramListResponse(items=items, limit=limit, offset=offset, total=total)
+    return ProgramListResponse(
+        items=items,
+        limit=limit,
+        offset=offset,
+        total=total,
+        total_is_approximate=approximate,
+        next_cursor=next_cursor,
+    )
 
 
 @router.get("/{program_stream_id}", response_model=ProgramDetail)
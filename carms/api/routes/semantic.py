@@ -1,20 +1,58 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import math
 import os
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Sequence
 from functools import lru_cache
 from typing import Annotated
 
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
 from sqlmodel import Session, select
 
-from carms.api.schemas import SemanticHit, SemanticQueryRequest, SemanticQueryResponse
+from carms.api.schemas import (
+    SemanticBatchRequest,
+    SemanticBatchResponse,
+    SemanticBatchResult,
+    SemanticCacheStats,
+    SemanticCacheStatsResponse,
+    SemanticHit,
+    SemanticQueryRequest,
+    SemanticQueryResponse,
+)
+from carms.core.config import Settings
 from carms.core.database import get_session
 from carms.models.gold import GoldProgramEmbedding
+from carms.semantic.answer import Answerer, build_answerer
+from carms.semantic.batching import EmbeddingBatcher
+from carms.semantic.cache import SemanticCache, normalize_query
+from carms.semantic.context import PackedContext, pack_context
+from carms.semantic.filtering import (
+    FilterPlan,
+    bind_filters,
+    filter_clause,
+    plan_filtered_search,
+    postgres_batch_vector_rows,
+    postgres_vector_rows,
+)
+from carms.semantic.hybrid import (
+    candidate_count,
+    fts5_match_expression,
+    reciprocal_rank_fusion,
+    tsquery_expression,
+)
+from carms.semantic.matrix import EmbeddingMatrix, MatrixStore, filter_mask, search_many
+from carms.semantic.sidecar import SidecarClient
 
 router = APIRouter(prefix="/semantic", tags=["semantic"])
+settings = Settings()
+
+MAX_BATCH_QUERIES = 64
 
 
 @lru_cache(maxsize=1)
@@ -26,67 +64,266 @@ def _get_model():
     return SentenceTransformer("all-MiniLM-L6-v2")
 
 
-def _maybe_generate_answer(question: str, hits: list[SemanticHit]) -> str | None:
-    """
-    Optional LangChain-backed summarization when OPENAI_API_KEY is present.
-    Falls back to None when no key or library issues occur.
-    """
-    if not hits:
-        return None
+_sidecar = (
+    SidecarClient(settings.embedding_socket, timeout=settings.embedding_sidecar_timeout)
+    if settings.embedding_socket
+    else None
+)
+
+
+def _encode_texts(texts: list[str]) -> np.ndarray:
+    # With a sidecar configured, this worker never imports sentence-transformers/torch
+    # unless the sidecar is unreachable and the in-process fallback is enabled.
+    if _sidecar is not None:
+        try:
+            return _sidecar.encode(texts)
+        except (ConnectionRefusedError, FileNotFoundError) as exc:
+            # Nothing listening on the socket: the only case that may load the model here.
+            if not settings.embedding_sidecar_fallback:
+                raise HTTPException(
+                    status_code=503, detail="embedding sidecar unavailable"
+                ) from exc
+        except (OSError, RuntimeError) as exc:
+            # Timeouts (e.g. a warming sidecar) and sidecar-side errors never fall back:
+            # `_get_model` is cached, so one slow reply would pin torch in this worker.
+            raise HTTPException(status_code=503, detail="embedding sidecar failed") from exc
+    return np.atleast_2d(np.asarray(_get_model().encode(texts, normalize_embeddings=True)))
+
+
+_batcher = EmbeddingBatcher(
+    _encode_texts,
+    max_batch=settings.semantic_batch_max,
+    window_ms=settings.semantic_batch_window_ms,
+)
+
+
+_cache = SemanticCache(
+    embedding_size=settings.semantic_embedding_cache_size,
+    result_size=settings.semantic_result_cache_size,
+    check_interval=settings.semantic_cache_check_sec,
+)
+
+
+# Memory-mapped export from the gold layer, shared by all workers through the page cache;
+# the per-worker table copy in `_cache` is only the fallback when no export exists.
+_matrix_store = MatrixStore(check_interval=settings.semantic_cache_check_sec)
+
 
+def _embedding_matrix(session: Session) -> EmbeddingMatrix:
+    return _matrix_store.current() or _cache.embedding_matrix(session)
+
+
+async def close_embedding_batcher() -> None:
+    await _batcher.aclose()
+    if _sidecar is not None:
+        _sidecar.close()
+
+
+async def _query_embedding(query_key: str) -> np.ndarray:
+    embedding = _cache.get_embedding(query_key)
+    if embedding is None:
+        embedding = await _batcher.encode(query_key)
+        _cache.put_embedding(query_key, embedding)
+    return embedding
+
+
+def _cached_hits(session: Session, result_key: tuple) -> list[SemanticHit] | None:
+    _cache.sync(session)
+    return _cache.results.get(result_key)
+
+
+def _get_answerer() -> Answerer | None:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return None
+    return build_answerer(api_key, settings.semantic_answer_budget_sec)
+
+
+def _load_descriptions(session: Session, hits: list[SemanticHit]) -> dict[int, str | None]:
+    ids = [hit.program_stream_id for hit in hits]
+    rows = session.execute(
+        select(GoldProgramEmbedding.program_stream_id, GoldProgramEmbedding.description_text).where(
+            GoldProgramEmbedding.program_stream_id.in_(ids)
+        )
+    ).all()
+    return dict(rows)
+
+
+def _pack_context(
+    question: str, hits: list[SemanticHit], descriptions: dict[int, str | None]
+) -> PackedContext:
+    return pack_context(
+        question,
+        hits,
+        descriptions,
+        budget=settings.semantic_context_token_budget,
+        max_passage_tokens=settings.semantic_passage_max_tokens,
+    )
+
+
+async def _prepare_answer(
+    session: Session, question: str, hits: list[SemanticHit]
+) -> tuple[Answerer | None, dict[int, str | None] | None]:
+    """Answerer plus the hits' descriptions (one keyed read); packing is left to the caller."""
+    # The first build imports LangChain and opens a client, so keep it off the event loop.
+    answerer = await run_in_threadpool(_get_answerer) if hits else None
+    if answerer is None:
+        return None, None
+    return answerer, await run_in_threadpool(_load_descriptions, session, hits)
+
 
+def _maybe_generate_answer(answerer: Answerer, question: str, context: PackedContext) -> str | None:
+    """
+    Optional LangChain-backed summarization over the packed passages.
+    Falls back to None on library or provider errors.
+    """
+    if not context.passages:
+        return None
     try:
-        from langchain.chains.combine_documents import create_stuff_documents_chain
-        from langchain.prompts import ChatPromptTemplate
-        from langchain.schema import Document
-        from langchain_openai import ChatOpenAI
+        return answerer.invoke(question, context.passages)
     except Exception:
         return None
 
-    llm = ChatOpenAI(api_key=api_key, model="gpt-4o-mini", temperature=0)
-    prompt = ChatPromptTemplate.from_template(
-        "Use the program snippets to answer the question. "
-        "Keep answers grounded and cite program_stream_id when useful.\n\n"
-        "Question: {question}\n\nSnippets:\n{context}"
-    )
-    chain = create_stuff_documents_chain(llm=llm, prompt=prompt)
-    docs = [
-        Document(
-            page_content=hit.description_snippet or "",
-            metadata={
-                "program_stream_id": hit.program_stream_id,
-                "discipline_name": hit.discipline_name,
-                "province": hit.province,
-            },
-        )
-        for hit in hits
-    ]
 
+async def _answer_within_budget(
+    answerer: Answerer, question: str, context: PackedContext
+) -> str | None:
     try:
-        return chain.invoke({"input_documents": docs, "question": question})
-    except Exception:
+        return await asyncio.wait_for(
+            run_in_threadpool(_maybe_generate_answer, answerer, question, context),
+            settings.semantic_answer_budget_sec,
+        )
+    except TimeoutError:
         return None
 
 
-@router.post("/query", response_model=SemanticQueryResponse)
-def semantic_query(
-    payload: SemanticQueryRequest,
-    session: Annotated[Session, Depends(get_session)],
-) -> SemanticQueryResponse:
-    if payload.top_k < 1 or payload.top_k > 20:
-        raise HTTPException(status_code=422, detail="top_k must be between 1 and 20")
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _answer_events(
+    question: str,
+    hits: list[SemanticHit],
+    top_k: int,
+    answerer: Answerer | None,
+    descriptions: dict[int, str | None] | None,
+) -> AsyncIterator[str]:
+    """Hits first, then answer chunks until the stream ends or the budget runs out."""
+    yield _sse("hits", {"hits": [hit.model_dump() for hit in hits], "top_k": top_k})
+
+    # Section splitting and token counting happen after the hits are on the wire.
+    context = None
+    if answerer is not None and descriptions is not None:
+        context = await run_in_threadpool(_pack_context, question, hits, descriptions)
+    status = "skipped"
+    if answerer is not None and context is not None and context.passages:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.semantic_answer_budget_sec
+        stream = answerer.astream(question, context.passages)
+        status = "complete"
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise TimeoutError
+                chunk = await asyncio.wait_for(anext(stream), remaining)
+                yield _sse("token", {"text": chunk})
+        except StopAsyncIteration:
+            pass
+        except TimeoutError:
+            status = "timeout"
+        except Exception:
+            status = "error"
+        finally:
+            await stream.aclose()
+    context_tokens = context.tokens_used if context is not None else None
+    yield _sse("done", {"answer": status, "context_tokens": context_tokens})
+
+
+def _to_hit(row, similarity: float) -> SemanticHit:
+    text_val = row["description_text"]
+    snippet = text_val[:320] + "..." if text_val and len(text_val) > 320 else text_val
+    return SemanticHit(
+        program_stream_id=row["program_stream_id"],
+        program_name=row["program_name"],
+        program_stream_name=row["program_stream_name"],
+        discipline_name=row["discipline_name"],
+        province=row["province"],
+        similarity=float(similarity),
+        description_snippet=snippet,
+    )
+
+
+def _cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b, strict=False))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
 
-    model = _get_model()
-    query_embedding = model.encode(payload.query, normalize_embeddings=True).tolist()
 
-    hits: list[SemanticHit] = []
+def _filter_plan(session: Session, payload: SemanticQueryRequest, limit: int) -> FilterPlan:
+    counts = _cache.filter_counts(session)
+    return plan_filtered_search(counts, payload.province, payload.discipline, limit)
+
+
+def _vector_hits(
+    session: Session, query_embedding: list[float], plan: FilterPlan, limit: int
+) -> list[SemanticHit]:
+    if plan.strategy == "empty":
+        return []
     dialect = session.get_bind().dialect.name
     if dialect == "postgresql":
+        rows = postgres_vector_rows(session, plan, query_embedding, limit)
+        return [_to_hit(row, row["similarity"]) for row in rows]
+
+    matrix = _embedding_matrix(session)
+    mask = filter_mask(matrix, plan.province, plan.disciplines)
+    return _matrix_hits(session, matrix, np.asarray([query_embedding]), [mask], limit)[0]
+
+
+def _matrix_hits(
+    session: Session,
+    matrix: EmbeddingMatrix,
+    embeddings: np.ndarray,
+    masks: list[np.ndarray | None],
+    top_k: int,
+) -> list[list[SemanticHit]]:
+    """Matrix top-k per query, then one keyed lookup for the hit fields."""
+    ranked = search_many(matrix, embeddings, masks, top_k)
+    ids = {program_id for hits in ranked for program_id, _ in hits}
+    rows = session.execute(
+        select(
+            GoldProgramEmbedding.program_stream_id,
+            GoldProgramEmbedding.program_name,
+            GoldProgramEmbedding.program_stream_name,
+            GoldProgramEmbedding.discipline_name,
+            GoldProgramEmbedding.province,
+            GoldProgramEmbedding.description_text,
+        ).where(GoldProgramEmbedding.program_stream_id.in_(ids))
+    ).mappings()
+    records = {row["program_stream_id"]: row for row in rows}
+    # Ids missing from the table (an export newer than the DB) are skipped.
+    return [
+        [_to_hit(records[pid], score) for pid, score in hits if pid in records] for hits in ranked
+    ]
+
+
+def _lexical_hits(
+    session: Session, query_embedding: list[float], query: str, plan: FilterPlan, limit: int
+) -> list[SemanticHit]:
+    """Full-text candidates in lexical rank order; similarity is still the vector cosine."""
+    if plan.strategy == "empty":
+        return []
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        expression = tsquery_expression(query)
+        if expression is None:
+            return []
+        where, params = filter_clause(plan)
         stmt = text(
-            """
+            f"""
             SELECT
                 program_stream_id,
                 program_name,
@@ -95,77 +332,198 @@ def semantic_query(
                 province,
                 description_text,
                 1 - (embedding <=> (:query_embedding)::vector) AS similarity
-            FROM gold_program_embedding
-            WHERE (:province IS NULL OR province = :province)
-              AND (:discipline IS NULL OR discipline_name ILIKE '%' || :discipline || '%')
-            ORDER BY embedding <=> (:query_embedding)::vector
-            LIMIT :top_k
+            FROM gold_program_embedding, to_tsquery('english', :tsquery) AS q
+            WHERE search_tsv @@ q
+              AND {where}
+            ORDER BY ts_rank_cd(search_tsv, q) DESC
+            LIMIT :limit
             """
         )
+        params.update(query_embedding=query_embedding, tsquery=expression, limit=limit)
+        rows = session.execute(bind_filters(stmt, params), params).mappings()
+        return [_to_hit(row, row["similarity"]) for row in rows]
+
+    expression = fts5_match_expression(query)
+    if expression is None:
+        return []
+    where, params = filter_clause(plan, alias="e")
+    stmt = text(
+        f"""
+        SELECT
+            e.program_stream_id,
+            e.program_name,
+            e.program_stream_name,
+            e.discipline_name,
+            e.province,
+            e.description_text,
+            e.embedding
+        FROM gold_program_embedding_fts AS f
+        JOIN gold_program_embedding AS e ON e.program_stream_id = f.rowid
+        WHERE gold_program_embedding_fts MATCH :match
+          AND {where}
+        ORDER BY bm25(gold_program_embedding_fts)
+        LIMIT :limit
+        """
+    )
+    params.update(match=expression, limit=limit)
+    rows = session.execute(bind_filters(stmt, params), params).mappings()
+    hits = []
+    for row in rows:
+        embedding = row["embedding"]
+        if isinstance(embedding, str):
+            embedding = json.loads(embedding)
+        hits.append(_to_hit(row, _cosine_similarity(query_embedding, embedding or [])))
+    return hits
+
+
+def _search_hits(
+    session: Session, query_embedding: list[float], payload: SemanticQueryRequest
+) -> list[SemanticHit]:
+    if payload.mode == "vector":
+        plan = _filter_plan(session, payload, payload.top_k)
+        return _vector_hits(session, query_embedding, plan, payload.top_k)
+    if payload.mode == "lexical":
+        plan = _filter_plan(session, payload, payload.top_k)
+        return _lexical_hits(session, query_embedding, payload.query, plan, payload.top_k)
+
+    # Hybrid: over-fetch from both retrievers and fuse by reciprocal rank.
+    limit = candidate_count(payload.top_k)
+    plan = _filter_plan(session, payload, limit)
+    vector = _vector_hits(session, query_embedding, plan, limit)
+    lexical = _lexical_hits(session, query_embedding, payload.query, plan, limit)
+    by_id = {hit.program_stream_id: hit for hit in [*lexical, *vector]}
+    fused = reciprocal_rank_fusion(
+        [[h.program_stream_id for h in vector], [h.program_stream_id for h in lexical]]
+    )
+    return [
+        by_id[program_id].model_copy(update={"score": score})
+        for program_id, score in fused[: payload.top_k]
+    ]
+
+
+async def _retrieve(payload: SemanticQueryRequest, session: Session) -> list[SemanticHit]:
+    if payload.top_k < 1 or payload.top_k > 20:
+        raise HTTPException(status_code=422, detail="top_k must be between 1 and 20")
+
+    query_key = normalize_query(payload.query)
+    matrix = await run_in_threadpool(_matrix_store.current)  # may re-read CURRENT and mmap
+    result_key = (
+        query_key,
+        payload.province,
+        payload.discipline,
+        payload.top_k,
+        payload.mode,
+        matrix.version if matrix is not None else None,
+    )
+    hits = await run_in_threadpool(_cached_hits, session, result_key)
+    if hits is None:
+        # Concurrent misses share one forward pass; DB and LLM work stay off the event loop.
+        query_embedding = (await _query_embedding(query_key)).tolist()
+        hits = await run_in_threadpool(_search_hits, session, query_embedding, payload)
+        _cache.results.put(result_key, hits)
+    return hits
+
+
+@router.post("/query", response_model=SemanticQueryResponse)
+async def semantic_query(
+    payload: SemanticQueryRequest,
+    session: Annotated[Session, Depends(get_session)],
+) -> SemanticQueryResponse:
+    hits = await _retrieve(payload, session)
+    answerer, descriptions = await _prepare_answer(session, payload.query, hits)
+    answer = None
+    context = None
+    if answerer is not None and descriptions is not None:
+        context = await run_in_threadpool(_pack_context, payload.query, hits, descriptions)
+        answer = await _answer_within_budget(answerer, payload.query, context)
+    return SemanticQueryResponse(
+        hits=hits,
+        answer=answer,
+        top_k=payload.top_k,
+        context_tokens=context.tokens_used if context is not None else None,
+    )
+
+
+@router.post("/query/stream")
+async def semantic_query_stream(
+    payload: SemanticQueryRequest,
+    session: Annotated[Session, Depends(get_session)],
+) -> StreamingResponse:
+    hits = await _retrieve(payload, session)
+    answerer, descriptions = await _prepare_answer(session, payload.query, hits)
+    return StreamingResponse(
+        _answer_events(payload.query, hits, payload.top_k, answerer, descriptions),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _query_embeddings(query_keys: list[str]) -> np.ndarray:
+    """Embeddings for many queries: cache hits reused, all misses encoded in one pass."""
+    cached = {key: _cache.get_embedding(key) for key in dict.fromkeys(query_keys)}
+    missing = [key for key, vector in cached.items() if vector is None]
+    if missing:
+        for key, vector in zip(missing, await _batcher.encode_many(missing), strict=True):
+            _cache.put_embedding(key, vector)
+            cached[key] = vector
+    return np.stack([cached[key] for key in query_keys])
+
+
+def _batch_hits(
+    session: Session, payload: SemanticBatchRequest, embeddings: np.ndarray
+) -> list[list[SemanticHit]]:
+    _cache.sync(session)
+    counts = _cache.filter_counts(session)
+    plans = [
+        plan_filtered_search(
+            counts,
+            item.province or payload.province,
+            item.discipline or payload.discipline,
+            payload.top_k,
+        )
+        for item in payload.queries
+    ]
+    matrix = _matrix_store.current()
+    if matrix is None and session.get_bind().dialect.name == "postgresql":
+        # No shared export: one set-based pgvector query for the whole batch rather than
+        # a per-worker copy of the embedding table, which is what the export exists to avoid.
+        rows = postgres_batch_vector_rows(session, plans, embeddings.tolist(), payload.top_k)
+        return [[_to_hit(row, row["similarity"]) for row in item_rows] for item_rows in rows]
+    if matrix is None:
+        matrix = _cache.embedding_matrix(session)  # SQLite dev/test databases
+    masks = [filter_mask(matrix, plan.province, plan.disciplines) for plan in plans]
+    return _matrix_hits(session, matrix, embeddings, masks, payload.top_k)
+
 
-        rows = session.exec(
-            stmt,
-            {
-                "query_embedding": query_embedding,
-                "province": payload.province,
-                "discipline": payload.discipline,
-                "top_k": payload.top_k,
-            },
-        ).mappings()
-
-        for row in rows:
-            text_val = row.get("description_text")
-            snippet = text_val[:320] + "..." if text_val and len(text_val) > 320 else text_val
-            hits.append(
-                SemanticHit(
-                    program_stream_id=row["program_stream_id"],
-                    program_name=row["program_name"],
-                    program_stream_name=row["program_stream_name"],
-                    discipline_name=row["discipline_name"],
-                    province=row["province"],
-                    similarity=float(row["similarity"]),
-                    description_snippet=snippet,
-                )
-            )
-    else:
-
-        def _cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
-            dot = sum(x * y for x, y in zip(a, b, strict=False))
-            norm_a = math.sqrt(sum(x * x for x in a))
-            norm_b = math.sqrt(sum(y * y for y in b))
-            if norm_a == 0 or norm_b == 0:
-                return 0.0
-            return dot / (norm_a * norm_b)
-
-        query = select(GoldProgramEmbedding)
-        if payload.province:
-            query = query.where(GoldProgramEmbedding.province == payload.province)
-        if payload.discipline:
-            query = query.where(
-                GoldProgramEmbedding.discipline_name.ilike(f"%{payload.discipline}%")
-            )
-
-        rows = session.exec(query).all()
-        scored: list[tuple[float, GoldProgramEmbedding]] = []
-        for row in rows:
-            score = _cosine_similarity(query_embedding, row.embedding or [])
-            scored.append((score, row))
-        scored.sort(key=lambda x: x[0], reverse=True)
-
-        for score, row in scored[: payload.top_k]:
-            text_val = row.description_text
-            snippet = text_val[:320] + "..." if text_val and len(text_val) > 320 else text_val
-            hits.append(
-                SemanticHit(
-                    program_stream_id=row.program_stream_id,
-                    program_name=row.program_name,
-                    program_stream_name=row.program_stream_name,
-                    discipline_name=row.discipline_name,
-                    province=row.province,
-                    similarity=float(score),
-                    description_snippet=snippet,
-                )
-            )
-
-    answer = _maybe_generate_answer(payload.query, hits)
-    return SemanticQueryResponse(hits=hits, answer=answer, top_k=payload.top_k)
+@router.post("/query:batch", response_model=SemanticBatchResponse)
+async def semantic_query_batch(
+    payload: SemanticBatchRequest,
+    session: Annotated[Session, Depends(get_session)],
+) -> SemanticBatchResponse:
+    if not payload.queries or len(payload.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=422, detail=f"queries must contain 1 to {MAX_BATCH_QUERIES} items"
+        )
+    if payload.top_k < 1 or payload.top_k > 20:
+        raise HTTPException(status_code=422, detail="top_k must be between 1 and 20")
+
+    embeddings = await _query_embeddings([normalize_query(q.query) for q in payload.queries])
+    hits = await run_in_threadpool(_batch_hits, session, payload, embeddings)
+    return SemanticBatchResponse(
+        results=[
+            SemanticBatchResult(query=item.query, hits=item_hits)
+            for item, item_hits in zip(payload.queries, hits, strict=True)
+        ],
+        top_k=payload.top_k,
+    )
+
+
+@router.get("/cache", response_model=SemanticCacheStatsResponse)
+def semantic_cache_stats() -> SemanticCacheStatsResponse:
+    stats = _cache.stats()
+    return SemanticCacheStatsResponse(
+        embeddings=SemanticCacheStats(**stats["embeddings"]),
+        results=SemanticCacheStats(**stats["results"]),
+        encode_batches=_batcher.batches,
+        encoded_queries=_batcher.items,
+    )
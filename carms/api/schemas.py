@@ -1,3 +1,4 @@
+from typing import Literal
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -17,6 +18,7 @@ class ProgramListItem(BaseModel):
 
     # list-friendly
     description_preview: str | None = None
+    match_score: float | None = None  # similarity rank when searching with `q`
 
 
 class ProgramDetail(ProgramListItem):
@@ -29,6 +31,8 @@ class ProgramListResponse(BaseModel):
     limit: int
     offset: int
     total: int | None = None
+    total_is_approximate: bool | None = None  # true when `total` is a planner estimate
+    next_cursor: str | None = None  # pass back as `cursor` for the next page
 
 
 class SemanticQueryRequest(BaseModel):
@@ -36,6 +40,7 @@ class SemanticQueryRequest(BaseModel):
     province: str | None = None
     discipline: str | None = None
     top_k: int = 5
+    mode: Literal["hybrid", "vector", "lexical"] = "hybrid"
 
 
 class SemanticHit(BaseModel):
@@ -46,12 +51,52 @@ class SemanticHit(BaseModel):
     province: str
     similarity: float
     description_snippet: str | None = None
+    score: float | None = None  # reciprocal-rank-fusion score in hybrid mode
 
 
 class SemanticQueryResponse(BaseModel):
     hits: list[SemanticHit]
     answer: str | None = None
     top_k: int
+    context_tokens: int | None = None  # tokens packed into the answer prompt
+
+
+class SemanticBatchItem(BaseModel):
+    query: str
+    province: str | None = None  # overrides the batch-level filter
+    discipline: str | None = None
+
+
+class SemanticBatchRequest(BaseModel):
+    queries: list[SemanticBatchItem]
+    province: str | None = None
+    discipline: str | None = None
+    top_k: int = 5
+
+
+class SemanticBatchResult(BaseModel):
+    query: str
+    hits: list[SemanticHit]
+
+
+class SemanticBatchResponse(BaseModel):
+    results: list[SemanticBatchResult]  # same order as the request's queries
+    top_k: int
+
+
+class SemanticCacheStats(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+class SemanticCacheStatsResponse(BaseModel):
+    embeddings: SemanticCacheStats
+    results: SemanticCacheStats
+    encode_batches: int
+    encoded_queries: int
 
 
 class SimulationRequest(BaseModel):
@@ -65,6 +110,13 @@ class SimulationRequest(BaseModel):
     iterations: int = 300
     seed: int | None = None
     persist: bool = True
+    workers: int = 1
+    use_cache: bool = True
+    sampler: str = "mc"
+    tolerance: float | None = None
+    engine: str = "aggregate"
+    rank_length: int = 10
+    keep_draws: bool = False
 
 
 class SimulationResult(BaseModel):
@@ -75,6 +127,7 @@ class SimulationResult(BaseModel):
     fill_rate_mean: float
     fill_rate_p05: float
     fill_rate_p95: float
+    fill_rate_se: float | None = None
 
 
 class SimulationResponse(BaseModel):
@@ -86,6 +139,79 @@ class SimulationResponse(BaseModel):
     params: dict | None = None
     results: list[SimulationResult]
     created_at: str | None = None
+    max_ci_half_width: float | None = None
+    converged: bool | None = None
+
+
+class ScenarioHeader(BaseModel):
+    scenario_id: UUID
+    scenario_label: str | None = None
+    scenario_type: str
+    iterations: int
+    seed: int | None = None
+    key_count: int
+    overall_fill_rate: float | None = None
+    min_fill_rate: float | None = None
+    total_quota: int | None = None
+    total_demand: float | None = None
+    has_draws: bool
+    created_at: str | None = None
+
+
+class ScenarioListResponse(BaseModel):
+    items: list[ScenarioHeader]
+    limit: int
+    offset: int
+    total: int | None = None
+
+
+class ScenarioQuantileResult(BaseModel):
+    province: str
+    discipline_name: str
+    fill_rate: list[float]  # aligned with ScenarioQuantileResponse.quantiles
+    demand: list[float]
+
+
+class ScenarioQuantileResponse(BaseModel):
+    scenario_id: UUID
+    quantiles: list[float]
+    results: list[ScenarioQuantileResult]
+
+
+class SimulationSweepRequest(BaseModel):
+    base: SimulationRequest
+    grid: dict[str, list[float]]
+
+
+class SimulationSweepKey(BaseModel):
+    province: str
+    discipline_name: str
+
+
+class SimulationSweepPoint(BaseModel):
+    overrides: dict[str, float]
+    scenario_id: UUID | None = None
+    overall_fill_rate: float
+    fill_rate_mean: list[float]
+    demand_mean: list[float]
+
+
+class SimulationSweepResponse(BaseModel):
+    sweep_id: UUID
+    scenario_type: str
+    keys: list[SimulationSweepKey]
+    points: list[SimulationSweepPoint]
+
+
+class SimulationJobResponse(BaseModel):
+    job_id: UUID
+    kind: str
+    status: str
+    progress: float
+    error: str | None = None
+    result: SimulationResponse | SimulationSweepResponse | None = None
+    created_at: str
+    finished_at: str | None = None
 
 
 class PreferenceScore(BaseModel):
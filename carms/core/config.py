@@ -17,5 +17,24 @@ class Settings(BaseSettings):
     api_key: str | None = Field(default=None, env="API_KEY")
     rate_limit_requests: int = Field(default=120, env="RATE_LIMIT_REQUESTS")
     rate_limit_window_sec: int = Field(default=60, env="RATE_LIMIT_WINDOW_SEC")
+    simulation_job_workers: int = Field(default=2, env="SIMULATION_JOB_WORKERS")
+    simulation_job_retention: int = Field(default=200, env="SIMULATION_JOB_RETENTION")
+    simulation_key_rows: bool = Field(default=False, env="SIMULATION_KEY_ROWS")
+    scenario_retention_days: int = Field(default=90, env="SCENARIO_RETENTION_DAYS")
+    preference_cycle: str = Field(default="current", env="PREFERENCE_CYCLE")
+    semantic_batch_max: int = Field(default=32, env="SEMANTIC_BATCH_MAX")
+    semantic_batch_window_ms: float = Field(default=2.0, env="SEMANTIC_BATCH_WINDOW_MS")
+    semantic_embedding_cache_size: int = Field(default=1024, env="SEMANTIC_EMBEDDING_CACHE_SIZE")
+    semantic_result_cache_size: int = Field(default=512, env="SEMANTIC_RESULT_CACHE_SIZE")
+    semantic_cache_check_sec: float = Field(default=5.0, env="SEMANTIC_CACHE_CHECK_SEC")
+    semantic_answer_budget_sec: float = Field(default=8.0, env="SEMANTIC_ANSWER_BUDGET_SEC")
+    semantic_context_token_budget: int = Field(default=1500, env="SEMANTIC_CONTEXT_TOKEN_BUDGET")
+    semantic_passage_max_tokens: int = Field(default=300, env="SEMANTIC_PASSAGE_MAX_TOKENS")
+    programs_count_cache_size: int = Field(default=1024, env="PROGRAMS_COUNT_CACHE_SIZE")
+    programs_count_check_sec: float = Field(default=5.0, env="PROGRAMS_COUNT_CHECK_SEC")
+    programs_count_estimate_min: int = Field(default=10000, env="PROGRAMS_COUNT_ESTIMATE_MIN")
+    embedding_socket: str | None = Field(default=None, env="EMBEDDING_SOCKET")
+    embedding_sidecar_timeout: float = Field(default=5.0, env="EMBEDDING_SIDECAR_TIMEOUT")
+    embedding_sidecar_fallback: bool = Field(default=False, env="EMBEDDING_SIDECAR_FALLBACK")
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
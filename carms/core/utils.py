@@ -4,3 +4,9 @@ def canonical_id(match_iteration_id: int, program_description_id: int) -> str:
 
 def normalize_json_id(json_id: str) -> str:
     return json_id.replace("|", "-")
+
+
+def contains_pattern(text: str) -> str:
+    """LIKE pattern matching `text` as a literal substring; pair with escape="\\"."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
@@ -29,6 +29,10 @@ class GoldProgramProfile(SQLModel, table=True):
     program_url: str | None = None
     description_text: str | None = None
     is_valid: bool = True
+    # Set on every rebuild; /programs drops cached totals when max(updated_at) moves.
+    updated_at: str | None = Field(
+        sa_column=sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), index=True),
+    )
 
 
 class GoldGeoSummary(SQLModel, table=True):
@@ -41,6 +45,9 @@ class GoldGeoSummary(SQLModel, table=True):
 
 class GoldProgramEmbedding(SQLModel, table=True):
     __tablename__ = "gold_program_embedding"
+    __table_args__ = (
+        sa.Index("ix_gold_program_embedding_province_discipline", "province", "discipline_name"),
+    )
 
     program_stream_id: int = Field(primary_key=True)
     program_name: str
@@ -49,6 +56,10 @@ class GoldProgramEmbedding(SQLModel, table=True):
     province: str = Field(index=True)
     description_text: str | None = None
     embedding: list[float] = Field(sa_column=_embedding_column())
+    # Set on every rebuild; the semantic API uses max(updated_at) to drop cached results.
+    updated_at: str | None = Field(
+        sa_column=sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
 
 
 class GoldMatchScenario(SQLModel, table=True):
@@ -57,16 +68,91 @@ class GoldMatchScenario(SQLModel, table=True):
     scenario_id: UUID = Field(primary_key=True)
     scenario_label: str | None = None
     scenario_type: str = Field(index=True)
-    province: str = Field(index=True)
-    discipline_name: str = Field(index=True)
+    # Composite key mirrors migration 20260212_0003; without it the identity map
+    # collapses every row of a scenario into one object on read.
+    province: str = Field(primary_key=True, index=True)
+    discipline_name: str = Field(primary_key=True, index=True)
     supply_quota: int
     demand_mean: float
     fill_rate_mean: float
     fill_rate_p05: float
     fill_rate_p95: float
+    fill_rate_se: float | None = None
+    iterations: int
+    seed: int | None = None
+    params: dict | None = Field(default=None, sa_column=sa.Column(sa.JSON))
+    cache_key: str | None = Field(default=None, index=True)
+    created_at: str | None = Field(
+        sa_column=sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), index=True)
+    )
+
+
+class GoldMatchScenarioRun(SQLModel, table=True):
+    """One row per scenario: metadata once, per-key stats and raw draws as npz blobs."""
+
+    __tablename__ = "gold_match_scenario_run"
+
+    scenario_id: UUID = Field(primary_key=True)
+    scenario_label: str | None = None
+    scenario_type: str = Field(index=True)
     iterations: int
     seed: int | None = None
     params: dict | None = Field(default=None, sa_column=sa.Column(sa.JSON))
+    cache_key: str | None = Field(default=None, index=True)
+    key_count: int
+    stats: bytes = Field(sa_column=sa.Column(sa.LargeBinary, nullable=False))
+    draws: bytes | None = Field(default=None, sa_column=sa.Column(sa.LargeBinary))
+    # Summary aggregates written at persist time so listings never open the blobs.
+    overall_fill_rate: float | None = None  # quota-weighted
+    min_fill_rate: float | None = None
+    total_quota: int | None = None
+    total_demand: float | None = None
     created_at: str | None = Field(
+        sa_column=sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), index=True)
+    )
+    # "YYYY-MM" of created_at; partition-like key for listing and retention.
+    partition_month: str | None = Field(default=None, index=True)
+
+
+class GoldPreferenceFeature(SQLModel, table=True):
+    """Preference features and scores per program, materialized per model version."""
+
+    __tablename__ = "gold_preference_features"
+    __table_args__ = (
+        sa.Index("ix_gold_preference_features_version_score", "model_version", "score"),
+        sa.Index(
+            "ix_gold_preference_features_version_province_score",
+            "model_version",
+            "province",
+            "score",
+        ),
+    )
+
+    model_version: str = Field(primary_key=True)
+    program_stream_id: int = Field(primary_key=True)
+    # artifact_fingerprint() of the weights the scores came from; a mismatch means stale.
+    artifact_fingerprint: str | None = None
+    program_name: str
+    program_stream_name: str
+    program_stream: str
+    discipline_name: str = Field(index=True)
+    province: str
+    feature_values: dict = Field(sa_column=sa.Column(sa.JSON, nullable=False))
+    label_proxy: float
+    score: float
+
+
+class GoldPreferenceStats(SQLModel, table=True):
+    """Ridge sufficient statistics over [1, X] per cycle and discipline."""
+
+    __tablename__ = "gold_preference_stats"
+
+    cycle: str = Field(primary_key=True)
+    discipline_name: str = Field(primary_key=True)
+    n: int
+    feature_names: list[str] = Field(sa_column=sa.Column(sa.JSON, nullable=False))
+    xtx: list[list[float]] = Field(sa_column=sa.Column(sa.JSON, nullable=False))
+    xty: list[float] = Field(sa_column=sa.Column(sa.JSON, nullable=False))
+    updated_at: str | None = Field(
         sa_column=sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now())
     )
@@ -1,5 +1,6 @@
 from dagster import (
     Definitions,
+    ScheduleDefinition,
     define_asset_job,
     load_asset_checks_from_modules,
     load_assets_from_modules,
@@ -18,5 +19,14 @@ init_db()
 all_assets = load_assets_from_modules([bronze_assets, silver_assets, gold_assets, analytics_assets])
 all_asset_checks = load_asset_checks_from_modules([asset_checks])
 materialize_all = define_asset_job("carms_job", selection="*")
+scenario_retention = define_asset_job(
+    "scenario_retention_job", selection=["gold_match_scenario_retention"]
+)
+scenario_retention_daily = ScheduleDefinition(job=scenario_retention, cron_schedule="0 3 * * *")
 
-defs = Definitions(assets=all_assets, asset_checks=all_asset_checks, jobs=[materialize_all])
+defs = Definitions(
+    assets=all_assets,
+    asset_checks=all_asset_checks,
+    jobs=[materialize_all, scenario_retention],
+    schedules=[scenario_retention_daily],
+)
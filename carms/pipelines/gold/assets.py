@@ -1,4 +1,5 @@
 from collections import defaultdict
+from datetime import datetime, timezone
 from functools import lru_cache
 
 from dagster import AssetIn, asset
@@ -7,6 +8,7 @@ from sqlmodel import Session, delete, select
 from carms.core.database import engine
 from carms.models.gold import GoldGeoSummary, GoldProgramEmbedding, GoldProgramProfile
 from carms.models.silver import SilverDescriptionSection, SilverProgram
+from carms.semantic.matrix import export_embedding_matrix
 
 DESCRIPTION_SECTION_ORDER = [
     "program_highlights",
@@ -62,6 +64,7 @@ def gold_program_profiles(silver_programs, silver_disciplines, silver_descriptio
         description_map = _aggregate_descriptions(sections)
 
         session.exec(delete(GoldProgramProfile))
+        built_at = datetime.now(timezone.utc)
         gold_rows: list[GoldProgramProfile] = []
         for program in programs:
             description_text = description_map.get(program.program_stream_id)
@@ -78,6 +81,7 @@ def gold_program_profiles(silver_programs, silver_disciplines, silver_descriptio
                     program_url=program.program_url,
                     description_text=description_text,
                     is_valid=program.is_valid,
+                    updated_at=built_at,
                 )
             )
 
@@ -106,6 +110,7 @@ def gold_program_embeddings(gold_program_profiles) -> int:  # type: ignore[unuse
     with Session(engine) as session:
         profiles = session.exec(select(GoldProgramProfile)).all()
         session.exec(delete(GoldProgramEmbedding))
+        built_at = datetime.now(timezone.utc)
 
         rows: list[GoldProgramEmbedding] = []
         for program in profiles:
@@ -122,6 +127,7 @@ def gold_program_embeddings(gold_program_profiles) -> int:  # type: ignore[unuse
                     province=program.province,
                     description_text=program.description_text,
                     embedding=embedding,
+                    updated_at=built_at,
                 )
             )
 
@@ -130,6 +136,16 @@ def gold_program_embeddings(gold_program_profiles) -> int:  # type: ignore[unuse
         return len(rows)
 
 
+@asset(
+    group_name="gold",
+    ins={"gold_program_embeddings": AssetIn("gold_program_embeddings")},
+)
+def gold_embedding_matrix(gold_program_embeddings) -> str:  # type: ignore[unused-argument]
+    """Versioned float32 .npy export of the embeddings that API workers memory-map."""
+    with Session(engine) as session:
+        return export_embedding_matrix(session)
+
+
 @asset(
     group_name="gold",
     ins={"silver_programs": AssetIn("silver_programs")},
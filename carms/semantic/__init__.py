@@ -0,0 +1 @@
+# Semantic search services shared by the API routes.
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import AsyncIterator, Sequence
+from typing import TYPE_CHECKING, Protocol
+
+from carms.semantic.cache import LRUCache
+
+if TYPE_CHECKING:
+    from carms.semantic.context import Passage
+
+ANSWER_MODEL = "gpt-4o-mini"
+ANSWER_PROMPT = (
+    "Use the program snippets to answer the question. "
+    "Keep answers grounded and cite program_stream_id when useful.\n\n"
+    "Question: {question}\n\nSnippets:\n{context}"
+)
+
+
+class Answerer(Protocol):
+    """Grounded answer over packed passages, whole or as a stream of text chunks."""
+
+    def invoke(self, question: str, passages: Sequence[Passage]) -> str: ...
+
+    def astream(self, question: str, passages: Sequence[Passage]) -> AsyncIterator[str]: ...
+
+
+class LangChainAnswerer:
+    """
+    Stuff-documents chain over ChatOpenAI, built once and shared across requests so
+    the HTTP connection pool and prompt are reused.
+    """
+
+    def __init__(self, api_key: str, timeout: float) -> None:
+        from langchain.chains.combine_documents import create_stuff_documents_chain
+        from langchain.prompts import ChatPromptTemplate
+        from langchain_openai import ChatOpenAI
+
+        llm = ChatOpenAI(
+            api_key=api_key, model=ANSWER_MODEL, temperature=0, timeout=timeout, streaming=True
+        )
+        prompt = ChatPromptTemplate.from_template(ANSWER_PROMPT)
+        self._chain = create_stuff_documents_chain(llm=llm, prompt=prompt)
+
+    @staticmethod
+    def _inputs(question: str, passages: Sequence[Passage]) -> dict:
+        from langchain.schema import Document
+
+        docs = [
+            Document(
+                page_content=passage.text,
+                metadata={
+                    "program_stream_id": passage.program_stream_id,
+                    "section": passage.section,
+                },
+            )
+            for passage in passages
+        ]
+        return {"input_documents": docs, "question": question}
+
+    def invoke(self, question: str, passages: Sequence[Passage]) -> str:
+        return self._chain.invoke(self._inputs(question, passages))
+
+    async def astream(self, question: str, passages: Sequence[Passage]) -> AsyncIterator[str]:
+        async for chunk in self._chain.astream(self._inputs(question, passages)):
+            if chunk:
+                yield chunk
+
+
+_answerers = LRUCache(maxsize=4)
+_build_lock = threading.Lock()
+
+
+def build_answerer(api_key: str, timeout: float) -> Answerer | None:
+    """
+    Pooled answerer per key; None when the LangChain/OpenAI extras are not installed.
+    Only successful builds are cached, so a failure is retried on the next request.
+    """
+    key = (api_key, timeout)
+    with _build_lock:
+        answerer = _answerers.get(key)
+        if answerer is None:
+            try:
+                answerer = LangChainAnswerer(api_key, timeout)
+            except Exception:
+                return None
+            _answerers.put(key, answerer)
+        return answerer
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Encodes a list of texts into an (n, dim) array in one forward pass.
+BatchEncoder = Callable[[list[str]], np.ndarray]
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent encode requests and runs them as one model batch.
+    Whatever is queued when the encoder frees up is taken at once (so load
+    naturally grows batches); `window_ms` optionally waits a little longer to
+    fill a batch. A single encoder thread keeps callers from contending for the model.
+    """
+
+    def __init__(self, encode_batch: BatchEncoder, max_batch: int = 32, window_ms: float = 2.0):
+        self._encode_batch = encode_batch
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window_ms) / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-batch")
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[tuple[str, asyncio.Future]] | None = None
+        self._worker: asyncio.Task | None = None
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+        # First call, or a new event loop (e.g. a fresh app instance in tests).
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker = loop.create_task(self._run())
+
+    async def encode(self, text: str) -> np.ndarray:
+        self._ensure_worker()
+        future: asyncio.Future = self._loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def encode_many(self, texts: list[str]) -> np.ndarray:
+        """Encode a caller-assembled batch in one pass on the shared encoder thread."""
+        if not texts:
+            return np.empty((0, 0))
+        loop = asyncio.get_running_loop()
+        vectors = await loop.run_in_executor(self._executor, self._encode_batch, texts)
+        self.batches += 1
+        self.items += len(texts)
+        return vectors
+
+    async def _collect(self) -> list[tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        deadline = self._loop.time() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = [item for item in await self._collect() if not item[1].done()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(
+                    self._executor, self._encode_batch, texts
+                )
+            except Exception as exc:  # surface model errors to every caller
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), vector in zip(batch, vectors, strict=True):
+                if not future.done():
+                    future.set_result(vector)
+
+    async def aclose(self) -> None:
+        worker, self._worker = self._worker, None
+        if worker is not None and not worker.done():
+            worker.cancel()
+            if worker.get_loop() is asyncio.get_running_loop():
+                try:
+                    await worker
+                except asyncio.CancelledError:
+                    pass
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.cancel()
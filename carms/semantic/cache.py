@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from carms.models.gold import GoldProgramEmbedding
+from carms.semantic.filtering import FilterCounts, load_filter_counts
+from carms.semantic.matrix import EmbeddingMatrix, load_embedding_matrix
+
+CACHE_CHECK_INTERVAL_SEC = 5.0
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for query text; the MiniLM tokenizer is uncased, so case is dropped."""
+    return " ".join(text.lower().split())
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = max(0, maxsize)
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def embedding_table_stamp(session: Session) -> tuple:
+    """Cheap change marker for gold_program_embedding: row count and latest rebuild time."""
+    count, latest = session.exec(
+        select(func.count(), func.max(GoldProgramEmbedding.updated_at))
+    ).one()
+    return int(count), str(latest)
+
+
+class SemanticCache:
+    """
+    Query-embedding cache (depends only on the text), plus a result cache, filter
+    counts and the in-memory embedding matrix, which depend on the embedding table.
+    Table-derived entries are dropped when the table stamp changes; the stamp is
+    re-read at most once per `check_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        embedding_size: int = 1024,
+        result_size: int = 512,
+        check_interval: float = CACHE_CHECK_INTERVAL_SEC,
+    ) -> None:
+        self.embeddings = LRUCache(embedding_size)
+        self.results = LRUCache(result_size)
+        self._check_interval = check_interval
+        self._stamp: tuple | None = None
+        self._checked_at = float("-inf")
+        self._table_entries: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def sync(self, session: Session) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self._check_interval:
+                return
+            stamp = embedding_table_stamp(session)
+            self._checked_at = now
+            if stamp != self._stamp:
+                self.results.clear()
+                self._table_entries.clear()
+                self._stamp = stamp
+
+    def invalidate(self) -> None:
+        """Drop cached results and force a stamp check on the next request."""
+        with self._lock:
+            self.results.clear()
+            self._table_entries.clear()
+            self._checked_at = float("-inf")
+
+    def _table_entry(self, name: str, session: Session, loader) -> Any:
+        with self._lock:
+            entry = self._table_entries.get(name)
+        if entry is None:
+            entry = loader(session)
+            with self._lock:
+                self._table_entries[name] = entry
+        return entry
+
+    def filter_counts(self, session: Session) -> FilterCounts:
+        return self._table_entry("filter_counts", session, load_filter_counts)
+
+    def embedding_matrix(self, session: Session) -> EmbeddingMatrix:
+        return self._table_entry("embedding_matrix", session, load_embedding_matrix)
+
+    def get_embedding(self, query_key: str) -> np.ndarray | None:
+        return self.embeddings.get(query_key)
+
+    def put_embedding(self, query_key: str, embedding: np.ndarray) -> None:
+        self.embeddings.put(query_key, embedding)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import math
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from carms.semantic.hybrid import lexical_terms
+
+if TYPE_CHECKING:
+    from carms.api.schemas import SemanticHit
+
+# Sections are rendered by gold_program_profiles as "## Title\ntext" blocks.
+_SECTION_RE = re.compile(r"^## (.+)$", re.MULTILINE)
+# Passage score = hit similarity + LEXICAL_WEIGHT * share of query terms in the section.
+LEXICAL_WEIGHT = 0.25
+# Passages that would be cut below this many tokens are skipped instead.
+MIN_PASSAGE_TOKENS = 24
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """cl100k tokenizer when tiktoken (a langchain-openai dependency) is usable, else None."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    return cut[: cut.rfind(" ")] if " " in cut else cut
+
+
+def split_sections(description_text: str | None) -> list[tuple[str, str]]:
+    """(title, text) per rendered section; unheaded text is one "Description" section."""
+    if not description_text:
+        return []
+    parts = _SECTION_RE.split(description_text)
+    sections = [("Description", parts[0].strip())] if parts[0].strip() else []
+    sections.extend(
+        (title.strip(), body.strip())
+        for title, body in zip(parts[1::2], parts[2::2], strict=True)
+        if body.strip()
+    )
+    return sections
+
+
+@dataclass(frozen=True)
+class Passage:
+    program_stream_id: int
+    program_name: str
+    section: str
+    text: str
+    score: float
+    tokens: int
+
+
+@dataclass
+class PackedContext:
+    passages: list[Passage] = field(default_factory=list)
+    tokens_used: int = 0
+    budget: int = 0
+    candidates: int = 0
+    duplicates: int = 0
+
+
+def pack_context(
+    question: str,
+    hits: Sequence[SemanticHit],
+    descriptions: dict[int, str | None],
+    budget: int,
+    max_passage_tokens: int,
+) -> PackedContext:
+    """
+    Greedy packing of the best section-level passages under `budget` tokens.
+    Sections repeated verbatim across programs (shared school boilerplate) are kept once.
+    """
+    terms = set(lexical_terms(question))
+    candidates: list[tuple[float, SemanticHit, str, str]] = []
+    for hit in hits:
+        sections = split_sections(descriptions.get(hit.program_stream_id))
+        if not sections and hit.description_snippet:
+            sections = [("Description", hit.description_snippet)]
+        for title, body in sections:
+            overlap = len(terms & set(lexical_terms(body))) / len(terms) if terms else 0.0
+            candidates.append((hit.similarity + LEXICAL_WEIGHT * overlap, hit, title, body))
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    packed = PackedContext(budget=budget, candidates=len(candidates))
+    seen: set[str] = set()
+    for score, hit, title, body in candidates:
+        fingerprint = " ".join(body.lower().split())
+        if fingerprint in seen:
+            packed.duplicates += 1
+            continue
+        seen.add(fingerprint)
+
+        remaining = budget - packed.tokens_used
+        if remaining < MIN_PASSAGE_TOKENS:
+            break
+        text = f"{hit.program_name} ({hit.program_stream_id}) - {title}: {body}"
+        tokens = count_tokens(text)
+        limit = min(max_passage_tokens, remaining)
+        if tokens > limit:
+            if limit < MIN_PASSAGE_TOKENS:
+                continue
+            text = truncate_to_tokens(text, limit)
+            tokens = count_tokens(text)
+            if tokens > remaining:  # decode/encode round trips can shift a token
+                continue
+        packed.passages.append(
+            Passage(hit.program_stream_id, hit.program_name, title, text, score, tokens)
+        )
+        packed.tokens_used += tokens
+    return packed
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+from sqlalchemy import bindparam, func, text
+from sqlmodel import Session, select
+
+from carms.models.gold import GoldProgramEmbedding
+
+# Filters matching at most this many rows (or this share of the table) are searched
+# exactly over the btree-filtered rows; broader filters keep the ANN index.
+EXACT_SCAN_MAX_ROWS = 2000
+EXACT_SCAN_MAX_SELECTIVITY = 0.1
+# ANN over-fetch for broad filters: top_k / selectivity, times this margin, capped.
+OVERFETCH_MARGIN = 2.0
+MAX_OVERFETCH = 4000
+IVFFLAT_PROBES = 10
+
+FilterCounts = dict[tuple[str, str], int]
+
+_COLUMNS = """
+    program_stream_id,
+    program_name,
+    program_stream_name,
+    discipline_name,
+    province,
+    description_text"""
+
+
+def load_filter_counts(session: Session) -> FilterCounts:
+    """Row counts per (province, discipline); small enough to hold per worker."""
+    rows = session.exec(
+        select(
+            GoldProgramEmbedding.province,
+            GoldProgramEmbedding.discipline_name,
+            func.count(),
+        ).group_by(GoldProgramEmbedding.province, GoldProgramEmbedding.discipline_name)
+    ).all()
+    return {(province, discipline): int(n) for province, discipline, n in rows}
+
+
+@dataclass(frozen=True)
+class FilterPlan:
+    """
+    strategy: "index" (no filters), "exact" (selective filter, btree rows then exact
+    distance), "overfetch" (broad filter, ANN with over-fetch) or "empty" (no match).
+    disciplines: exact names the discipline substring resolved to, or None if unfiltered.
+    """
+
+    strategy: str
+    province: str | None
+    disciplines: list[str] | None
+    matching_rows: int
+    total_rows: int
+    fetch: int
+
+
+def plan_filtered_search(
+    counts: FilterCounts, province: str | None, discipline: str | None, top_k: int
+) -> FilterPlan:
+    total = sum(counts.values())
+    disciplines = None
+    if discipline:
+        needle = discipline.lower()
+        disciplines = sorted({d for _, d in counts if needle in d.lower()})
+    matching = sum(
+        n
+        for (p, d), n in counts.items()
+        if (province is None or p == province) and (disciplines is None or d in disciplines)
+    )
+
+    def plan(strategy: str, fetch: int) -> FilterPlan:
+        return FilterPlan(strategy, province, disciplines, matching, total, fetch)
+
+    if province is None and disciplines is None:
+        return plan("index", top_k)
+    if matching == 0:
+        return plan("empty", 0)
+    selectivity = matching / total
+    if matching <= EXACT_SCAN_MAX_ROWS or selectivity <= EXACT_SCAN_MAX_SELECTIVITY:
+        return plan("exact", top_k)
+    fetch = min(MAX_OVERFETCH, math.ceil(top_k / selectivity * OVERFETCH_MARGIN))
+    return plan("overfetch", max(fetch, top_k))
+
+
+def filter_clause(plan: FilterPlan, alias: str = "") -> tuple[str, dict]:
+    """SQL conditions and params for the plan's filters (always a valid WHERE fragment)."""
+    prefix = f"{alias}." if alias else ""
+    conditions = ["TRUE"]
+    params: dict = {}
+    if plan.province is not None:
+        conditions.append(f"{prefix}province = :province")
+        params["province"] = plan.province
+    if plan.disciplines is not None:
+        conditions.append(f"{prefix}discipline_name IN :disciplines")
+        params["disciplines"] = plan.disciplines
+    return " AND ".join(conditions), params
+
+
+def bind_filters(stmt, params: dict):
+    return (
+        stmt.bindparams(bindparam("disciplines", expanding=True))
+        if "disciplines" in params
+        else stmt
+    )
+
+
+def postgres_vector_rows(
+    session: Session, plan: FilterPlan, query_embedding: list[float], top_k: int
+) -> list:
+    """Rows with a `similarity` column, nearest first, using the plan's strategy."""
+    where, params = filter_clause(plan)
+    params = {**params, "query_embedding": query_embedding, "top_k": top_k}
+    distance = "embedding <=> (:query_embedding)::vector"
+
+    if plan.strategy == "overfetch":
+        session.execute(text(f"SET LOCAL ivfflat.probes = {IVFFLAT_PROBES}"))
+        stmt = text(
+            f"""
+            SELECT {_COLUMNS}, 1 - distance AS similarity
+            FROM (
+                SELECT {_COLUMNS}, {distance} AS distance
+                FROM gold_program_embedding
+                ORDER BY {distance}
+                LIMIT :fetch
+            ) AS ann
+            WHERE {where}
+            ORDER BY distance
+            LIMIT :top_k
+            """
+        )
+        rows = session.execute(bind_filters(stmt, params), {**params, "fetch": plan.fetch}).all()
+        if len(rows) >= min(top_k, plan.matching_rows):
+            return [row._mapping for row in rows]
+        # The index did not surface enough filtered rows; fall through to an exact scan.
+
+    if plan.strategy in ("exact", "overfetch"):
+        # MATERIALIZED keeps the planner from pushing ORDER BY distance into the ANN
+        # index, so the filter runs on its btree indexes first and returns a full top_k.
+        stmt = text(
+            f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT {_COLUMNS}, embedding
+                FROM gold_program_embedding
+                WHERE {where}
+            )
+            SELECT {_COLUMNS}, 1 - ({distance}) AS similarity
+            FROM candidates
+            ORDER BY {distance}
+            LIMIT :top_k
+            """
+        )
+    else:
+        stmt = text(
+            f"""
+            SELECT {_COLUMNS}, 1 - ({distance}) AS similarity
+            FROM gold_program_embedding
+            ORDER BY {distance}
+            LIMIT :top_k
+            """
+        )
+    return [row._mapping for row in session.execute(bind_filters(stmt, params), params).all()]
+
+
+def postgres_batch_vector_rows(
+    session: Session,
+    plans: list[FilterPlan],
+    query_embeddings: list[list[float]],
+    top_k: int,
+) -> list[list]:
+    """
+    Rows per query for a whole batch in one statement: a LATERAL top-k for each row of
+    a VALUES list of (query vector, province, disciplines). Unfiltered queries order by
+    the ANN index. Filtered queries order by `distance + 0`, which the index cannot
+    serve, so the btree filters run first and every query gets a full top_k.
+    """
+    results: list[list] = [[] for _ in plans]
+    unfiltered = [i for i, plan in enumerate(plans) if plan.strategy == "index"]
+    filtered = [i for i, plan in enumerate(plans) if plan.strategy in ("exact", "overfetch")]
+    params: dict = {"top_k": top_k}
+    branches = []
+    distance = "e.embedding <=> q.embedding"
+    for items, order in ((unfiltered, distance), (filtered, f"({distance}) + 0")):
+        if not items:
+            continue
+        values = []
+        for i in items:
+            values.append(
+                f"(CAST(:ord_{i} AS integer), CAST(:embedding_{i} AS vector), "
+                f"CAST(:province_{i} AS text), CAST(:disciplines_{i} AS text[]))"
+            )
+            params[f"ord_{i}"] = i
+            params[f"embedding_{i}"] = query_embeddings[i]
+            params[f"province_{i}"] = plans[i].province
+            params[f"disciplines_{i}"] = plans[i].disciplines
+        branches.append(
+            f"""
+            SELECT q.ord, hit.*
+            FROM (VALUES {", ".join(values)}) AS q(ord, embedding, province, disciplines)
+            CROSS JOIN LATERAL (
+                SELECT {_COLUMNS}, 1 - ({distance}) AS similarity
+                FROM gold_program_embedding AS e
+                WHERE (q.province IS NULL OR e.province = q.province)
+                  AND (q.disciplines IS NULL OR e.discipline_name = ANY(q.disciplines))
+                ORDER BY {order}
+                LIMIT :top_k
+            ) AS hit
+            """
+        )
+    if not branches:
+        return results
+
+    stmt = text(" UNION ALL ".join(branches) + " ORDER BY ord, similarity DESC")
+    for row in session.execute(stmt, params).all():
+        results[row.ord].append(row._mapping)
+    return results
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+
+# Standard RRF constant; large enough that one list's top rank cannot swamp the other.
+RRF_K = 60
+# Each retriever contributes this many candidates per requested hit (at least MIN_CANDIDATES).
+CANDIDATE_MULTIPLIER = 4
+MIN_CANDIDATES = 20
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def candidate_count(top_k: int) -> int:
+    return max(top_k * CANDIDATE_MULTIPLIER, MIN_CANDIDATES)
+
+
+def lexical_terms(text: str) -> list[str]:
+    return _TERM_RE.findall(text.lower())
+
+
+def fts5_match_expression(text: str) -> str | None:
+    """
+    FTS5 MATCH string: the whole query as a phrase OR any of its terms, each quoted
+    so user input can never be parsed as FTS syntax. bm25 ranks phrase matches first.
+    """
+    terms = lexical_terms(text)
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in dict.fromkeys(terms)]
+    if len(terms) > 1:
+        quoted.insert(0, '"' + " ".join(terms) + '"')
+    return " OR ".join(quoted)
+
+
+def tsquery_expression(text: str) -> str | None:
+    """OR of the query terms for Postgres `to_tsquery`; ts_rank_cd favours fuller matches."""
+    terms = list(dict.fromkeys(lexical_terms(text)))
+    return " | ".join(terms) if terms else None
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], k: int = RRF_K
+) -> list[tuple[int, float]]:
+    """Fuse ranked id lists by sum(1 / (k + rank)); ties keep first-seen order."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    order = {item: i for i, item in enumerate(scores)}
+    return sorted(scores.items(), key=lambda kv: (-kv[1], order[kv[0]]))
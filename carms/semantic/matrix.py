@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from sqlmodel import Session, select
+
+from carms.models.gold import GoldProgramEmbedding
+
+CURRENT_POINTER = "CURRENT"
+VECTORS_FILE = "vectors.npy"
+INDEX_FILE = "index.npz"
+# Older exports kept on disk so workers still mapping them are never cut off mid-read.
+KEEP_EXPORTS = 3
+MATRIX_CHECK_INTERVAL_SEC = 5.0
+
+
+def get_export_dir() -> Path:
+    """
+    Root of the embedding matrix exports: EMBEDDING_EXPORT_DIR, else data/embeddings.
+    Each export is a UTC-timestamp version directory holding vectors.npy and index.npz;
+    the CURRENT file names the version workers map, and the newest KEEP_EXPORTS
+    versions are kept.
+    """
+    override = os.getenv("EMBEDDING_EXPORT_DIR")
+    if override:
+        return Path(override)
+    return Path(__file__).resolve().parents[2] / "data" / "embeddings"
+
+
+@dataclass(frozen=True)
+class EmbeddingMatrix:
+    """Row-aligned program ids, filter columns and L2-normalized float32 embeddings."""
+
+    program_stream_ids: np.ndarray
+    provinces: np.ndarray
+    disciplines: np.ndarray
+    vectors: np.ndarray  # (n, dim), unit rows (zero rows stay zero); may be a read-only memmap
+    version: str | None = None  # export version; None when loaded from the table
+
+    def __len__(self) -> int:
+        return int(self.program_stream_ids.size)
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def load_embedding_matrix(session: Session) -> EmbeddingMatrix:
+    rows = session.exec(
+        select(
+            GoldProgramEmbedding.program_stream_id,
+            GoldProgramEmbedding.province,
+            GoldProgramEmbedding.discipline_name,
+            GoldProgramEmbedding.embedding,
+        ).order_by(GoldProgramEmbedding.program_stream_id)
+    ).all()
+    vectors = [json.loads(r[3]) if isinstance(r[3], str) else r[3] for r in rows]
+    dim = len(vectors[0]) if vectors else 0
+    return EmbeddingMatrix(
+        program_stream_ids=np.array([r[0] for r in rows], dtype=np.int64),
+        provinces=np.array([r[1] for r in rows], dtype=str),
+        disciplines=np.array([r[2] for r in rows], dtype=str),
+        vectors=_unit_rows(np.asarray(vectors, dtype=np.float32).reshape(len(rows), dim)),
+    )
+
+
+def export_embedding_matrix(session: Session, directory: Path | None = None) -> str:
+    """
+    Write the table as a new versioned export and point CURRENT at it.
+    Files are written into a temp dir, renamed into place, then CURRENT is replaced,
+    so readers only ever see complete versions.
+    """
+    directory = directory or get_export_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    matrix = load_embedding_matrix(session)
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+    staging = directory / f".{version}.tmp"
+    staging.mkdir()
+    np.save(staging / VECTORS_FILE, np.ascontiguousarray(matrix.vectors, dtype=np.float32))
+    np.savez(
+        staging / INDEX_FILE,
+        program_stream_ids=matrix.program_stream_ids,
+        provinces=matrix.provinces,
+        disciplines=matrix.disciplines,
+    )
+    os.replace(staging, directory / version)
+
+    pointer = directory / f"{CURRENT_POINTER}.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, directory / CURRENT_POINTER)
+
+    exports = sorted(p for p in directory.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for stale in exports[:-KEEP_EXPORTS]:
+        shutil.rmtree(stale, ignore_errors=True)
+    return version
+
+
+def open_embedding_matrix(directory: Path, version: str) -> EmbeddingMatrix:
+    """Memory-map an export; every process mapping it shares the same page cache."""
+    root = directory / version
+    with np.load(root / INDEX_FILE, allow_pickle=False) as index:
+        ids, provinces, disciplines = (
+            index["program_stream_ids"],
+            index["provinces"],
+            index["disciplines"],
+        )
+    vectors = np.load(root / VECTORS_FILE, mmap_mode="r")
+    return EmbeddingMatrix(ids, provinces, disciplines, vectors, version)
+
+
+class MatrixStore:
+    """
+    Current exported matrix for this process. CURRENT is re-read at most once per
+    check interval; a new version is mapped and swapped in as one reference assignment,
+    so in-flight searches keep the matrix they started with.
+    """
+
+    def __init__(
+        self, directory: Path | None = None, check_interval: float = MATRIX_CHECK_INTERVAL_SEC
+    ) -> None:
+        self.directory = directory or get_export_dir()
+        self._check_interval = check_interval
+        self._matrix: EmbeddingMatrix | None = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _read_pointer(self) -> str | None:
+        try:
+            return (self.directory / CURRENT_POINTER).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current(self) -> EmbeddingMatrix | None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self._check_interval:
+                return self._matrix
+            self._checked_at = now
+            version = self._read_pointer()
+            if version is None:
+                self._matrix = None
+            elif self._matrix is None or self._matrix.version != version:
+                try:
+                    self._matrix = open_embedding_matrix(self.directory, version)
+                except (FileNotFoundError, ValueError, OSError):
+                    pass  # keep serving the previous version
+            return self._matrix
+
+
+def filter_mask(
+    matrix: EmbeddingMatrix, province: str | None, disciplines: list[str] | None
+) -> np.ndarray | None:
+    """Boolean row mask for the filters, or None when unfiltered."""
+    if province is None and disciplines is None:
+        return None
+    mask = np.ones(len(matrix), dtype=bool)
+    if province is not None:
+        mask &= matrix.provinces == province
+    if disciplines is not None:
+        mask &= np.isin(matrix.disciplines, disciplines)
+    return mask
+
+
+def search_many(
+    matrix: EmbeddingMatrix,
+    queries: np.ndarray,
+    masks: list[np.ndarray | None],
+    top_k: int,
+) -> list[list[tuple[int, float]]]:
+    """
+    Cosine top-k for every query with one (q, dim) @ (dim, n) product.
+    Returns (program_stream_id, similarity) pairs per query, best first, masked rows excluded.
+    """
+    if len(matrix) == 0:
+        return [[] for _ in masks]
+    scores = _unit_rows(np.atleast_2d(queries).astype(np.float32)) @ matrix.vectors.T
+    k = min(top_k, len(matrix))
+    results = []
+    for row_scores, mask in zip(scores, masks, strict=True):
+        if mask is not None:
+            row_scores = np.where(mask, row_scores, -np.inf)
+        top = np.argpartition(-row_scores, k - 1)[:k]
+        top = top[np.argsort(-row_scores[top], kind="stable")]
+        results.append(
+            [
+                (int(matrix.program_stream_ids[i]), float(row_scores[i]))
+                for i in top
+                if np.isfinite(row_scores[i])
+            ]
+        )
+    return results
@@ -0,0 +1,171 @@
+"""
+Local embedding sidecar: one process owns the SentenceTransformer (and torch) and
+serves encode requests to API workers over a Unix socket.
+
+Wire format, both directions: 4-byte big-endian length + payload.
+Request: JSON {"texts": [...]}. Response: JSON header {"shape": [n, dim]} or
+{"error": "..."}, then a frame of float32 row-major vectors.
+
+Run with `python -m carms.semantic.sidecar --socket data/embedder.sock`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+from collections.abc import Callable
+
+import numpy as np
+
+from carms.semantic.batching import EmbeddingBatcher
+
+SIDECAR_MODEL = "all-MiniLM-L6-v2"
+_LENGTH = struct.Struct(">I")
+
+
+def _frame(payload: bytes) -> bytes:
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(size - len(chunks))
+        if not chunk:
+            raise ConnectionError("embedding sidecar closed the connection")
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(size)
+
+
+class SidecarClient:
+    """
+    Blocking client holding one persistent connection, reconnecting once on failure.
+    Raises ConnectionRefusedError/FileNotFoundError when no sidecar is listening,
+    TimeoutError when it does not answer within `timeout` (not retried), other OSError
+    subclasses on a dropped connection and RuntimeError when the sidecar reports an error.
+    """
+
+    def __init__(self, path: str, timeout: float = 10.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        return sock
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        request = _frame(json.dumps({"texts": texts}).encode())
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    sock = self._sock or self._connect()
+                    sock.sendall(request)
+                    header = json.loads(_recv_frame(sock))
+                    body = _recv_frame(sock)
+                    break
+                except TimeoutError:
+                    self.close()  # a late reply would desync the stream
+                    raise
+                except OSError:
+                    self.close()
+                    if attempt:
+                        raise
+        if "error" in header:
+            raise RuntimeError(f"embedding sidecar error: {header['error']}")
+        return np.frombuffer(body, dtype=np.float32).reshape(header["shape"])
+
+
+class EmbeddingServer:
+    """Serves encode requests, coalescing texts from all connections into model batches."""
+
+    def __init__(
+        self,
+        encode_batch: Callable[[list[str]], np.ndarray],
+        max_batch: int = 64,
+        window_ms: float = 2.0,
+    ) -> None:
+        self.batcher = EmbeddingBatcher(encode_batch, max_batch=max_batch, window_ms=window_ms)
+
+    async def _encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        vectors = await asyncio.gather(*(self.batcher.encode(t) for t in texts))
+        return np.stack(vectors).astype(np.float32)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                try:
+                    vectors = await self._encode(list(json.loads(request)["texts"]))
+                    header, body = {"shape": list(vectors.shape)}, vectors.tobytes()
+                except Exception as exc:  # report to the client, keep serving
+                    header, body = {"error": str(exc)}, b""
+                writer.write(_frame(json.dumps(header).encode()) + _frame(body))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, path: str) -> asyncio.AbstractServer:
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        return await asyncio.start_unix_server(self.handle, path=path)
+
+
+def _load_encoder(model_name: str) -> Callable[[list[str]], np.ndarray]:
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    return lambda texts: np.asarray(model.encode(texts, normalize_embeddings=True))
+
+
+async def _serve(path: str, model_name: str, max_batch: int, window_ms: float) -> None:
+    server = EmbeddingServer(_load_encoder(model_name), max_batch, window_ms)
+    async with await server.start(path) as listener:
+        await listener.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CaRMS embedding sidecar")
+    parser.add_argument("--socket", required=True, help="Unix socket path to listen on")
+    parser.add_argument("--model", default=SIDECAR_MODEL)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.socket, args.model, args.max_batch, args.window_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 import os
+from datetime import datetime, timezone
 from importlib import reload
 
+import pytest
 from fastapi.testclient import TestClient
+from sqlmodel import Session, delete, update
 
 os.environ.setdefault("DB_URL", "sqlite:///./test_api_import.db")
 
+import carms.api.counts as counts
 import carms.api.deps as deps
 import carms.api.main as main
+import carms.api.routes.programs as programs
+import carms.core.database as db
+from carms.models.gold import GoldProgramProfile
 
 
 def _fresh_app(db_url: str | None = None):
@@ -60,3 +67,164 @@ def test_rate_limit(monkeypatch):
     second = client.get("/health")
     assert first.status_code == 200
     assert second.status_code == 429
+
+
+def _seeded_client(tmp_path, count: int = 25) -> TestClient:
+    os.environ["DB_URL"] = f"sqlite:///{tmp_path / 'programs.db'}"
+    reload(db)
+    reload(programs)
+    app = _fresh_app()
+    db.init_db()
+    with Session(db.engine) as session:
+        # Insert out of id order so an unordered scan would not match id order.
+        for i in sorted(range(1, count + 1), key=lambda i: (i * 7) % count):
+            session.add(
+                GoldProgramProfile(
+                    program_stream_id=i,
+                    program_name=f"Program {i}",
+                    program_stream_name=f"Stream {i}",
+                    program_stream="CMG",
+                    discipline_name="Family Medicine" if i % 2 else "Internal Medicine",
+                    province="ON" if i % 3 else "QC",
+                    school_name=f"School {i % 4}",
+                    program_site="Site",
+                )
+            )
+        session.commit()
+    return TestClient(app)
+
+
+def test_programs_keyset_pagination(tmp_path):
+    client = _seeded_client(tmp_path)
+    params = {"discipline": "family", "limit": 4}
+    seen: list[int] = []
+    cursor = None
+    while True:
+        body = client.get("/programs", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert body.status_code == 200
+        page = body.json()
+        seen.extend(item["program_stream_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == list(range(1, 26, 2))  # every odd id once, in key order
+
+    first = client.get("/programs", params=params).json()
+    assert [i["program_stream_id"] for i in first["items"]] == [1, 3, 5, 7]
+    offset_page = client.get("/programs", params={**params, "offset": 4}).json()
+    second = client.get("/programs", params={**params, "cursor": first["next_cursor"]}).json()
+    assert offset_page["items"] == second["items"]
+
+    mismatched = {"discipline": "internal", "cursor": first["next_cursor"]}
+    assert client.get("/programs", params=mismatched).status_code == 422
+    assert client.get("/programs", params={"cursor": "not-a-cursor"}).status_code == 422
+    both = {**params, "cursor": first["next_cursor"], "offset": 4}
+    assert client.get("/programs", params=both).status_code == 422
+
+
+def test_programs_fuzzy_search(tmp_path):
+    client = _seeded_client(tmp_path)
+    body = client.get("/programs", params={"q": "famly", "include_total": True}).json()
+    assert body["total"] == 13  # typo still finds every Family Medicine row
+    assert {i["discipline_name"] for i in body["items"]} == {"Family Medicine"}
+    assert all(i["match_score"] >= programs.FUZZY_MIN_SIMILARITY for i in body["items"])
+
+    ranked = client.get("/programs", params={"q": "program 7", "limit": 3}).json()["items"]
+    assert ranked[0]["program_stream_id"] == 7 and ranked[0]["match_score"] == 1.0
+    assert ranked == sorted(ranked, key=lambda i: -i["match_score"])
+
+    narrowed = client.get("/programs", params={"q": "famly", "province": "QC"}).json()
+    assert [i["program_stream_id"] for i in narrowed["items"]] == [3, 9, 15, 21]
+    assert client.get("/programs", params={"q": "x"}).status_code == 422
+    first = client.get("/programs", params={"limit": 2}).json()
+    with_cursor = {"q": "famly", "cursor": first["next_cursor"]}
+    assert client.get("/programs", params=with_cursor).status_code == 422
+
+
+def test_programs_total_cached_until_gold_reload(tmp_path, monkeypatch):
+    client = _seeded_client(tmp_path)
+    monkeypatch.setattr(programs, "_counts", counts.ProgramCountCache(check_interval=0.0))
+    params = {"discipline": "family", "include_total": True, "limit": 2}
+    first = client.get("/programs", params=params).json()
+    assert first["total"] == 13 and first["total_is_approximate"] is False
+    assert client.get("/programs", params={**params, "offset": 2}).json()["total"] == 13
+    assert programs._counts.totals.stats()["hits"] == 1  # second page skipped COUNT(*)
+
+    with Session(db.engine) as session:  # gold reload: rows replaced with a new updated_at
+        session.exec(delete(GoldProgramProfile).where(GoldProgramProfile.program_stream_id > 20))
+        session.exec(
+            update(GoldProgramProfile).values(updated_at=datetime(2030, 1, 1, tzinfo=timezone.utc))
+        )
+        session.commit()
+    assert client.get("/programs", params=params).json()["total"] == 10
+    assert client.get("/programs", params={"limit": 1}).json()["total_is_approximate"] is None
+
+    # Broad filters take the planner estimate (Postgres only) instead of counting.
+    monkeypatch.setattr(counts, "planner_row_estimate", lambda session, statement: 50000)
+    broad = client.get("/programs", params={"include_total": True, "limit": 1}).json()
+    assert broad["total"] == 50000 and broad["total_is_approximate"] is True
+
+
+def test_search_clause_escapes_like_wildcards():
+    from sqlalchemy.dialects import postgresql
+
+    compiled = programs.search_clause("100%_match").compile(dialect=postgresql.dialect())
+    assert "ESCAPE" in str(compiled)
+    assert "%100\\%\\_match%" in compiled.params.values()
+
+
+def test_count_cache_estimate_threshold(tmp_path, monkeypatch):
+    from sqlmodel import select
+
+    _seeded_client(tmp_path)
+    cache = counts.ProgramCountCache(check_interval=60.0, estimate_min=100)
+    statement = select(GoldProgramProfile).where(GoldProgramProfile.province == "QC")
+    with Session(db.engine) as session:
+        monkeypatch.setattr(counts, "planner_row_estimate", lambda session, statement: 100)
+        assert cache.total(session, statement, "qc") == (100, True)
+        assert cache.totals.get("qc") is None  # estimates are never cached
+
+        monkeypatch.setattr(counts, "planner_row_estimate", lambda session, statement: 99)
+        exact, approximate = cache.total(session, statement, "qc")
+        assert approximate is False and exact < 99
+        assert cache.totals.get("qc") == exact
+
+        # A cached exact total wins even if the estimate later crosses the threshold.
+        monkeypatch.setattr(counts, "planner_row_estimate", lambda session, statement: 10**6)
+        assert cache.total(session, statement, "qc") == (exact, False)
+
+
+@pytest.mark.skipif(
+    not os.getenv("TEST_PG_URL"), reason="set TEST_PG_URL to a migrated Postgres database"
+)
+def test_programs_fuzzy_search_uses_trigram_index():
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.dialects import postgresql
+    from sqlmodel import select
+
+    statement = select(GoldProgramProfile.program_stream_id).where(programs.search_clause("famly"))
+    compiled = statement.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    engine = create_engine(os.environ["TEST_PG_URL"])
+    with engine.begin() as conn:
+        # Tiny test tables favour a seq scan; disable it to check the index is usable.
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {compiled}")))
+    engine.dispose()
+    for column in ("program_name", "discipline_name", "school_name"):
+        assert f"ix_gold_program_profile_{column}_trgm" in plan
+
+
+@pytest.mark.skipif(
+    not os.getenv("TEST_PG_URL"), reason="set TEST_PG_URL to a migrated Postgres database"
+)
+def test_planner_row_estimate_on_postgres():
+    from sqlalchemy import create_engine
+    from sqlmodel import select
+
+    engine = create_engine(os.environ["TEST_PG_URL"])
+    with Session(engine) as session:
+        statement = select(GoldProgramProfile).where(GoldProgramProfile.province == "ON")
+        assert counts.planner_row_estimate(session, statement) >= 0
+    engine.dispose()
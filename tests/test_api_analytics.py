@@ -1,21 +1,26 @@
 import os
+import time
 from importlib import reload
 from uuid import uuid4
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlmodel import Session, delete
 
 os.environ.setdefault("DB_URL", "sqlite:///./test_api_analytics_import.db")
 
 import carms.api.deps as deps
 import carms.api.main as main
 import carms.core.database as db
+from carms.analytics import preferences
 from carms.models.silver import SilverProgram
 
 
-def _client(tmp_path):
+def _client(tmp_path, monkeypatch):
     db_path = tmp_path / "api_sim.db"
     os.environ["DB_URL"] = f"sqlite:///{db_path}"
+    # The match engine trains a preference model on demand; keep it out of the checkout.
+    monkeypatch.setenv("PREFERENCE_ARTIFACT_PATH", str(tmp_path / "pref_model.json"))
+    monkeypatch.setattr(preferences, "_registry", None)
     reload(db)
     reload(deps)
     reload(main)
@@ -43,8 +48,8 @@ def _client(tmp_path):
     return TestClient(app)
 
 
-def test_simulate_endpoint_happy_path(tmp_path):
-    client = _client(tmp_path)
+def test_simulate_endpoint_happy_path(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
     resp = client.post(
         "/analytics/simulate",
         json={"scenario_type": "baseline", "iterations": 60, "seed": 1},
@@ -60,8 +65,8 @@ def test_simulate_endpoint_happy_path(tmp_path):
     )
 
 
-def test_simulate_endpoint_validation(tmp_path):
-    client = _client(tmp_path)
+def test_simulate_endpoint_validation(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
     resp = client.post(
         "/analytics/simulate",
         json={"scenario_type": "baseline", "iterations": 10},
@@ -69,8 +74,147 @@ def test_simulate_endpoint_validation(tmp_path):
     assert resp.status_code == 422
 
 
-def test_get_simulation_not_found(tmp_path):
-    client = _client(tmp_path)
+def test_get_simulation_not_found(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
     missing_id = str(uuid4())
     resp = client.get(f"/analytics/simulate/{missing_id}")
     assert resp.status_code == 404
+
+
+def test_simulate_sweep_endpoint(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    resp = client.post(
+        "/analytics/simulate/sweep",
+        json={
+            "base": {"scenario_type": "quota_shock", "iterations": 50, "seed": 2, "persist": False},
+            "grid": {"quota_multiplier": [0.5, 1.0, 1.5]},
+        },
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["keys"] == [{"province": "ON", "discipline_name": "Family Medicine"}]
+    assert [p["overrides"]["quota_multiplier"] for p in body["points"]] == [0.5, 1.0, 1.5]
+    assert all(len(p["fill_rate_mean"]) == 1 for p in body["points"])
+    assert all(p["scenario_id"] is None for p in body["points"])
+
+    bad = client.post(
+        "/analytics/simulate/sweep",
+        json={"base": {"scenario_type": "baseline"}, "grid": {"iterations": [100]}},
+    )
+    assert bad.status_code == 422
+
+
+def test_simulation_job_lifecycle(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    submitted = client.post(
+        "/analytics/simulate/jobs",
+        json={"scenario_type": "baseline", "iterations": 60, "seed": 1, "persist": False},
+    )
+    assert submitted.status_code == 202
+    job_id = submitted.json()["job_id"]
+
+    deadline = time.monotonic() + 10
+    body = submitted.json()
+    while body["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        body = client.get(f"/analytics/simulate/jobs/{job_id}").json()
+
+    assert body["status"] == "succeeded"
+    assert body["progress"] == 1.0
+    assert body["result"]["results"][0]["province"] == "ON"
+
+    missing = client.get(f"/analytics/simulate/jobs/{uuid4()}")
+    assert missing.status_code == 404
+
+
+def test_seeded_replay_returns_stored_scenario(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    body = {"scenario_type": "baseline", "iterations": 60, "seed": 4}
+    first = client.post("/analytics/simulate", json=body).json()
+    replay = client.post("/analytics/simulate", json={**body, "scenario_label": "replay"}).json()
+    assert replay["scenario_id"] == first["scenario_id"]
+
+    fetched = client.get(f"/analytics/simulate/{first['scenario_id']}")
+    assert fetched.status_code == 200
+    assert fetched.json()["results"] == first["results"]
+
+
+def test_simulate_with_tolerance_reports_precision(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    resp = client.post(
+        "/analytics/simulate",
+        json={"scenario_type": "baseline", "iterations": 2000, "seed": 3, "tolerance": 0.2},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["converged"] is True
+    assert body["iterations"] < 2000
+    assert body["max_ci_half_width"] <= 0.2
+
+    bad = client.post("/analytics/simulate", json={"scenario_type": "baseline", "tolerance": 0.0})
+    assert bad.status_code == 422
+
+
+def test_simulate_match_engine(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    resp = client.post(
+        "/analytics/simulate",
+        json={"scenario_type": "baseline", "engine": "match", "iterations": 10, "seed": 2},
+    )
+    assert resp.status_code == 200
+    assert all(r["fill_rate_mean"] <= 1.0 for r in resp.json()["results"])
+
+    bad = client.post(
+        "/analytics/simulate",
+        json={"scenario_type": "baseline", "engine": "match", "sampler": "qmc"},
+    )
+    assert bad.status_code == 422
+
+    with Session(db.engine) as session:
+        session.exec(delete(SilverProgram))
+        session.commit()
+    base = {"scenario_type": "baseline", "engine": "match", "iterations": 10, "persist": False}
+    assert client.post("/analytics/simulate", json=base).status_code == 404
+    sweep = {"base": base, "grid": {"quota_multiplier": [1.0]}}
+    assert client.post("/analytics/simulate/sweep", json=sweep).status_code == 404
+
+
+def test_simulation_quantiles_from_stored_draws(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    created = client.post(
+        "/analytics/simulate",
+        json={"scenario_type": "baseline", "iterations": 60, "seed": 4, "keep_draws": True},
+    ).json()
+    resp = client.get(
+        f"/analytics/simulate/{created['scenario_id']}/quantiles", params={"q": [0.1, 0.9]}
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["quantiles"] == [0.1, 0.9]
+    assert all(r["fill_rate"][0] <= r["fill_rate"][1] for r in body["results"])
+
+    plain = client.post(
+        "/analytics/simulate", json={"scenario_type": "baseline", "iterations": 60}
+    ).json()
+    assert client.get(f"/analytics/simulate/{plain['scenario_id']}/quantiles").status_code == 409
+    assert client.get(f"/analytics/simulate/{uuid4()}/quantiles").status_code == 404
+
+
+def test_list_scenarios_paginates_headers(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    for seed in (1, 2, 3):
+        client.post(
+            "/analytics/simulate",
+            json={"scenario_type": "baseline", "iterations": 50, "seed": seed},
+        )
+
+    first = client.get("/analytics/scenarios", params={"limit": 2, "include_total": True})
+    assert first.status_code == 200
+    body = first.json()
+    assert body["total"] == 3 and len(body["items"]) == 2
+    assert body["items"][0]["key_count"] > 0 and body["items"][0]["has_draws"] is False
+
+    rest = client.get("/analytics/scenarios", params={"limit": 2, "offset": 2}).json()
+    seen = {i["scenario_id"] for i in body["items"] + rest["items"]}
+    assert len(seen) == 3
+    assert client.get("/analytics/scenarios", params={"month": "2026/01"}).status_code == 422
@@ -1,6 +1,8 @@
+import json
 import os
 from importlib import reload
 
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session
@@ -164,3 +166,130 @@ def test_preferences_endpoint_contract_and_validation(tmp_path, monkeypatch):
 
     short = client.get("/analytics/preferences", params={"discipline": "X"})
     assert short.status_code == 422
+
+
+def test_feature_store_matches_live_scoring(tmp_path, monkeypatch):
+    artifact_path = _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(preferences, "_registry", preferences.ArtifactRegistry(check_interval=0.0))
+    with Session(db.engine) as session:
+        _seed(session)
+        artifact = preferences.ensure_artifact(session)
+        assert preferences.query_features(session, artifact) is None
+
+        written = preferences.materialize_features(session, artifact)
+        stored = preferences.query_features(session, artifact, discipline="family", limit=1)
+        live = preferences.score_slice(session, artifact, discipline="family", limit=1)
+        # Wildcards are literal, as in live scoring.
+        assert preferences.query_features(session, artifact, discipline="%") == []
+        assert preferences.query_features(session, artifact, discipline="_amily") == []
+
+    assert written == 3
+    assert [s.program_stream_id for s in stored] == [s.program_stream_id for s in live]
+    assert pytest.approx(stored[0].score) == live[0].score
+
+    # A retrain that reuses the version string is hot-reloaded; the store no longer
+    # matches its weights, so the endpoint scores live instead of serving stale rows.
+    data = json.loads(artifact_path.read_text())
+    data["intercept"] += 1.0
+    artifact_path.write_text(json.dumps(data))
+    os.utime(artifact_path, ns=(0, artifact_path.stat().st_mtime_ns + 10**9))
+    with Session(db.engine) as session:
+        retrained = preferences.ensure_artifact(session)
+        assert retrained.version == artifact.version
+        assert preferences.query_features(session, retrained) is None
+        expected = preferences.score_slice(session, retrained, province="QC")
+        stale = preferences.score_slice(session, artifact, province="QC")
+
+    resp = TestClient(main.create_app()).get("/analytics/preferences", params={"province": "QC"})
+    assert resp.status_code == 200
+    assert resp.json()["items"][0]["score"] == pytest.approx(expected[0].score, abs=1e-4)
+    assert resp.json()["items"][0]["score"] != pytest.approx(stale[0].score, abs=1e-4)
+
+
+def test_vectorized_scoring_top_k_matches_full_sort():
+    rng = np.random.default_rng(0)
+    scores = np.round(rng.random(500), 2)  # plenty of ties
+    full = sorted(range(scores.size), key=lambda i: -scores[i])
+    assert preferences._top_k(scores, 25).tolist() == full[:25]
+    assert preferences._top_k(scores, None).tolist() == full
+
+    artifact = preferences.PreferenceModelArtifact(
+        version="t",
+        feature_names=list(reversed(preferences.FEATURE_NAMES)),
+        weights=[0.5, -1.0, 2.0, 0.0, 1.5],
+        intercept=-0.2,
+        feature_importances={},
+    )
+    X = rng.random((4, len(preferences.FEATURE_NAMES)))
+    by_name = dict(zip(artifact.feature_names, artifact.weights, strict=True))
+    expected = [
+        1
+        / (
+            1
+            + np.exp(
+                -(
+                    artifact.intercept
+                    + sum(
+                        by_name[n] * x for n, x in zip(preferences.FEATURE_NAMES, row, strict=True)
+                    )
+                )
+            )
+        )
+        for row in X
+    ]
+    assert preferences.predict_scores(X, artifact) == pytest.approx(expected)
+
+
+def test_artifact_registry_caches_reloads_and_pins(tmp_path, monkeypatch):
+    artifact_path = _setup(tmp_path, monkeypatch)
+    registry = preferences.ArtifactRegistry(check_interval=0.0)
+    monkeypatch.setattr(preferences, "_registry", registry)
+    with Session(db.engine) as session:
+        _seed(session)
+        v1 = preferences.train_preference_model(session, persist=True)
+        assert registry.get() is registry.get()  # parsed once, then cached
+
+        v2 = preferences.train_preference_model(session, persist=True, version="v2")
+        assert registry.get().version == "v2"  # picked up without a restart
+        assert registry.get("v1").weights == v1.weights
+        assert registry.get("missing") is None
+        with pytest.raises(LookupError):
+            preferences.ensure_artifact(session, version="missing")
+
+    # An externally replaced file is reloaded on the next mtime check.
+    data = json.loads(artifact_path.read_text())
+    data["intercept"] = v2.intercept + 1.0
+    artifact_path.write_text(json.dumps(data))
+    os.utime(artifact_path, ns=(0, artifact_path.stat().st_mtime_ns + 10**9))
+    assert registry.get().intercept == v2.intercept + 1.0
+
+    client = TestClient(main.create_app())
+    pinned = client.get("/analytics/preferences", params={"model_version": "v1"})
+    assert pinned.status_code == 200 and pinned.json()["model_version"] == "v1"
+    assert client.get("/analytics/preferences", params={"model_version": "v9"}).status_code == 404
+
+
+def test_incremental_training_from_sufficient_statistics(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        _seed(session)
+        matrix = preferences.build_feature_matrix(session)
+        base = preferences.train_preference_model(session, persist=True, cycle="2025")
+
+        design = np.hstack([np.ones((len(matrix), 1)), matrix.X])
+        direct = np.linalg.solve(
+            design.T @ design + preferences.REG_L2 * np.eye(design.shape[1]), design.T @ matrix.y
+        )
+        assert base.intercept == pytest.approx(direct[0])
+        assert base.weights == pytest.approx(direct[1:].tolist())
+
+        # A second cycle adds its partitions; 2025 is merged from storage, not rebuilt.
+        merged = preferences.train_preference_model(session, persist=True, cycle="2026")
+        stats = preferences.load_statistics(session)
+        assert stats.n == 2 * len(matrix)
+        assert merged.intercept == pytest.approx(
+            preferences.solve_ridge(stats, preferences.REG_L2)[0]
+        )
+
+        path = preferences.ridge_path(stats, [0.01, preferences.REG_L2, 10.0])
+    assert path[preferences.REG_L2][1] == pytest.approx(merged.weights)
@@ -1,4 +1,10 @@
+import asyncio
+import json
 import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from importlib import reload
 
 import numpy as np
@@ -12,12 +18,16 @@ import carms.api.deps as deps
 import carms.api.main as main
 import carms.api.routes.semantic as semantic
 import carms.core.database as db
+from carms.api.schemas import SemanticHit
 from carms.models.gold import GoldProgramEmbedding
+from carms.semantic import answer, context, filtering, hybrid, matrix, sidecar
+from carms.semantic.batching import EmbeddingBatcher
 
 
 class StubModel:
     def encode(self, text, normalize_embeddings=True):
-        return np.array([1.0, 0.0] + [0.0] * 382)
+        vector = np.array([1.0, 0.0] + [0.0] * 382)
+        return np.tile(vector, (len(text), 1)) if isinstance(text, list) else vector
 
 
 def _client(tmp_path):
@@ -48,9 +58,6 @@ def _client(tmp_path):
     return TestClient(app)
 
 
-@pytest.mark.skip(
-    reason="pgvector 384-dim model not available in SQLite test env - requires full Postgres stack"
-)
 def test_semantic_query_success(tmp_path):
     client = _client(tmp_path)
     resp = client.post("/semantic/query", json={"query": "family medicine", "top_k": 3})
@@ -60,10 +67,531 @@ def test_semantic_query_success(tmp_path):
     assert body["hits"][0]["similarity"] >= 0.9
 
 
-@pytest.mark.skip(
-    reason="pgvector 384-dim model not available in SQLite test env - requires full Postgres stack"
-)
 def test_semantic_query_validation(tmp_path):
     client = _client(tmp_path)
     resp = client.post("/semantic/query", json={"query": "x", "top_k": 30})
     assert resp.status_code == 422
+
+
+def test_embedding_batcher_coalesces_concurrent_requests():
+    calls: list[list[str]] = []
+
+    def encode_batch(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+    async def run():
+        batcher = EmbeddingBatcher(encode_batch, max_batch=8, window_ms=5.0)
+        texts = [f"query {'x' * i}" for i in range(20)]
+        vectors = await asyncio.gather(*(batcher.encode(t) for t in texts))
+        await batcher.aclose()
+        return batcher, texts, vectors
+
+    batcher, texts, vectors = asyncio.run(run())
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts]  # each caller gets its own row
+    assert batcher.items == 20
+    assert batcher.batches == len(calls) < 20
+    assert max(len(c) for c in calls) <= 8
+
+
+def test_embedding_batcher_propagates_encoder_errors():
+    def encode_batch(texts):
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        batcher = EmbeddingBatcher(encode_batch, window_ms=0.0)
+        results = await asyncio.gather(
+            batcher.encode("a"), batcher.encode("b"), return_exceptions=True
+        )
+        await batcher.aclose()
+        return results
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+
+
+def test_semantic_query_caches_embeddings_and_results(tmp_path, monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CACHE_CHECK_SEC", "0")
+    client = _client(tmp_path)
+    encoded: list[list[str]] = []
+
+    class CountingModel(StubModel):
+        def encode(self, text, normalize_embeddings=True):
+            encoded.append(list(text))
+            return super().encode(text, normalize_embeddings)
+
+    semantic._get_model = lambda: CountingModel()  # type: ignore
+
+    first = client.post("/semantic/query", json={"query": "Family  Medicine", "top_k": 3})
+    again = client.post("/semantic/query", json={"query": "family medicine", "top_k": 3})
+    assert again.json() == first.json()
+    assert encoded == [["family medicine"]]  # normalized text, encoded once
+
+    # Another top_k misses the result cache but reuses the query embedding.
+    client.post("/semantic/query", json={"query": "family medicine", "top_k": 5})
+    assert len(encoded) == 1
+
+    # A change to the embedding table drops cached hit lists.
+    with Session(db.engine) as session:
+        session.add(
+            GoldProgramEmbedding(
+                program_stream_id=2,
+                program_name="Prog B",
+                program_stream_name="Stream B",
+                discipline_name="Family Medicine",
+                province="QC",
+                description_text="Another program",
+                embedding=[0.9, 0.1] + [0.0] * 382,
+            )
+        )
+        session.commit()
+    refreshed = client.post("/semantic/query", json={"query": "family medicine", "top_k": 3})
+    assert [h["program_stream_id"] for h in refreshed.json()["hits"]] == [1, 2]
+
+    stats = client.get("/semantic/cache").json()
+    assert stats["results"]["hits"] == 1 and stats["results"]["misses"] == 3
+    assert stats["embeddings"]["hits"] == 2 and stats["embeddings"]["misses"] == 1
+    assert stats["encoded_queries"] == 1
+
+
+def test_reciprocal_rank_fusion_and_fts_expression():
+    fused = hybrid.reciprocal_rank_fusion([[1, 2, 3], [3, 4]], k=60)
+    assert [item for item, _ in fused] == [3, 1, 2, 4]
+    assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
+    assert hybrid.fts5_match_expression('Return-of "service"') == (
+        '"return of service" OR "return" OR "of" OR "service"'
+    )
+    assert hybrid.fts5_match_expression("  ?! ") is None
+
+
+def test_hybrid_query_recovers_exact_term_matches(tmp_path):
+    client = _client(tmp_path)
+    with Session(db.engine) as session:
+        for program_id, description, embedding in [
+            (2, "Rural track with a return of service agreement", [0.0, 1.0]),
+            (3, "Urban teaching hospital", [0.95, 0.05]),
+        ]:
+            session.add(
+                GoldProgramEmbedding(
+                    program_stream_id=program_id,
+                    program_name=f"Prog {program_id}",
+                    program_stream_name=f"Stream {program_id}",
+                    discipline_name="Family Medicine",
+                    province="ON",
+                    description_text=description,
+                    embedding=embedding + [0.0] * 382,
+                )
+            )
+        session.commit()
+
+    body = {"query": "return of service", "top_k": 2}
+    vector = client.post("/semantic/query", json={**body, "mode": "vector"}).json()["hits"]
+    assert [h["program_stream_id"] for h in vector] == [1, 3]
+
+    lexical = client.post("/semantic/query", json={**body, "mode": "lexical"}).json()["hits"]
+    assert [h["program_stream_id"] for h in lexical] == [2]
+    assert lexical[0]["similarity"] == pytest.approx(0.0)
+
+    hits = client.post("/semantic/query", json=body).json()["hits"]
+    assert 2 in [h["program_stream_id"] for h in hits]
+    assert all(h["score"] is not None for h in hits)
+
+    # FTS rows follow the base table through triggers.
+    with Session(db.engine) as session:
+        session.delete(session.get(GoldProgramEmbedding, 2))
+        session.commit()
+    body["query"] = "service return"
+    assert client.post("/semantic/query", json={**body, "mode": "lexical"}).json()["hits"] == []
+    assert client.post("/semantic/query", json={**body, "mode": "bm25"}).status_code == 422
+
+
+class FakeAnswerer:
+    """Local stand-in for the LangChain chain: yields fixed chunks with a delay."""
+
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+
+    def invoke(self, question, hits):
+        return "".join(self.chunks)
+
+    async def astream(self, question, hits):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+
+def _events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_semantic_stream_emits_hits_then_answer_tokens(tmp_path, monkeypatch):
+    client = _client(tmp_path)
+    monkeypatch.setattr(semantic, "_get_answerer", lambda: FakeAnswerer(["Prog ", "A (1)"]))
+
+    resp = client.post("/semantic/query/stream", json={"query": "family medicine"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _events(resp.text)
+    assert events[0][0] == "hits" and events[0][1]["hits"][0]["program_stream_id"] == 1
+    assert [d["text"] for e, d in events if e == "token"] == ["Prog ", "A (1)"]
+    assert events[-1][0] == "done" and events[-1][1]["answer"] == "complete"
+    assert events[-1][1]["context_tokens"] > 0
+
+    # The buffered endpoint uses the same pooled answerer.
+    assert client.post("/semantic/query", json={"query": "family"}).json()["answer"] == "Prog A (1)"
+
+
+def test_semantic_stream_sends_hits_before_packing_context(monkeypatch):
+    packed = []
+
+    def recording_pack(question, hits, descriptions, **kwargs):
+        packed.append(question)
+        return context.pack_context(question, hits, descriptions, **kwargs)
+
+    monkeypatch.setattr(semantic, "pack_context", recording_pack)
+    events = semantic._answer_events(
+        "family", [_hit(1, 0.9)], 1, FakeAnswerer(["ok"]), {1: "## Highlights\nFamily."}
+    )
+
+    async def consume():
+        first = await anext(events)
+        assert not packed  # the hits event did not wait for tokenization
+        return [first] + [event async for event in events]
+
+    body = "".join(asyncio.run(consume()))
+    assert packed == ["family"]
+    assert [e for e, _ in _events(body)] == ["hits", "token", "done"]
+
+
+def test_semantic_stream_enforces_answer_budget(tmp_path, monkeypatch):
+    client = _client(tmp_path)
+    monkeypatch.setattr(semantic.settings, "semantic_answer_budget_sec", 0.1)
+    slow = FakeAnswerer(["a", "b", "c", "d"], delay=0.05)
+    monkeypatch.setattr(semantic, "_get_answerer", lambda: slow)
+
+    events = _events(client.post("/semantic/query/stream", json={"query": "family"}).text)
+    tokens = [d["text"] for e, d in events if e == "token"]
+    assert events[0][0] == "hits"
+    assert len(tokens) < 4
+    assert events[-1][0] == "done" and events[-1][1]["answer"] == "timeout"
+
+
+def _hit(program_id: int, similarity: float) -> SemanticHit:
+    return SemanticHit(
+        program_stream_id=program_id,
+        program_name=f"Prog {program_id}",
+        program_stream_name="S",
+        discipline_name="Family Medicine",
+        province="ON",
+        similarity=similarity,
+    )
+
+
+def test_build_answerer_caches_only_successful_builds(monkeypatch):
+    built = object()
+    attempts = []
+
+    def flaky(api_key, timeout):
+        attempts.append(api_key)
+        if len(attempts) == 1:
+            raise ImportError("langchain_openai")
+        return built
+
+    monkeypatch.setattr(answer, "_answerers", answer.LRUCache(maxsize=4))
+    monkeypatch.setattr(answer, "LangChainAnswerer", flaky)
+    assert answer.build_answerer("sk-test", 5.0) is None
+    assert answer.build_answerer("sk-test", 5.0) is built
+    assert answer.build_answerer("sk-test", 5.0) is built
+    assert len(attempts) == 2
+
+
+def test_context_packer_ranks_sections_dedupes_and_respects_budget():
+    shared = "## Interviews\nVirtual interviews are held in January for all streams."
+    descriptions = {
+        1: "## Program Highlights\nUrban hospital rotations.\n\n" + shared,
+        2: "## Program Highlights\nRural return of service commitment in northern Ontario.\n\n"
+        + shared,
+        3: "## Training Sites\n" + "Long site listing. " * 400,
+    }
+    hits = [_hit(1, 0.9), _hit(2, 0.8), _hit(3, 0.7)]
+
+    packed = context.pack_context(
+        "return of service", hits, descriptions, budget=120, max_passage_tokens=60
+    )
+    assert packed.passages[0].program_stream_id == 2  # lexical overlap lifts the section
+    assert packed.passages[0].section == "Program Highlights"
+    assert packed.duplicates == 1  # shared interview boilerplate kept once
+    assert packed.tokens_used == sum(p.tokens for p in packed.passages) <= 120
+    assert all(p.tokens <= 60 for p in packed.passages)
+
+    unbounded = context.pack_context("x", hits, descriptions, budget=10_000, max_passage_tokens=60)
+    assert len(unbounded.passages) == 4  # 5 sections, 1 duplicate
+    assert context.split_sections("plain text") == [("Description", "plain text")]
+
+
+def test_semantic_query_reports_context_tokens(tmp_path, monkeypatch):
+    client = _client(tmp_path)
+    assert client.post("/semantic/query", json={"query": "family"}).json()["context_tokens"] is None
+
+    seen = {}
+
+    class RecordingAnswerer(FakeAnswerer):
+        def invoke(self, question, passages):
+            seen["passages"] = passages
+            return "ok"
+
+    monkeypatch.setattr(semantic, "_get_answerer", lambda: RecordingAnswerer([]))
+    body = client.post("/semantic/query", json={"query": "great", "top_k": 1}).json()
+    assert body["answer"] == "ok"
+    assert body["context_tokens"] == sum(p.tokens for p in seen["passages"]) > 0
+    assert "Great program" in seen["passages"][0].text
+
+
+def test_filter_plan_picks_strategy_by_selectivity():
+    counts = {("ON", "Family Medicine"): 3000, ("QC", "Family Medicine"): 2500}
+    counts.update({(p, "Internal Medicine"): 1000 for p in ("ON", "QC", "BC", "AB", "NS")})
+
+    assert filtering.plan_filtered_search(counts, None, None, 5).strategy == "index"
+    assert filtering.plan_filtered_search(counts, "PE", None, 5).strategy == "empty"
+
+    narrow = filtering.plan_filtered_search(counts, "BC", "internal", 5)
+    assert narrow.strategy == "exact"
+    assert narrow.disciplines == ["Internal Medicine"] and narrow.matching_rows == 1000
+
+    broad = filtering.plan_filtered_search(counts, None, "medicine", 5)
+    assert broad.strategy == "overfetch" and broad.matching_rows == 10_500
+    assert broad.fetch == 10  # selectivity 1.0, 2x margin
+
+    where, params = filtering.filter_clause(narrow, alias="e")
+    assert where == "TRUE AND e.province = :province AND e.discipline_name IN :disciplines"
+    assert params == {"province": "BC", "disciplines": ["Internal Medicine"]}
+
+
+def test_postgres_batch_vector_rows_is_one_statement():
+    class Row:
+        def __init__(self, ord, program_stream_id):
+            self.ord = ord
+            self._mapping = {"program_stream_id": program_stream_id}
+
+    class RecordingSession:
+        calls: list = []
+
+        def execute(self, stmt, params):
+            self.calls.append((str(stmt), params))
+            return type("Result", (), {"all": lambda _: [Row(0, 7), Row(2, 9), Row(2, 8)]})()
+
+    counts = {("ON", "Family Medicine"): 5, ("QC", "Surgery"): 5000}
+    plans = [
+        filtering.plan_filtered_search(counts, None, None, 2),
+        filtering.plan_filtered_search(counts, "ON", "surgery", 2),  # empty: never queried
+        filtering.plan_filtered_search(counts, "ON", "family", 2),
+    ]
+    session = RecordingSession()
+    rows = filtering.postgres_batch_vector_rows(session, plans, [[1.0], [0.5], [0.0]], 2)
+
+    assert [[r["program_stream_id"] for r in item] for item in rows] == [[7], [], [9, 8]]
+    [(sql, params)] = session.calls
+    assert sql.count("CROSS JOIN LATERAL") == 2 and "+ 0" in sql
+    assert params["disciplines_2"] == ["Family Medicine"] and "ord_1" not in params
+
+
+def test_semantic_query_resolves_discipline_filter(tmp_path):
+    client = _client(tmp_path)
+    for mode in ("vector", "lexical", "hybrid"):
+        body = {"query": "great program", "discipline": "FAMILY", "province": "ON", "mode": mode}
+        hits = client.post("/semantic/query", json=body).json()["hits"]
+        assert [h["program_stream_id"] for h in hits] == [1]
+        body["discipline"] = "surgery"
+        assert client.post("/semantic/query", json=body).json()["hits"] == []
+
+
+def test_semantic_batch_query_single_pass_in_input_order(tmp_path):
+    client = _client(tmp_path)
+    with Session(db.engine) as session:
+        session.add(
+            GoldProgramEmbedding(
+                program_stream_id=2,
+                program_name="Prog B",
+                program_stream_name="Stream B",
+                discipline_name="Internal Medicine",
+                province="QC",
+                description_text="Another program",
+                embedding=[0.6, 0.8] + [0.0] * 382,
+            )
+        )
+        session.commit()
+
+    class TextModel:
+        calls: list[list[str]] = []
+
+        def encode(self, texts, normalize_embeddings=True):
+            self.calls.append(list(texts))
+            rows = [[0.0, 1.0] if "internal" in t else [1.0, 0.0] for t in texts]
+            return np.array([row + [0.0] * 382 for row in rows])
+
+    model = TextModel()
+    semantic._get_model = lambda: model  # type: ignore
+    payload = {
+        "queries": [
+            {"query": "Internal medicine"},
+            {"query": "family"},
+            {"query": "internal  MEDICINE", "province": "ON"},
+            {"query": "family", "discipline": "surgery"},
+        ],
+        "top_k": 2,
+    }
+    resp = client.post("/semantic/query:batch", json=payload)
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["query"] for r in results] == [q["query"] for q in payload["queries"]]
+    assert [[h["program_stream_id"] for h in r["hits"]] for r in results] == [
+        [2, 1],
+        [1, 2],
+        [1],
+        [],
+    ]
+    assert results[0]["hits"][0]["similarity"] == pytest.approx(0.8)
+    assert model.calls == [["internal medicine", "family"]]  # one pass over unique misses
+
+    single = client.post(
+        "/semantic/query", json={"query": "family", "top_k": 2, "mode": "vector"}
+    ).json()["hits"]
+    assert [h["program_stream_id"] for h in single] == [1, 2]
+    assert [h["similarity"] for h in results[1]["hits"]] == pytest.approx(
+        [h["similarity"] for h in single], abs=1e-6
+    )
+
+    too_many = {"queries": [{"query": "x"}] * (semantic.MAX_BATCH_QUERIES + 1)}
+    assert client.post("/semantic/query:batch", json=too_many).status_code == 422
+    assert client.post("/semantic/query:batch", json={"queries": []}).status_code == 422
+
+
+def test_embedding_matrix_export_is_memory_mapped_and_swapped(tmp_path, monkeypatch):
+    export_dir = tmp_path / "embeddings"
+    monkeypatch.setenv("EMBEDDING_EXPORT_DIR", str(export_dir))
+    monkeypatch.setenv("SEMANTIC_CACHE_CHECK_SEC", "0")
+    client = _client(tmp_path)
+
+    with Session(db.engine) as session:
+        first = matrix.export_embedding_matrix(session)
+    store = matrix.MatrixStore(export_dir, check_interval=0.0)
+    mapped = store.current()
+    assert mapped.version == first
+    assert isinstance(mapped.vectors, np.memmap) and mapped.vectors.dtype == np.float32
+    assert mapped.program_stream_ids.tolist() == [1]
+
+    # Rows added after the export are not served until the next export swaps in.
+    with Session(db.engine) as session:
+        session.add(
+            GoldProgramEmbedding(
+                program_stream_id=2,
+                program_name="Prog B",
+                program_stream_name="Stream B",
+                discipline_name="Family Medicine",
+                province="ON",
+                description_text="Another program",
+                embedding=[2.0, 0.0] + [0.0] * 382,
+            )
+        )
+        session.commit()
+    body = {"query": "family", "mode": "vector"}
+    hits = client.post("/semantic/query", json=body).json()["hits"]
+    assert [h["program_stream_id"] for h in hits] == [1]
+
+    versions = [first]
+    with Session(db.engine) as session:
+        for _ in range(matrix.KEEP_EXPORTS):
+            versions.append(matrix.export_embedding_matrix(session))
+    assert store.current().version == versions[-1]
+    assert mapped.vectors.sum() == pytest.approx(1.0)  # the old mapping stays readable
+    hits = client.post("/semantic/query", json=body).json()["hits"]
+    assert [h["program_stream_id"] for h in hits] == [1, 2]
+    assert hits[1]["similarity"] == pytest.approx(1.0)  # exported rows are unit-normalized
+    assert sorted(p.name for p in export_dir.iterdir() if p.is_dir()) == versions[1:]
+
+
+@contextmanager
+def _running_sidecar(path: str, encode_batch):
+    loop = asyncio.new_event_loop()
+    server = sidecar.EmbeddingServer(encode_batch, window_ms=1.0)
+    listener = loop.run_until_complete(server.start(path))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        listener.close()
+        loop.run_until_complete(asyncio.sleep(0.05))  # let handlers see their clients' EOF
+        loop.run_until_complete(server.batcher.aclose())
+        loop.close()
+
+
+def test_embedding_sidecar_round_trip_and_route_fallback(tmp_path, monkeypatch):
+    socket_path = os.path.join(tempfile.mkdtemp(), "embed.sock")  # short path for AF_UNIX
+    stub = StubModel()
+
+    def encode_batch(texts):
+        if "boom" in texts:
+            raise ValueError("bad input")
+        return stub.encode(texts)
+
+    with _running_sidecar(socket_path, encode_batch) as server:
+        client = sidecar.SidecarClient(socket_path)
+        vectors = client.encode(["a", "b", "c"])
+        assert vectors.shape == (3, 384) and vectors.dtype == np.float32
+        with pytest.raises(RuntimeError, match="bad input"):
+            client.encode(["boom"])
+        assert client.encode(["d"]).shape == (1, 384)  # connection survives an error
+        client.close()
+
+        monkeypatch.setenv("EMBEDDING_SOCKET", socket_path)
+        api = _client(tmp_path)
+
+        def no_local_model():
+            raise AssertionError("worker must not load the model when the sidecar is up")
+
+        semantic._get_model = no_local_model  # type: ignore
+        hits = api.post("/semantic/query", json={"query": "family", "top_k": 1}).json()["hits"]
+        assert hits[0]["program_stream_id"] == 1
+        assert server.batcher.items == 5  # the failed "boom" batch is not counted
+        # A sidecar-side error is a 503, never a reason to load the model in the worker.
+        monkeypatch.setattr(semantic.settings, "embedding_sidecar_fallback", True)
+        assert api.post("/semantic/query", json={"query": "boom"}).status_code == 503
+        semantic._sidecar.close()
+
+    # Sidecar gone: 503 by default, or the in-process model when fallback is enabled.
+    semantic._get_model = lambda: StubModel()  # type: ignore
+    body = {"query": "medicine", "top_k": 1}
+    assert api.post("/semantic/query", json=body).status_code == 200
+    monkeypatch.setattr(semantic.settings, "embedding_sidecar_fallback", False)
+    assert api.post("/semantic/query", json={**body, "query": "other"}).status_code == 503
+
+
+def test_embedding_sidecar_timeout_does_not_fall_back(tmp_path, monkeypatch):
+    socket_path = os.path.join(tempfile.mkdtemp(), "embed.sock")
+    stub = StubModel()
+
+    def slow_encode(texts):
+        time.sleep(0.3)
+        return stub.encode(texts)
+
+    with _running_sidecar(socket_path, slow_encode):
+        monkeypatch.setenv("EMBEDDING_SOCKET", socket_path)
+        monkeypatch.setenv("EMBEDDING_SIDECAR_TIMEOUT", "0.05")
+        monkeypatch.setenv("EMBEDDING_SIDECAR_FALLBACK", "true")
+        api = _client(tmp_path)
+        assert semantic._sidecar.timeout == 0.05
+
+        def no_local_model():
+            raise AssertionError("a slow sidecar must not pull the model into the worker")
+
+        semantic._get_model = no_local_model  # type: ignore
+        assert api.post("/semantic/query", json={"query": "family"}).status_code == 503
+        semantic._sidecar.close()
+        time.sleep(0.3)  # let the abandoned request finish before the loop stops
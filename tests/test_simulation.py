@@ -1,18 +1,39 @@
 import os
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
 from importlib import reload
+from uuid import uuid4
 
-from sqlmodel import Session
+import numpy as np
+import pytest
+from sqlmodel import Session, select
 
 os.environ.setdefault("DB_URL", "sqlite:///./test_sim_import.db")
 
+import carms.analytics.simulation as simulation
 import carms.core.database as db
-from carms.analytics.simulation import SimulationParams, run_simulation
+from carms.analytics import preferences
+from carms.analytics.match import deferred_acceptance, generate_rank_lists
+from carms.analytics.sampling import SAMPLERS, inverse_cdf_demand, uniforms
+from carms.analytics.simulation import (
+    SimulationParams,
+    build_grid,
+    load_scenario,
+    prune_scenarios,
+    reaggregate,
+    run_simulation,
+    run_sweep,
+)
+from carms.models.gold import GoldMatchScenario, GoldMatchScenarioRun
 from carms.models.silver import SilverProgram
 
 
 def setup_db(tmp_path, monkeypatch):
     db_path = tmp_path / "sim.db"
     monkeypatch.setenv("DB_URL", f"sqlite:///{db_path}")
+    # The match engine trains a preference model on demand; keep it out of the checkout.
+    monkeypatch.setenv("PREFERENCE_ARTIFACT_PATH", str(tmp_path / "pref_model.json"))
+    monkeypatch.setattr(preferences, "_registry", None)
     reload(db)
     db.init_db()
     return db_path
@@ -120,3 +141,318 @@ def test_preference_shift_moves_demand(tmp_path, monkeypatch):
     base_on = next(r for r in base_rows if r.province == "ON")
     shifted_on = next(r for r in shifted_rows if r.province == "ON")
     assert shifted_on.demand_mean > base_on.demand_mean
+
+
+def test_parallel_simulation_reproducible(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+
+        params = SimulationParams(
+            scenario_type="baseline", iterations=120, seed=7, workers=2, persist=False
+        )
+        _, rows1 = run_simulation(session, params)
+        _, rows2 = run_simulation(session, params)
+
+    def stats(rows):
+        return {
+            (r.province, r.discipline_name): (r.demand_mean, r.fill_rate_mean, r.fill_rate_p95)
+            for r in rows
+        }
+
+    assert stats(rows1) == stats(rows2)
+    assert simulation.get_simulation_pool(2) is simulation.get_simulation_pool(2)  # reused
+    assert simulation._pool._mp_context.get_start_method() != "fork"
+    simulation.shutdown_simulation_pool()
+    assert all(r.iterations == 120 for r in rows1)
+    assert all(r.fill_rate_p05 <= r.fill_rate_mean <= r.fill_rate_p95 for r in rows1)
+
+
+def test_sweep_matches_single_runs(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+
+        base = SimulationParams(scenario_type="quota_shock", sampler="crn", iterations=80, seed=3)
+        grid = build_grid({"quota_multiplier": [0.5, 1.0]})
+        result = run_sweep(session, base, grid)
+
+        assert [p.overrides for p in result.points] == grid
+        assert len(result.keys) == 2
+        persisted = session.exec(select(GoldMatchScenarioRun)).all()
+        assert len(persisted) == 2
+        assert {r.params["sweep_id"] for r in persisted} == {str(result.sweep_id)}
+
+        singles = []
+        for point in result.points:
+            single = replace(base, persist=False, **point.overrides)
+            singles.append(run_simulation(session, single)[1])
+
+        mc_base = replace(base, sampler="mc", persist=False)
+        mc_first = run_sweep(session, mc_base, grid)
+        mc_second = run_sweep(session, mc_base, grid)
+
+    for point, rows in zip(result.points, singles, strict=True):
+        by_key = {(r.province, r.discipline_name): r.fill_rate_mean for r in rows}
+        assert point.fill_rate_mean == pytest.approx([by_key[k] for k in result.keys])
+    assert result.points[0].overall_fill_rate <= result.points[1].overall_fill_rate
+    assert [p.fill_rate_mean for p in mc_first.points] == [
+        p.fill_rate_mean for p in mc_second.points
+    ]
+
+
+def test_seeded_simulation_cache_hit_and_invalidation(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+
+        params = SimulationParams(scenario_type="baseline", iterations=60, seed=5)
+        first_id, first_rows = run_simulation(session, params)
+        relabeled = SimulationParams(
+            scenario_type="baseline", scenario_label="Dashboard", iterations=60, seed=5
+        )
+        second_id, _ = run_simulation(session, relabeled)
+        assert second_id == first_id
+        assert len(session.exec(select(GoldMatchScenarioRun)).all()) == 1
+        assert len(load_scenario(session, first_id)) == len(first_rows)
+
+        program = session.get(SilverProgram, 1)
+        program.quota = 9
+        session.add(program)
+        session.commit()
+
+        third_id, _ = run_simulation(session, params)
+        assert third_id != first_id
+
+        # workers only keys the cache when it changes the draws (fixed-size mc runs).
+        crn = SimulationParams(scenario_type="baseline", iterations=60, seed=5, sampler="crn")
+        fp = "supply"
+        key = simulation.simulation_cache_key
+        assert key(crn, fp) == key(replace(crn, workers=4), fp)
+        assert key(replace(params, tolerance=0.1), fp) == key(
+            replace(params, tolerance=0.1, workers=4), fp
+        )
+        assert key(params, fp) != key(replace(params, workers=4), fp)
+        assert key(params, fp) == key(replace(params, workers=1), fp)
+
+        unseeded = SimulationParams(scenario_type="baseline", iterations=60, persist=False)
+        a_id, _ = run_simulation(session, unseeded)
+        b_id, _ = run_simulation(session, unseeded)
+        assert a_id != b_id
+
+
+def test_inverse_cdf_demand_conserves_applicants():
+    rng = np.random.default_rng(0)
+    alpha = np.array([5.0, 20.0, 0.5, 24.5])
+    for sampler in SAMPLERS[1:]:
+        u = uniforms(sampler, 64, 2 * alpha.size, rng)
+        demand = inverse_cdf_demand(alpha, 40, u)
+        assert demand.shape == (64, 4)
+        assert (demand >= 0).all()
+        assert (demand.sum(axis=1) == 40).all()
+
+
+def test_common_random_numbers_tighten_scenario_deltas(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+
+        def on_delta(sampler: str, seed: int) -> float:
+            common = {"iterations": 60, "seed": seed, "sampler": sampler, "persist": False}
+            _, base = run_simulation(session, SimulationParams(scenario_type="baseline", **common))
+            _, shifted = run_simulation(
+                session,
+                SimulationParams(
+                    scenario_type="preference_shift",
+                    target_provinces=["ON"],
+                    shift_pct=0.2,
+                    **common,
+                ),
+            )
+            base_on = next(r for r in base if r.province == "ON")
+            shifted_on = next(r for r in shifted if r.province == "ON")
+            assert base_on.fill_rate_se is not None and base_on.fill_rate_se >= 0
+            return shifted_on.demand_mean - base_on.demand_mean
+
+        mc_deltas = [on_delta("mc", seed) for seed in range(8)]
+        crn_deltas = [on_delta("antithetic", seed) for seed in range(8)]
+
+    assert np.mean(crn_deltas) > 0
+    assert np.std(crn_deltas) < np.std(mc_deltas)
+
+
+def test_tolerance_stops_early_and_reports_iterations(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+
+        loose = SimulationParams(
+            scenario_type="baseline", iterations=2000, seed=9, tolerance=0.5, persist=False
+        )
+        _, early = run_simulation(session, loose)
+        fixed = SimulationParams(scenario_type="baseline", iterations=100, seed=9, persist=False)
+        _, reference = run_simulation(session, fixed)
+
+        strict = SimulationParams(
+            scenario_type="baseline", iterations=150, seed=9, tolerance=1e-6, persist=False
+        )
+        _, capped = run_simulation(session, strict)
+
+    assert all(r.iterations == 100 for r in early)
+    assert {(r.province, r.fill_rate_mean) for r in early} == {
+        (r.province, r.fill_rate_mean) for r in reference
+    }
+    assert all(r.iterations == 150 for r in capped)
+
+
+@pytest.mark.parametrize("sampler", ["crn", "antithetic"])
+def test_tolerance_draws_are_a_prefix_of_the_fixed_run(sampler):
+    alpha = np.array([4.0, 2.0, 1.0])
+    quotas = np.array([40, 20, 10])
+    params = SimulationParams(
+        scenario_type="baseline", iterations=400, seed=11, sampler=sampler, tolerance=0.5
+    )
+    early, _, _ = simulation._simulate_until_converged(alpha, quotas, 70, params)
+    full, _ = simulation._simulate_inverse_cdf(
+        alpha, quotas, 70, 400, sampler, np.random.default_rng(11)
+    )
+
+    assert len(early) < 400
+    np.testing.assert_array_equal(early, full[: len(early)])
+
+
+def test_deferred_acceptance_is_stable():
+    rng = np.random.default_rng(3)
+    capacity = np.array([2, 1, 3, 1, 2])
+    ranks = generate_rank_lists(np.array([5.0, 3.0, 2.0, 1.0, 1.0]), 20, 3, rng)
+    scores = rng.standard_normal(ranks.shape)
+    assigned = deferred_acceptance(ranks, scores, capacity)
+
+    assert (np.bincount(assigned[assigned >= 0], minlength=5) <= capacity).all()
+    # Each program's least-preferred holder, keyed by how that program rates applicants.
+    held = {p: [] for p in range(5)}
+    rating = {}
+    for a in range(ranks.shape[0]):
+        for r, p in enumerate(ranks[a]):
+            if p >= 0:
+                rating[(a, p)] = scores[a, r]
+        if assigned[a] >= 0:
+            held[assigned[a]].append(rating[(a, assigned[a])])
+    for a in range(ranks.shape[0]):
+        for p in ranks[a]:
+            if p < 0 or p == assigned[a]:
+                break
+            # a prefers p to its match: p must be full of applicants it rates higher.
+            assert len(held[p]) == capacity[p]
+            assert min(held[p]) > rating[(a, p)]
+
+
+def test_match_engine_respects_capacity(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+
+        params = SimulationParams(
+            scenario_type="baseline", engine="match", iterations=20, seed=4, demand_multiplier=1.5
+        )
+        _, rows = run_simulation(session, params)
+        _, replay = run_simulation(session, params)
+
+    assert {r.province for r in rows} == {"ON", "QC"}
+    assert all(0.0 <= r.fill_rate_p95 <= 1.0 for r in rows)
+    # Oversubscribed applicants fill most seats through later choices.
+    assert sum(r.fill_rate_mean for r in rows) / len(rows) > 0.9
+    assert replay[0].scenario_id == rows[0].scenario_id
+
+
+def test_compact_storage_and_reaggregation(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+
+        kept = SimulationParams(scenario_type="baseline", iterations=100, seed=8, keep_draws=True)
+        scenario_id, rows = run_simulation(session, kept)
+        stored = load_scenario(session, scenario_id)
+        quantiles = reaggregate(session, scenario_id, [0.05, 0.5, 0.95])
+
+        plain_id, _ = run_simulation(session, SimulationParams(scenario_type="baseline", seed=8))
+        assert session.exec(select(GoldMatchScenario)).all() == []
+        with pytest.raises(ValueError):
+            reaggregate(session, plain_id, [0.5])
+
+        legacy_id = uuid4()
+        session.add(
+            GoldMatchScenario(
+                scenario_id=legacy_id,
+                scenario_type="baseline",
+                province="ON",
+                discipline_name="Family Medicine",
+                supply_quota=10,
+                demand_mean=8.0,
+                fill_rate_mean=0.8,
+                fill_rate_p05=0.6,
+                fill_rate_p95=1.0,
+                iterations=100,
+            )
+        )
+        session.commit()
+        with pytest.raises(ValueError):
+            reaggregate(session, legacy_id, [0.5])
+        assert reaggregate(session, uuid4(), [0.5]) is None
+
+    assert [(r.province, r.fill_rate_mean, r.fill_rate_se) for r in stored] == [
+        (r.province, r.fill_rate_mean, r.fill_rate_se) for r in rows
+    ]
+    assert quantiles.keys == [(r.province, r.discipline_name) for r in rows]
+    # Draws are stored as float32, so recomputed p05/p95 match to float32 precision.
+    for i, row in enumerate(rows):
+        assert abs(quantiles.fill_rate[i, 0] - row.fill_rate_p05) < 1e-6
+        assert abs(quantiles.fill_rate[i, 2] - row.fill_rate_p95) < 1e-6
+
+
+def test_key_rows_written_when_enabled(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    monkeypatch.setenv("SIMULATION_KEY_ROWS", "true")
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+        scenario_id, rows = run_simulation(
+            session, SimulationParams(scenario_type="baseline", iterations=60)
+        )
+        persisted = session.exec(
+            select(GoldMatchScenario).where(GoldMatchScenario.scenario_id == scenario_id)
+        ).all()
+
+    assert len(persisted) == len(rows) == 2
+
+
+def test_scenario_header_summary_and_retention(tmp_path, monkeypatch):
+    setup_db(tmp_path, monkeypatch)
+    with Session(db.engine) as session:
+        session.add_all(seed_supply())
+        session.commit()
+
+        old_id, _ = run_simulation(session, SimulationParams(scenario_type="baseline", seed=1))
+        old = session.get(GoldMatchScenarioRun, old_id)
+        old.created_at = datetime.now(timezone.utc) - timedelta(days=120)
+        session.add(old)
+        session.commit()
+        new_id, rows = run_simulation(session, SimulationParams(scenario_type="baseline", seed=2))
+
+        header = session.get(GoldMatchScenarioRun, new_id)
+        assert header.total_quota == 10
+        assert header.partition_month == datetime.now(timezone.utc).strftime("%Y-%m")
+        assert header.overall_fill_rate == sum(r.fill_rate_mean * r.supply_quota for r in rows) / 10
+
+        removed = prune_scenarios(session, datetime.now(timezone.utc) - timedelta(days=90))
+        remaining = session.exec(select(GoldMatchScenarioRun.scenario_id)).all()
+
+    assert removed == 1
+    assert remaining == [new_id]